@@ -0,0 +1,458 @@
+import json
+import time
+import asyncio
+import uuid
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def option_fair_price(symbol, underlying_price):
+    """
+    Rough option mark for the fake quotes: intrinsic value plus a fixed time value
+
+    Parameters:
+    - symbol: OCC option symbol
+    - underlying_price: Price of the underlying
+
+    Returns:
+    - float: Option price
+    """
+    strike = int(symbol[-8:]) / 1000
+    intrinsic = underlying_price - strike if symbol[-9] == "C" else strike - underlying_price
+    return round(max(intrinsic, 0.0) + 0.25, 2)
+
+
+class FakeAlpacaServer:
+    """
+    In-process HTTP stand-in for the Alpaca trading and market data endpoints the strategy uses.
+
+    Every request sleeps for latency_ms plus uniform jitter and fails with a 503 at error_rate.
+    Orders fill immediately at the fake mark and update the fake positions, so entry, stop-loss
+    and close flows run end to end through the real SDK clients. Each fill is also sent as a
+    trade update to the clients of the fake trade-updates websocket at stream_url. Option quotes
+    sent with publish_quote reach the clients of the fake option quote websocket at
+    quote_stream_url that subscribed to the symbol.
+    """
+
+    def __init__(self, latency_ms=20.0, jitter_ms=5.0, error_rate=0.0, underlying_price=502.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.underlying_price = underlying_price
+        self.positions = {}
+        self.orders = {}
+        self.request_counts = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self._stream_loop = None
+        self._stream_server = None
+        self._stream_clients = set()
+        self.stream_url = None
+        self._quote_server = None
+        self._quote_subscriptions = {}
+        self.quote_stream_url = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """
+        Starts serving on a free localhost port
+
+        Returns:
+        - str: Base URL of the server
+        """
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-alpaca", daemon=True)
+        self._thread.start()
+        self._start_trade_stream()
+        self._start_quote_stream()
+        return self.url
+
+    def _start_trade_stream(self):
+        """
+        Serves the trade-updates websocket on a second free localhost port
+        """
+        from websockets.asyncio.server import serve
+
+        async def handler(websocket):
+            # Authenticate, then listen to trade_updates, as the TradingStream client does
+            await websocket.recv()
+            await websocket.send(json.dumps({"stream": "authorization",
+                                             "data": {"status": "authorized", "action": "authenticate"}}))
+            try:
+                async for message in websocket:
+                    if json.loads(message).get("action") == "listen":
+                        self._stream_clients.add(websocket)
+                        await websocket.send(json.dumps({"stream": "listening",
+                                                         "data": {"streams": ["trade_updates"]}}))
+            finally:
+                self._stream_clients.discard(websocket)
+
+        async def listen():
+            return await serve(handler, "127.0.0.1", 0)
+
+        self._stream_loop = asyncio.new_event_loop()
+        self._stream_server = self._stream_loop.run_until_complete(listen())
+        host, port = self._stream_server.sockets[0].getsockname()[:2]
+        self.stream_url = f"ws://{host}:{port}"
+        threading.Thread(target=self._stream_loop.run_forever, name="fake-alpaca-stream", daemon=True).start()
+
+    def _start_quote_stream(self):
+        """
+        Serves the msgpack option quote websocket on another free localhost port, on the stream loop
+        """
+        import msgpack
+        from websockets.asyncio.server import serve
+
+        async def handler(websocket):
+            # Connected, authenticate, then subscribe to quotes, as the OptionDataStream client does
+            await websocket.send(msgpack.packb([{"T": "success", "msg": "connected"}]))
+            await websocket.recv()
+            await websocket.send(msgpack.packb([{"T": "success", "msg": "authenticated"}]))
+            symbols = self._quote_subscriptions.setdefault(websocket, set())
+            try:
+                async for message in websocket:
+                    request = msgpack.unpackb(message)
+                    if request.get("action") == "subscribe":
+                        symbols.update(request.get("quotes", []))
+                    elif request.get("action") == "unsubscribe":
+                        symbols.difference_update(request.get("quotes", []))
+                    await websocket.send(msgpack.packb([{"T": "subscription", "quotes": sorted(symbols)}]))
+            finally:
+                self._quote_subscriptions.pop(websocket, None)
+
+        async def listen():
+            return await serve(handler, "127.0.0.1", 0)
+
+        self._quote_server = asyncio.run_coroutine_threadsafe(listen(), self._stream_loop).result(timeout=5)
+        host, port = self._quote_server.sockets[0].getsockname()[:2]
+        self.quote_stream_url = f"ws://{host}:{port}"
+
+    @property
+    def quote_subscriptions(self):
+        """
+        Symbols subscribed by any quote stream client
+        """
+        return set().union(*list(self._quote_subscriptions.values()))
+
+    def publish_quote(self, symbol, bid, ask):
+        """
+        Sends an option quote to every quote stream client subscribed to the symbol
+        """
+        import msgpack
+
+        if self._stream_loop is None:
+            return
+
+        message = msgpack.packb([{"T": "q", "S": symbol, "t": msgpack.Timestamp.from_unix(time.time()),
+                                  "bx": "X", "bp": bid, "bs": 10, "ax": "X", "ap": ask, "as": 10, "c": "A"}])
+
+        async def broadcast():
+            for websocket, symbols in list(self._quote_subscriptions.items()):
+                if symbol in symbols:
+                    try:
+                        await websocket.send(message)
+                    except Exception:
+                        self._quote_subscriptions.pop(websocket, None)
+
+        asyncio.run_coroutine_threadsafe(broadcast(), self._stream_loop)
+
+    @property
+    def stream_clients(self):
+        return len(self._stream_clients)
+
+    def publish_fill(self, order, event="fill"):
+        """
+        Sends a trade update for an order to every listening stream client
+
+        Parameters:
+        - order: Order as returned by the orders endpoint, with its fill state
+        - event: Trade update event, e.g. 'fill' or 'partial_fill'
+        """
+        if self._stream_loop is None or not self._stream_clients:
+            return
+
+        message = json.dumps({"stream": "trade_updates", "data": {
+            "event": event, "execution_id": str(uuid.uuid4()), "order": order, "timestamp": _now_iso(),
+            "price": order["filled_avg_price"], "qty": order["filled_qty"]
+        }})
+
+        async def broadcast():
+            for websocket in list(self._stream_clients):
+                try:
+                    await websocket.send(message)
+                except Exception:
+                    self._stream_clients.discard(websocket)
+
+        asyncio.run_coroutine_threadsafe(broadcast(), self._stream_loop)
+
+    def stop(self):
+        """
+        Shuts the server down
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._stream_loop is not None:
+            async def close():
+                for server in (self._stream_server, self._quote_server):
+                    server.close()
+                    await server.wait_closed()
+
+            asyncio.run_coroutine_threadsafe(close(), self._stream_loop).result(timeout=5)
+            self._stream_loop.call_soon_threadsafe(self._stream_loop.stop)
+            self._stream_loop = None
+
+    def set_positions(self, positions):
+        """
+        Replaces the open positions
+
+        Parameters:
+        - positions: Iterable of (symbol, qty, avg_entry_price); negative qty for short legs
+        """
+        with self._lock:
+            self.positions = {symbol: {"qty": float(qty), "avg_entry_price": float(price)}
+                              for symbol, qty, price in positions}
+
+    def _delay(self):
+        delay_ms = self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay_ms > 0:
+            time.sleep(delay_ms / 1000)
+
+    def _should_fail(self):
+        return self.error_rate > 0 and self._random.random() < self.error_rate
+
+    def _fill(self, symbol, qty, side):
+        """
+        Applies a filled order to the positions and returns the fill price
+        """
+        price = option_fair_price(symbol, self.underlying_price) if len(symbol) > 6 else self.underlying_price
+        signed = qty if side == "buy" else -qty
+        with self._lock:
+            position = self.positions.get(symbol)
+            if position is None:
+                self.positions[symbol] = {"qty": signed, "avg_entry_price": price}
+            else:
+                position["qty"] += signed
+                if abs(position["qty"]) < 1e-9:
+                    del self.positions[symbol]
+        return price
+
+    def _order_json(self, client_order_id, symbol, qty, side, price, order_class="simple", legs=None):
+        now = _now_iso()
+        return {
+            "id": str(uuid.uuid4()),
+            "client_order_id": client_order_id or uuid.uuid4().hex,
+            "created_at": now,
+            "updated_at": now,
+            "submitted_at": now,
+            "filled_at": now,
+            "asset_class": "us_option",
+            "symbol": symbol,
+            "qty": str(qty),
+            "filled_qty": str(qty),
+            "filled_avg_price": None if price is None else str(price),
+            "order_class": order_class,
+            "order_type": "market",
+            "type": "market",
+            "side": side,
+            "time_in_force": "day",
+            "status": "filled",
+            "extended_hours": False,
+            "legs": legs
+        }
+
+    def submit_order(self, body):
+        """
+        Fills a simple or multi-leg order and records it by client_order_id
+        """
+        qty = float(body.get("qty") or 1)
+        if body.get("order_class") == "mleg":
+            legs = []
+            for leg in body.get("legs", []):
+                price = self._fill(leg["symbol"], qty, leg["side"])
+                legs.append(self._order_json(None, leg["symbol"], qty, leg["side"], price))
+            order = self._order_json(body.get("client_order_id"), None, qty, None, None, "mleg", legs)
+        else:
+            price = self._fill(body["symbol"], qty, body["side"])
+            order = self._order_json(body.get("client_order_id"), body["symbol"], qty, body["side"], price)
+
+        with self._lock:
+            self.orders[order["client_order_id"]] = order
+        self.publish_fill(order)
+        return order
+
+    def orders_json(self, after=None, until=None, limit=50, status=None):
+        """
+        Orders newest first, submitted after and before the given ISO times; status 'open' leaves
+        out the filled and canceled ones
+        """
+        with self._lock:
+            orders = list(reversed(self.orders.values()))
+        after = datetime.fromisoformat(after) if after else None
+        until = datetime.fromisoformat(until) if until else None
+        orders = [order for order in orders
+                  if (after is None or datetime.fromisoformat(order["submitted_at"]) > after)
+                  and (until is None or datetime.fromisoformat(order["submitted_at"]) < until)
+                  and (status != "open" or order["status"] not in ("filled", "canceled", "expired", "rejected"))]
+        return orders[:limit]
+
+    def positions_json(self):
+        with self._lock:
+            positions = list(self.positions.items())
+        return [{
+            "asset_id": str(uuid.UUID(int=abs(hash(symbol)) % (1 << 128))),
+            "symbol": symbol,
+            "exchange": "",
+            "asset_class": "us_option" if len(symbol) > 6 else "us_equity",
+            "avg_entry_price": str(position["avg_entry_price"]),
+            "qty": str(position["qty"]),
+            "side": "long" if position["qty"] > 0 else "short",
+            "cost_basis": str(position["avg_entry_price"] * position["qty"] * 100)
+        } for symbol, position in positions]
+
+    def close_all_json(self):
+        responses = []
+        for position in self.positions_json():
+            qty = abs(float(position["qty"]))
+            side = "sell" if float(position["qty"]) > 0 else "buy"
+            price = self._fill(position["symbol"], qty, side)
+            responses.append({"symbol": position["symbol"], "status": 200,
+                              "body": self._order_json(None, position["symbol"], qty, side, price)})
+        return responses
+
+    def clock_json(self):
+        now = datetime.now(timezone.utc)
+        return {"timestamp": now.isoformat(), "is_open": True,
+                "next_open": (now + timedelta(days=1)).isoformat(), "next_close": (now + timedelta(hours=1)).isoformat()}
+
+    def latest_bars_json(self, symbols):
+        now = _now_iso()
+        price = self.underlying_price
+        return {"bars": {symbol: {"t": now, "o": price, "h": price, "l": price, "c": price, "v": 1000, "n": 10,
+                                  "vw": price} for symbol in symbols}}
+
+    def latest_quotes_json(self, symbols):
+        now = _now_iso()
+        quotes = {}
+        for symbol in symbols:
+            mid = option_fair_price(symbol, self.underlying_price) if len(symbol) > 6 else self.underlying_price
+            quotes[symbol] = {"t": now, "bp": round(mid - 0.05, 2), "bs": 10, "bx": "X",
+                              "ap": round(mid + 0.05, 2), "as": 10, "ax": "X", "c": []}
+        return {"quotes": quotes}
+
+    def latest_trades_json(self, symbols):
+        now = _now_iso()
+        return {"trades": {symbol: {"t": now, "x": "X", "s": 1, "c": [],
+                                    "p": option_fair_price(symbol, self.underlying_price) if len(symbol) > 6
+                                    else self.underlying_price} for symbol in symbols}}
+
+    def option_contracts_json(self, underlyings, expiration, strike_step=1.0):
+        """
+        Active contracts of one expiry with strikes every strike_step within 20% of the underlying price
+        """
+        low = int(self.underlying_price * 0.8 / strike_step)
+        high = int(self.underlying_price * 1.2 / strike_step)
+        expiry = datetime.strptime(expiration, "%Y-%m-%d")
+        contracts = []
+        for underlying in underlyings:
+            for right, contract_type in (("P", "put"), ("C", "call")):
+                for step in range(low, high + 1):
+                    strike = step * strike_step
+                    symbol = f"{underlying}{expiry.strftime('%y%m%d')}{right}{int(round(strike * 1000)):08d}"
+                    contracts.append({"id": str(uuid.uuid4()), "symbol": symbol, "name": symbol, "status": "active",
+                                      "tradable": True, "expiration_date": expiration, "root_symbol": underlying,
+                                      "underlying_symbol": underlying, "underlying_asset_id": str(uuid.uuid4()),
+                                      "type": contract_type, "style": "american", "strike_price": str(strike),
+                                      "size": "100"})
+        return {"option_contracts": contracts, "next_page_token": None}
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; without TCP_NODELAY each response waits on a delayed ACK
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _route(self, method):
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else {}
+
+                key = f"{method} {url.path}"
+                with fake._lock:
+                    fake.request_counts[key] = fake.request_counts.get(key, 0) + 1
+
+                fake._delay()
+                if fake._should_fail():
+                    return self._send(503, {"code": 50300000, "message": "injected failure"})
+
+                symbols = ",".join(query.get("symbols", [""])).split(",")
+                path = url.path
+
+                if method == "GET" and path.endswith("/v2/clock"):
+                    return self._send(200, fake.clock_json())
+                if method == "GET" and path.endswith("/v2/positions"):
+                    return self._send(200, fake.positions_json())
+                if method == "DELETE" and path.endswith("/v2/positions"):
+                    return self._send(207, fake.close_all_json())
+                if method == "POST" and path.endswith("/v2/orders"):
+                    return self._send(200, fake.submit_order(body))
+                if method == "GET" and path.endswith("/v2/orders"):
+                    return self._send(200, fake.orders_json(query.get("after", [None])[0], query.get("until", [None])[0],
+                                                            int(query.get("limit", ["50"])[0]),
+                                                            query.get("status", [None])[0]))
+                if method == "GET" and path.endswith("/v2/orders:by_client_order_id"):
+                    order = fake.orders.get(query.get("client_order_id", [""])[0])
+                    if order is None:
+                        return self._send(404, {"code": 40410000, "message": "order not found"})
+                    return self._send(200, order)
+                if method == "GET" and path.endswith("/v2/options/contracts"):
+                    underlyings = ",".join(query.get("underlying_symbols", [""])).split(",")
+                    return self._send(200, fake.option_contracts_json(underlyings, query["expiration_date"][0]))
+                if method == "GET" and path.endswith("/stocks/bars/latest"):
+                    return self._send(200, fake.latest_bars_json(symbols))
+                if method == "GET" and path.endswith("/quotes/latest"):
+                    return self._send(200, fake.latest_quotes_json(symbols))
+                if method == "GET" and path.endswith("/trades/latest"):
+                    return self._send(200, fake.latest_trades_json(symbols))
+
+                return self._send(404, {"code": 40400000, "message": f"no fake endpoint for {method} {path}"})
+
+            def do_GET(self):
+                self._route("GET")
+
+            def do_POST(self):
+                self._route("POST")
+
+            def do_DELETE(self):
+                self._route("DELETE")
+
+        return Handler
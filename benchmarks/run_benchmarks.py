@@ -0,0 +1,551 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import datetime
+import subprocess
+from benchmarks.fake_alpaca import FakeAlpacaServer
+from dir_path import base_dirname
+
+# Position counts for the stop-loss cycle and time-to-flat benchmarks
+POSITION_COUNTS = (2, 20, 200)
+
+# Universe sizes for the multi-underlying entry benchmark
+UNIVERSE_SIZES = (1, 10, 50)
+
+# Account counts for the multi-account fan-out benchmark
+ACCOUNT_COUNTS = (1, 2, 4)
+
+# Underlying price served by the fake server and the stored previous close; 500 < 502 < 1.01*500 fires the put spread
+FAKE_UNDERLYING_PRICE = 502.0
+FAKE_PREVIOUS_CLOSE = 500.0
+
+
+def _summarize(samples_ms):
+    """
+    Count, mean, p50, p90 and max of a list of millisecond samples
+    """
+    if not samples_ms:
+        return {"count": 0}
+    ordered = sorted(samples_ms)
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered),
+        "p50_ms": ordered[len(ordered) // 2],
+        "p90_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))],
+        "max_ms": ordered[-1]
+    }
+
+
+def _git_commit():
+    """
+    Returns the short hash of the checked-out commit, or None outside a git checkout
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=base_dirname, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def spread_positions(count, expiry, underlying_price=FAKE_UNDERLYING_PRICE):
+    """
+    Builds count option legs as put credit spreads below the underlying
+
+    Returns:
+    - list: (symbol, qty, avg_entry_price) tuples
+    """
+    from benchmarks.fake_alpaca import option_fair_price
+
+    positions = []
+    for i in range(count // 2):
+        for strike, qty in ((int(underlying_price) - 10 - 2 * i, 1), (int(underlying_price) - 9 - 2 * i, -1)):
+            symbol = f"QQQ{expiry.strftime('%y%m%d')}P{strike * 1000:08d}"
+            positions.append((symbol, qty, option_fair_price(symbol, underlying_price)))
+    return positions
+
+
+def reset_session_journal():
+    """
+    Starts the session journal over, so a repeated entry is not skipped as already sent this session
+    """
+    import helper.session_journal as session_journal
+
+    session_journal.close_session_journal()
+    if os.path.isdir(session_journal.JOURNAL_DIR):
+        for name in os.listdir(session_journal.JOURNAL_DIR):
+            os.remove(os.path.join(session_journal.JOURNAL_DIR, name))
+
+
+def bench_entry(server, trade_day, repeats):
+    """
+    End-to-end latency of place_qqq_option_spread_orders: latest bar, signal, both legs, order store write
+    """
+    import strategy.simple_strategy as simple_strategy
+
+    # The strategy only trades on expiry days, pin it to a trading day so the benchmark runs any day
+    simple_strategy.market_today = lambda: trade_day
+
+    samples = []
+    for _ in range(repeats):
+        server.set_positions([])
+        reset_session_journal()
+        started_at = time.perf_counter()
+        result = (simple_strategy.place_qqq_option_spread_orders() or {}).get("default")
+        samples.append((time.perf_counter() - started_at) * 1000)
+        if not result or "put_spread" not in result:
+            raise RuntimeError(f"Entry benchmark did not place the put spread: {result}")
+    return _summarize(samples)
+
+
+def universe_symbols(size):
+    """
+    Underlying symbols of a benchmark universe: QQQ followed by made-up tickers
+    """
+    return ["QQQ"] + [f"U{i:03d}" for i in range(1, size)]
+
+
+def bench_entry_universe(server, trade_day, repeats):
+    """
+    Latency of place_option_spread_orders as the universe grows: one batched latest-bar request,
+    then one put spread per underlying sent concurrently
+    """
+    import strategy.simple_strategy as simple_strategy
+
+    # Made-up tickers have no expiry calendar, treat every underlying as expiring today
+    simple_strategy.market_today = lambda: trade_day
+    simple_strategy.is_expiry_day = lambda date_, underlying: True
+
+    results = {}
+    for size in UNIVERSE_SIZES:
+        symbols = universe_symbols(size)
+        samples = []
+        for _ in range(repeats):
+            server.set_positions([])
+            reset_session_journal()
+            started_at = time.perf_counter()
+            result = (simple_strategy.place_option_spread_orders(symbols) or {}).get("default", {})
+            samples.append((time.perf_counter() - started_at) * 1000)
+            placed = sum(1 for spreads in result.values() if "error" not in spreads.get("put_spread", {}))
+            if placed != size:
+                raise RuntimeError(f"Universe entry benchmark placed {placed} of {size} put spreads")
+        results[str(size)] = _summarize(samples)
+    return results
+
+
+def bench_entry_accounts(server, trade_day, repeats):
+    """
+    Latency of place_option_spread_orders fanning the QQQ put spread out to several accounts
+    """
+    import strategy.simple_strategy as simple_strategy
+
+    simple_strategy.market_today = lambda: trade_day
+
+    results = {}
+    for count in ACCOUNT_COUNTS:
+        accounts = [{"name": f"bench{i}", "key": "benchmark", "secret": "benchmark", "paper": True, "quantity": i + 1}
+                    for i in range(count)]
+        samples = []
+        for _ in range(repeats):
+            server.set_positions([])
+            reset_session_journal()
+            started_at = time.perf_counter()
+            result = simple_strategy.place_option_spread_orders(["QQQ"], accounts) or {}
+            samples.append((time.perf_counter() - started_at) * 1000)
+            placed = sum(1 for spreads in result.values() if "error" not in spreads.get("QQQ", {}).get("put_spread", {}))
+            if placed != count:
+                raise RuntimeError(f"Account fan-out benchmark placed the spread in {placed} of {count} accounts")
+        results[str(count)] = _summarize(samples)
+    return results
+
+
+def bench_stop_loss_cycle(server, trade_day, repeats, order_db_path):
+    """
+    Cycle time of check_and_close_losing_positions at each position count: the first cycle fetches
+    positions and quotes, the following ones reuse the cached positions
+    """
+    import helper.order_store as order_store
+    from data_process.pnl import check_and_close_losing_positions, get_pnl_tracker
+
+    # Without the entry benchmark's orders there is no premium, so the book stop loss never fires, and the
+    # legs are quoted at their entry prices, so no spread reaches its own stop-loss level either
+    order_store.ORDER_DB_PATH = order_db_path
+    tracker = get_pnl_tracker()
+    tracker.load_session(force=True)
+
+    results = {}
+    for count in POSITION_COUNTS:
+        server.set_positions(spread_positions(count, trade_day))
+        tracker.invalidate_positions()
+
+        started_at = time.perf_counter()
+        check_and_close_losing_positions()
+        cold_ms = (time.perf_counter() - started_at) * 1000
+
+        samples = []
+        for _ in range(repeats):
+            started_at = time.perf_counter()
+            check_and_close_losing_positions()
+            samples.append((time.perf_counter() - started_at) * 1000)
+
+        if len(server.positions) != count:
+            raise RuntimeError("Stop-loss benchmark closed positions, the measured cycles are not comparable")
+        results[str(count)] = {"cold_ms": cold_ms, "warm": _summarize(samples)}
+    return results
+
+
+def bench_time_to_flat(server, trade_day, repeats):
+    """
+    Wall-clock time for close_all_option_positions to flatten each position count
+    """
+    from helper.order import close_all_option_positions
+
+    results = {}
+    for count in POSITION_COUNTS:
+        samples = []
+        failures = 0
+        for _ in range(repeats):
+            server.set_positions(spread_positions(count, trade_day))
+            started_at = time.perf_counter()
+            result = close_all_option_positions()
+            samples.append((time.perf_counter() - started_at) * 1000)
+            failures += len(result.get("failed_positions", []))
+        results[str(count)] = {**_summarize(samples), "failed_positions": failures, "flat": not server.positions}
+    return results
+
+
+def _wait_for(condition, timeout, message):
+    """
+    Polls condition until it is true, raising RuntimeError with message after timeout seconds
+    """
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise RuntimeError(message)
+        time.sleep(0.001)
+
+
+def bench_stop_loss_stream(server, trade_day, repeats):
+    """
+    Streaming stop loss against the fake option quote websocket: CPU used while there are no open
+    legs (the websocket must not be started yet), then the time from a quote that breaches a
+    spread's stop-loss level to the spread being flat (quote, evaluation, closing orders)
+    """
+    import data_process.pnl as pnl
+    from data_process.quote_stream import StopLossQuoteStream
+
+    # Each spread is checked against its own level; each repeat uses new strikes so no leg is still closing
+    scope, pnl.STOP_LOSS_SCOPE = pnl.STOP_LOSS_SCOPE, "spread"
+    spreads = spread_positions(2 * repeats, trade_day)
+    tracker = pnl.get_pnl_tracker()
+    server.set_positions([])
+    tracker.invalidate_positions()
+
+    stream = StopLossQuoteStream(url_override=server.quote_stream_url)
+    stream.start()
+    try:
+        started_cpu = time.process_time()
+        time.sleep(1)
+        idle_cpu_ms = (time.process_time() - started_cpu) * 1000
+        if stream._stream_thread is not None:
+            raise RuntimeError("Stop-loss quote stream started without open legs")
+
+        samples = []
+        for i in range(repeats):
+            (long_symbol, _, _), (short_symbol, _, _) = spreads[2 * i:2 * i + 2]
+            # 0.35 credit, so the stop-loss level is a $70 loss
+            server.set_positions([(long_symbol, 1, 0.25), (short_symbol, -1, 0.60)])
+            tracker.invalidate_positions()
+            _wait_for(lambda: {long_symbol, short_symbol} <= server.quote_subscriptions, 10,
+                      "Stop-loss stream did not subscribe to the spread's quotes")
+
+            server.publish_quote(long_symbol, 0.20, 0.30)
+            server.publish_quote(short_symbol, 0.55, 0.65)
+            # Let the debounced evaluation run, so the breaching quote is evaluated as it arrives
+            time.sleep(stream.debounce_seconds)
+            _wait_for(lambda: stream._pending_since is None, 5, "Debounced stop-loss evaluation did not run")
+            time.sleep(stream.debounce_seconds)
+
+            # The short leg at 1.50 is a $90 loss
+            published_at = time.perf_counter()
+            server.publish_quote(short_symbol, 1.45, 1.55)
+            _wait_for(lambda: not server.positions, 10, "Stop-loss stream did not close the breached spread")
+            samples.append((time.perf_counter() - published_at) * 1000)
+    finally:
+        stream.stop()
+        pnl.STOP_LOSS_SCOPE = scope
+    return {"idle_cpu_ms": idle_cpu_ms, "quote_to_flat": _summarize(samples), "stream": stream.get_metrics()}
+
+
+def bench_fill_ledger(server, trade_day, repeats):
+    """
+    Time from an order's submit response to its fill in the fill ledger, delivered by the
+    trade-updates stream (no polling of the order)
+    """
+    from helper.clients import get_trading_client
+    from helper.fill_ledger import get_fill_ledger
+    from helper.order import place_order
+    from data_process.trade_stream import TradeUpdateStream
+
+    ledger = get_fill_ledger()
+    stream = TradeUpdateStream(url_override=server.stream_url)
+    stream.start()
+    try:
+        deadline = time.monotonic() + 10
+        while server.stream_clients == 0:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Trade update stream did not connect to the fake server")
+            time.sleep(0.005)
+
+        symbol = spread_positions(2, trade_day)[0][0]
+        samples = []
+        for _ in range(repeats):
+            order = place_order(get_trading_client(), symbol, 1, "buy")
+            submitted_at = time.perf_counter()
+            while ledger.get(order["order_id"]) is None:
+                if time.perf_counter() - submitted_at > 5:
+                    raise RuntimeError(f"No fill for order {order['order_id']} reached the ledger")
+                time.sleep(0.0005)
+            samples.append((time.perf_counter() - submitted_at) * 1000)
+    finally:
+        stream.stop()
+    return {**_summarize(samples), "stream": stream.get_metrics()}
+
+
+def bench_risk_snapshot(trade_day, repeats):
+    """
+    Time to solve implied volatilities and Greeks of the whole book at each position count: the
+    first snapshot starts every solve from scratch, the following ones are seeded with the last
+    volatilities while prices move a little
+    """
+    from benchmarks.fake_alpaca import option_fair_price
+    from data_process.position_book import PositionBook
+    from data_process.risk import risk_snapshot
+    from helper.market_clock import MARKET_TIMEZONE
+
+    # Mid-session on the trade day, so the legs have time left whenever the benchmark runs
+    now = MARKET_TIMEZONE.localize(datetime.datetime.combine(trade_day, datetime.time(12, 0)))
+    results = {}
+    for count in POSITION_COUNTS:
+        positions = spread_positions(count, trade_day)
+        book = PositionBook()
+        book.set_positions({symbol: (qty, price) for symbol, qty, price in positions})
+        book.update_prices({symbol: price for symbol, _, price in positions})
+
+        started_at = time.perf_counter()
+        risk_snapshot(book, {"QQQ": FAKE_UNDERLYING_PRICE}, now)
+        cold_ms = (time.perf_counter() - started_at) * 1000
+
+        samples = []
+        for i in range(repeats):
+            spot = FAKE_UNDERLYING_PRICE + 0.05 * (i % 2)
+            book.update_prices({symbol: option_fair_price(symbol, spot) for symbol, _, _ in positions})
+            started_at = time.perf_counter()
+            risk_snapshot(book, {"QQQ": spot}, now)
+            samples.append((time.perf_counter() - started_at) * 1000)
+        results[str(count)] = {"cold_ms": cold_ms, "warm": _summarize(samples)}
+    return results
+
+
+def bench_iv_surface(trade_day, repeats, strikes=50):
+    """
+    Time to update the IV surface from a quote snapshot of both rights over a strike range: a full
+    solve into an empty slice, then snapshots where one quote changed, then a lookup of every strike
+    """
+    from benchmarks.fake_alpaca import option_fair_price
+    from helper.iv_surface import IVSurface
+    from helper.market_clock import MARKET_TIMEZONE
+
+    now = MARKET_TIMEZONE.localize(datetime.datetime.combine(trade_day, datetime.time(12, 0)))
+    spots = {"QQQ": FAKE_UNDERLYING_PRICE}
+    symbols = [f"QQQ{trade_day.strftime('%y%m%d')}{right}{strike * 1000:08d}"
+               for strike in range(int(FAKE_UNDERLYING_PRICE) - strikes // 2, int(FAKE_UNDERLYING_PRICE) + strikes // 2)
+               for right in ("P", "C")]
+    prices = {symbol: option_fair_price(symbol, FAKE_UNDERLYING_PRICE) for symbol in symbols}
+
+    surface = IVSurface()
+    started_at = time.perf_counter()
+    surface.update(prices, spots, now)
+    cold_ms = (time.perf_counter() - started_at) * 1000
+
+    update_samples, lookup_samples = [], []
+    for i in range(repeats):
+        prices[symbols[i % len(symbols)]] += 0.01
+        started_at = time.perf_counter()
+        surface.update(prices, spots, now)
+        update_samples.append((time.perf_counter() - started_at) * 1000)
+
+        started_at = time.perf_counter()
+        surface.mark_prices(symbols, now=now)
+        lookup_samples.append((time.perf_counter() - started_at) * 1000)
+    return {"contracts": len(symbols), "cold_ms": cold_ms, "one_quote_changed": _summarize(update_samples),
+            "mark_all": _summarize(lookup_samples)}
+
+
+def bench_journal(trade_day, directory, writers=8, records_per_writer=200, recovery_records=5000):
+    """
+    Session journal costs: latency of durable appends from concurrent writers sharing fsyncs
+    (records per commit shows the group commit), then the time to recover a session from the
+    journal alone and from its snapshot plus the records after it
+    """
+    import threading
+    from helper.session_journal import SessionJournal, SNAPSHOT_EVERY
+
+    journal = SessionJournal(trade_day, os.path.join(directory, "appends"))
+    journal.open()
+    samples = [[] for _ in range(writers)]
+
+    def write(writer):
+        for i in range(records_per_writer):
+            started_at = time.perf_counter()
+            journal.append("job_done", job=f"writer{writer}_{i}")
+            samples[writer].append((time.perf_counter() - started_at) * 1000)
+
+    threads = [threading.Thread(target=write, args=(writer,)) for writer in range(writers)]
+    started_at = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started_at
+    journal.close()
+    metrics = journal.get_metrics()
+
+    recovery = {}
+    for name, with_snapshot in (("journal_only", False), ("with_snapshot", True)):
+        journal = SessionJournal(trade_day, os.path.join(directory, name))
+        journal.open()
+        for i in range(recovery_records):
+            journal.append("job_done", durable=False, job=f"job{i}")
+        journal.close()
+        if not with_snapshot:
+            os.remove(journal.snapshot_path)
+        recovery[name] = SessionJournal(trade_day, os.path.join(directory, name)).recover()
+
+    return {
+        "writers": writers,
+        "records_per_second": metrics["records"] / elapsed,
+        "records_per_commit": metrics["records"] / max(metrics["commits"], 1),
+        "append": _summarize([sample for writer in samples for sample in writer]),
+        "snapshot_every": SNAPSHOT_EVERY,
+        "recovery": recovery
+    }
+
+
+def bench_scheduler_jitter(interval_seconds=0.05, runs=60):
+    """
+    Wake-up lateness of JobScheduler for a short interval job
+    """
+    from helper.scheduler import JobScheduler
+
+    scheduler = JobScheduler()
+    samples = []
+
+    def job():
+        samples.append(scheduler.lateness["jitter"]["last_ms"])
+        if len(samples) >= runs:
+            scheduler.stop()
+
+    scheduler.add_interval_job("jitter", interval_seconds, job)
+    scheduler.run()
+    return {"interval_ms": interval_seconds * 1000, **_summarize(samples[1:])}
+
+
+def run_benchmarks(latency_ms=20.0, jitter_ms=5.0, error_rate=0.0, repeats=10, seed=0):
+    """
+    Runs all benchmarks against a fresh fake Alpaca server and scratch data directories
+
+    Parameters:
+    - latency_ms: Fake server latency per request
+    - jitter_ms: Uniform jitter added to the latency
+    - error_rate: Fraction of requests answered with a 503
+    - repeats: Samples per benchmark
+    - seed: Random seed of the fake server
+
+    Returns:
+    - dict: Benchmark results and the configuration they ran with
+    """
+    server = FakeAlpacaServer(latency_ms, jitter_ms, error_rate, FAKE_UNDERLYING_PRICE, seed)
+    url = server.start()
+
+    # Point the shared clients at the fake server before any client module is imported
+    os.environ["ALP_TRADING_URL"] = url
+    os.environ["ALP_DATA_URL"] = url
+    os.environ.setdefault("ALP_KEY", "benchmark")
+    os.environ.setdefault("ALP_SECRET", "benchmark")
+    os.environ.setdefault("ALP_REQUESTS_PER_MINUTE", "1000000")
+
+    import logging
+    import helper.order_store as order_store
+    import helper.price_store as price_store
+    import helper.session_journal as session_journal
+    from helper.market_clock import market_today, is_trading_day, previous_trading_day
+    from helper.clients import get_connection_stats
+    from helper.option_chain import get_option_chain_index
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    trade_day = market_today()
+    if not is_trading_day(trade_day):
+        trade_day = previous_trading_day(trade_day)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        # Keep benchmark orders and prices out of data/
+        order_store.ORDER_DB_PATH = os.path.join(scratch, "orders.db")
+        price_store._store = price_store.PriceStore(os.path.join(scratch, "prices"))
+        session_journal.JOURNAL_DIR = os.path.join(scratch, "journal")
+        get_option_chain_index().load(universe_symbols(max(UNIVERSE_SIZES)), trade_day)
+        for symbol in universe_symbols(max(UNIVERSE_SIZES)):
+            price_store._store.append(symbol, [previous_trading_day(trade_day)], [FAKE_PREVIOUS_CLOSE])
+
+        try:
+            results = {
+                "entry_latency": bench_entry(server, trade_day, repeats),
+                "entry_universe": bench_entry_universe(server, trade_day, repeats),
+                "entry_accounts": bench_entry_accounts(server, trade_day, repeats),
+                "stop_loss_cycle": bench_stop_loss_cycle(server, trade_day, repeats,
+                                                         os.path.join(scratch, "orders_cycle.db")),
+                "time_to_flat": bench_time_to_flat(server, trade_day, repeats),
+                "stop_loss_stream": bench_stop_loss_stream(server, trade_day, repeats),
+                "fill_ledger": bench_fill_ledger(server, trade_day, repeats),
+                "risk_snapshot": bench_risk_snapshot(trade_day, repeats),
+                "iv_surface": bench_iv_surface(trade_day, repeats),
+                "journal": bench_journal(trade_day, os.path.join(scratch, "journal_bench")),
+                "scheduler_jitter": bench_scheduler_jitter()
+            }
+        finally:
+            session_journal.close_session_journal()
+            server.stop()
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {"latency_ms": latency_ms, "jitter_ms": jitter_ms, "error_rate": error_rate, "repeats": repeats,
+                   "requests_per_minute": int(os.environ["ALP_REQUESTS_PER_MINUTE"])},
+        "results": results,
+        "connections": get_connection_stats()["total"],
+        "server_requests": dict(sorted(server.request_counts.items()))
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks against a local fake Alpaca server")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--output", help="Write the JSON report to this file as well as stdout")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.latency_ms, args.jitter_ms, args.error_rate, args.repeats)
+    output = json.dumps(report, indent=2, default=str)
+    print(output)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output)
+        print(f"Report written to {args.output}", file=sys.stderr)
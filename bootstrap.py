@@ -0,0 +1,78 @@
+import os
+import time
+import logging
+
+# Taken when the first module imports bootstrap, the baseline if the process start time is not available
+_imported_at = time.perf_counter()
+
+# Process that ran bootstrap(); a forked child runs it again to start its own log writer thread
+_bootstrapped_pid = None
+_startup = {}
+
+
+def _process_age_seconds():
+    """
+    Seconds since the process started, from /proc on Linux; None elsewhere
+    """
+    try:
+        with open("/proc/self/stat") as stat_file:
+            # The command name may contain spaces, fields after it are counted from the closing parenthesis
+            fields = stat_file.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as uptime_file:
+            uptime = float(uptime_file.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def bootstrap():
+    """
+    Loads .env and sets up logging, once per process. Every module calls this at import;
+    only the first call does any work.
+    """
+    global _bootstrapped_pid
+    if _bootstrapped_pid == os.getpid():
+        return
+
+    started_at = time.perf_counter()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    # log_config reads its settings from the environment at import, so it is imported after .env
+    from log_config import configure_logging
+    configure_logging()
+
+    _bootstrapped_pid = os.getpid()
+    _startup["bootstrap_ms"] = (time.perf_counter() - started_at) * 1000
+
+
+def mark_ready(name="scheduler"):
+    """
+    Records and logs how long the process took to become ready
+
+    Parameters:
+    - name: What became ready, used in the log line
+
+    Returns:
+    - dict: Milliseconds since process start (when known), since bootstrap was imported, and spent in bootstrap()
+    """
+    process_age = _process_age_seconds()
+    _startup.update({
+        "ready": name,
+        "since_process_start_ms": process_age * 1000 if process_age is not None else None,
+        "since_bootstrap_import_ms": (time.perf_counter() - _imported_at) * 1000
+    })
+
+    since_start = _startup["since_process_start_ms"]
+    logging.info("Startup: %s ready %s ms after process start (%.1f ms after bootstrap import, bootstrap %.1f ms)",
+                 name, f"{since_start:.1f}" if since_start is not None else "?",
+                 _startup["since_bootstrap_import_ms"], _startup.get("bootstrap_ms", 0.0))
+    return dict(_startup)
+
+
+def get_startup_report():
+    """
+    Returns the startup timings recorded by bootstrap() and mark_ready()
+    """
+    return dict(_startup)
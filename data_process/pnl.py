@@ -1,140 +1,469 @@
 import os
-from datetime import datetime
-import json
-from alpaca.data.historical import StockHistoricalDataClient
-from alpaca.data.requests import StockLatestBarRequest, StockLatestQuoteRequest
-from alpaca.trading.client import TradingClient
-from helper.order import close_all_option_positions
-from dir_path import base_dirname
-from log_config import configure_logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+from helper.clients import get_trading_client, get_option_data_client, get_stock_data_client
+from helper.accounts import DEFAULT_ACCOUNT
+from helper.option_symbol import is_option_symbol, parse_option_symbol
+from helper.order import close_all_option_positions, close_option_legs, get_position_revision
+from helper.order_store import query_orders, get_store_revision
+from helper.fill_ledger import get_fill_ledger
+from helper.iv_surface import get_iv_surface
+from helper.session_journal import get_session_journal
+from helper.broker_call import call_broker
+from helper.market_clock import market_today
+from helper.tracing import span, traced
+from strategy.spread_rules import DEFAULT_SPREAD_PARAMS, stop_loss_level, risk_exit_signal
+from data_process.position_book import PositionBook
+from data_process.risk import risk_snapshot
+from bootstrap import bootstrap
 import logging
 
-from dotenv import load_dotenv
+bootstrap()
 
-load_dotenv()
+# Positions are re-fetched at least this often even when this process sent no orders
+POSITION_REFRESH_SECONDS = 60
 
-configure_logging()
+# Option market data batching: symbols per request and concurrent requests
+QUOTE_BATCH_SIZE = 100
+QUOTE_WORKERS = 4
 
-API_KEY = os.getenv("ALP_KEY")
-API_SECRET = os.getenv("ALP_SECRET")
+# Quotes older than this are treated as stale and not used for pricing
+MAX_QUOTE_AGE_SECONDS = 60
 
+# What the stop loss closes: 'book' closes every option position once the total P&L reaches the stop loss
+# of today's premiums; 'spread' also closes each spread whose loss reached its own stop-loss level
+STOP_LOSS_SCOPE = os.getenv("STOP_LOSS_SCOPE", "book").lower()
 
-def load_order_history(strategy_name=None, date=None):
+# Close a spread once the |delta| of its short leg reaches this, e.g. 0.5 with the underlying at the
+# short strike. Unset leaves the risk exit off and only the P&L stop loss closes spreads
+RISK_EXIT_SHORT_DELTA = os.getenv("RISK_EXIT_SHORT_DELTA")
+SPREAD_PARAMS = dict(DEFAULT_SPREAD_PARAMS)
+if RISK_EXIT_SHORT_DELTA:
+    SPREAD_PARAMS["short_delta_exit"] = float(RISK_EXIT_SHORT_DELTA)
+
+
+def load_order_history(strategy_name=None, date=None, account=DEFAULT_ACCOUNT):
     """
-    Loads order history from saved files
+    Loads order history from the indexed order store
 
     Parameters:
     - strategy_name: Optional filter by strategy name
     - date: Optional specific date to load (format: DDMMYYYY string or datetime object)
+    - account: Account whose orders to load; the P&L is tracked on the default account's positions
 
     Returns:
     - list: Order details
     """
-    orders = []
-
     try:
-        # Set up the directory
-        order_dir = os.path.join(base_dirname, "data", "orders")
-
-        # Convert date to string if it's a datetime object
-        if isinstance(date, datetime):
-            date = date.strftime("%d%m%Y")
-
-        # Get list of files to process
-        if strategy_name and date:
-            # Specific strategy and date
-            files = [os.path.join(order_dir, f"{strategy_name}_{date}.txt")]
-        elif strategy_name:
-            # All files for a specific strategy
-            files = [f for f in os.listdir(order_dir) if f.startswith(f"{strategy_name}_")]
-            files = [os.path.join(order_dir, f) for f in files]
-        elif date:
-            # All strategies for a specific date
-            files = [f for f in os.listdir(order_dir) if f.endswith(f"_{date}.txt")]
-            files = [os.path.join(order_dir, f) for f in files]
-        else:
-            # All files
-            files = [os.path.join(order_dir, f) for f in os.listdir(order_dir) if f.endswith(".txt")]
-
-        # Process each file
-        for file_path in files:
-            if os.path.exists(file_path):
-                with open(file_path, 'r') as file:
-                    for line in file:
-                        line = line.strip()
-                        if line:
-                            try:
-                                order = json.loads(line)
-                                orders.append(order)
-                            except json.JSONDecodeError:
-                                logging.warning(f"Could not parse line: {line}")
-
-        return orders
+        orders = query_orders(strategy_name=strategy_name, date=date)
+        # Orders saved before accounts were recorded belong to the default account
+        return [order for order in orders if order.get("account", DEFAULT_ACCOUNT) == account]
 
     except Exception as e:
-        logging.error(f"Error loading order history: {str(e)}")
+        logging.error("Error loading order history: %s", e)
         return []
 
 
-def get_current_option_prices(symbols):
+def quote_mid_price(bid, ask):
     """
-    Gets current market prices for option symbols
+    Returns the midpoint of bid and ask, or whichever side is available
+
+    Parameters:
+    - bid: Bid price (may be 0 or None)
+    - ask: Ask price (may be 0 or None)
+
+    Returns:
+    - float: Price, or None when neither side is available
+    """
+    # Use midpoint if both bid and ask are available
+    if bid and ask:
+        return (bid + ask) / 2
+    # Otherwise use whichever is available
+    elif bid:
+        return bid
+    elif ask:
+        return ask
+    return None
+
+
+def _fetch_in_batches(fetch, symbols):
+    """
+    Runs a batched market data request over chunks of symbols on a bounded worker pool
+
+    Parameters:
+    - fetch: Callable taking a list of symbols and returning a symbol keyed mapping
+    - symbols: List of symbols
+
+    Returns:
+    - dict: Merged symbol keyed results of every chunk that succeeded
+    """
+    chunks = [symbols[i:i + QUOTE_BATCH_SIZE] for i in range(0, len(symbols), QUOTE_BATCH_SIZE)]
+    results = {}
+
+    if len(chunks) == 1:
+        results.update(fetch(chunks[0]))
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(QUOTE_WORKERS, len(chunks))) as executor:
+        for chunk, future in [(chunk, executor.submit(fetch, chunk)) for chunk in chunks]:
+            try:
+                results.update(future.result())
+            except Exception as e:
+                logging.warning("Batch request for %d symbols failed: %s", len(chunk), e)
+
+    return results
+
+
+def _is_stale(timestamp, now):
+    """
+    Tells whether market data from timestamp is older than MAX_QUOTE_AGE_SECONDS; data without a
+    timestamp is taken as current
+    """
+    return timestamp is not None and (now - timestamp).total_seconds() > MAX_QUOTE_AGE_SECONDS
+
+
+def _is_usable_quote(quote, now):
+    """
+    Rejects quotes that are stale or crossed
+
+    Parameters:
+    - quote: Option quote with bid_price, ask_price and timestamp
+    - now: Current UTC datetime
+
+    Returns:
+    - bool: True if the quote can be used for pricing
+    """
+    if quote.bid_price and quote.ask_price and quote.bid_price > quote.ask_price:
+        return False
+    if _is_stale(quote.timestamp, now):
+        return False
+    return True
+
+
+def get_option_quote_prices(symbols):
+    """
+    Gets the quote midpoint of option symbols
+
+    Latest quotes are fetched in chunked batch requests that run concurrently. Stale or
+    crossed quotes are discarded.
 
     Parameters:
     - symbols: List of option symbols
 
     Returns:
-    - dict: Symbol to price mapping
+    - dict: Symbol to price mapping, for symbols with a usable quote
     """
+    from alpaca.data.requests import OptionLatestQuoteRequest
+
     prices = {}
 
     try:
-        # Initialize client for market data
-        data_client = StockHistoricalDataClient(API_KEY, API_SECRET)
+        # Use the shared option market data client
+        data_client = get_option_data_client()
+        symbols = list(symbols)
 
         # Get latest quotes for all symbols
-        request_params = StockLatestQuoteRequest(symbol_or_symbols=symbols)
+        latest_quotes = _fetch_in_batches(
+            lambda chunk: call_broker("get_option_latest_quote", data_client.get_option_latest_quote,
+                                      OptionLatestQuoteRequest(symbol_or_symbols=chunk), api="market_data"),
+            symbols
+        )
+
+        # Extract midpoint prices from quotes
+        now = datetime.now(timezone.utc)
+        for symbol in symbols:
+            quote = latest_quotes.get(symbol)
+            if quote is None:
+                continue
+            if not _is_usable_quote(quote, now):
+                logging.warning("Ignoring stale or crossed quote for %s: bid %s, ask %s, at %s",
+                                symbol, quote.bid_price, quote.ask_price, quote.timestamp)
+                continue
+            price = quote_mid_price(quote.bid_price, quote.ask_price)
+            if price is not None:
+                prices[symbol] = price
+    except Exception as e:
+        logging.warning("Error getting quotes: %s", e)
 
+    return prices
+
+
+def price_unquoted_options(symbols, prices, spots=None):
+    """
+    Prices the options that have no usable quote. Given underlying prices, the quoted prices update
+    the implied-volatility surface and the other symbols are marked off it; the rest fall back to
+    their latest trade, in batches, unless that is stale too; those stay unpriced.
+
+    Parameters:
+    - symbols: List of option symbols
+    - prices: Symbol to quote midpoint mapping from get_option_quote_prices, updated in place
+    - spots: Optional underlying symbol to price mapping
+
+    Returns:
+    - dict: prices, with the symbols that could be priced added
+    """
+    from alpaca.data.requests import OptionLatestTradeRequest
+
+    if spots:
+        # Illiquid legs without a usable quote are priced at the volatility of the strikes around them
         try:
-            latest_quotes = data_client.get_stock_latest_quote(request_params)
-
-            # Extract midpoint prices from quotes
-            for symbol in symbols:
-                if symbol in latest_quotes:
-                    # Calculate midpoint of bid and ask
-                    bid = latest_quotes[symbol].bid_price
-                    ask = latest_quotes[symbol].ask_price
-
-                    # Use midpoint if both bid and ask are available
-                    if bid and ask:
-                        prices[symbol] = (bid + ask) / 2
-                    # Otherwise use whichever is available
-                    elif bid:
-                        prices[symbol] = bid
-                    elif ask:
-                        prices[symbol] = ask
+            surface = get_iv_surface()
+            surface.update(prices, spots)
+            marks = surface.mark_prices([symbol for symbol in symbols if symbol not in prices], spots)
+            if marks:
+                logging.info("Marked %d options without a usable quote off the IV surface", len(marks))
+                prices.update(marks)
         except Exception as e:
-            logging.warning(f"Error getting quotes: {str(e)}")
+            logging.warning("Could not mark options off the IV surface: %s", e)
 
-            # Fallback to getting latest trades
-            for symbol in symbols:
-                try:
-                    # Try to get latest bar for individual symbol
-                    bar_params = StockLatestBarRequest(symbol_or_symbols=symbol)
-                    latest_bar = data_client.get_stock_latest_bar(bar_params)
+    # Fallback to latest trades for symbols without a usable quote
+    missing = [symbol for symbol in symbols if symbol not in prices]
+    if missing:
+        try:
+            data_client = get_option_data_client()
+            latest_trades = _fetch_in_batches(
+                lambda chunk: call_broker("get_option_latest_trade", data_client.get_option_latest_trade,
+                                          OptionLatestTradeRequest(symbol_or_symbols=chunk), api="market_data"),
+                missing
+            )
+            now = datetime.now(timezone.utc)
+            for symbol in missing:
+                trade = latest_trades.get(symbol)
+                if trade is None:
+                    continue
+                # A trade from hours ago is no better a mark than the stale quote that was dropped
+                if _is_stale(trade.timestamp, now):
+                    logging.warning("Ignoring stale trade for %s: %s at %s", symbol, trade.price, trade.timestamp)
+                    continue
+                prices[symbol] = trade.price
+        except Exception as trade_error:
+            logging.warning("Could not get latest trades for %s: %s", missing, trade_error)
+
+    return prices
+
+
+def get_current_option_prices(symbols, spots=None):
+    """
+    Gets current market prices for option symbols
 
-                    if symbol in latest_bar:
-                        prices[symbol] = latest_bar[symbol].close
-                except Exception as bar_error:
-                    logging.warning(f"Could not get price for {symbol}: {str(bar_error)}")
+    Symbols are priced at their quote midpoint (see get_option_quote_prices), the others as in
+    price_unquoted_options.
 
-        return prices
+    Parameters:
+    - symbols: List of option symbols
+    - spots: Optional underlying symbol to price mapping
+
+    Returns:
+    - dict: Symbol to price mapping
+    """
+    try:
+        symbols = list(symbols)
+        return price_unquoted_options(symbols, get_option_quote_prices(symbols), spots)
 
     except Exception as e:
-        logging.error(f"Error getting current option prices: {str(e)}")
+        logging.error("Error getting current option prices: %s", e)
         return {}
 
 
+def get_underlying_prices(underlyings):
+    """
+    Gets the latest trade price of each underlying in one batched request
+
+    Parameters:
+    - underlyings: List of stock symbols
+
+    Returns:
+    - dict: Symbol to price mapping, empty if the request failed
+    """
+    from alpaca.data.requests import StockLatestTradeRequest
+
+    if not underlyings:
+        return {}
+
+    try:
+        data_client = get_stock_data_client()
+        latest_trades = call_broker("get_stock_latest_trade", data_client.get_stock_latest_trade,
+                                    StockLatestTradeRequest(symbol_or_symbols=list(underlyings)), api="market_data")
+        return {symbol: trade.price for symbol, trade in latest_trades.items()}
+    except Exception as e:
+        logging.warning("Could not get underlying prices for %s: %s", underlyings, e)
+        return {}
+
+
+def summarize_order_premiums(today_orders, ledger=None):
+    """
+    Extracts premium information and the stop-loss level from today's orders, priced at their
+    fills in the fill ledger
+
+    Orders the ledger has no fill for yet are left out. Without any filled order there is no
+    premium, and no stop-loss level is returned.
+
+    Parameters:
+    - today_orders: List of today's orders
+    - ledger: FillLedger with the orders' fills (default the shared ledger)
+
+    Returns:
+    - tuple: (dict with 'strategy_premium' and 'stop_loss', symbol to premium mapping)
+    """
+    premium_info = {}
+    order_premium_map = {}
+
+    if not today_orders:
+        return premium_info, order_premium_map
+
+    ledger = ledger or get_fill_ledger()
+
+    # Calculate total premium for the strategy
+    premium_paid = 0
+    premium_received = 0
+    filled_orders = 0
+
+    for order in today_orders:
+        fill = ledger.get(order.get("order_id"))
+        if fill is None or not fill["filled_qty"] or fill["filled_avg_price"] is None:
+            continue
+
+        premium = fill["filled_avg_price"] * fill["filled_qty"] * 100  # * 100 for option contracts
+        if order.get("side") == "buy":
+            premium_paid += premium
+        elif order.get("side") == "sell":
+            premium_received += premium
+        filled_orders += 1
+
+        # Map order symbol to premium
+        order_premium_map[order.get("symbol")] = fill["filled_avg_price"] * 100
+
+    if not filled_orders:
+        return premium_info, order_premium_map
+
+    # Net premium is what you paid minus what you received
+    net_premium = premium_paid - premium_received
+
+    premium_info["strategy_premium"] = {
+        "paid": premium_paid,
+        "received": premium_received,
+        "net": net_premium,
+        "filled_orders": filled_orders,
+        "unfilled_orders": len(today_orders) - filled_orders
+    }
+
+    # Stop-loss is at -2x the premium (a negative number)
+    premium_info["stop_loss"] = stop_loss_level(premium_paid, premium_received)
+
+    return premium_info, order_premium_map
+
+
+def order_spreads(today_orders):
+    """
+    Maps each leg symbol to the spread ID saved with its entry order
+
+    Parameters:
+    - today_orders: List of today's orders
+
+    Returns:
+    - dict: Symbol to spread ID, for orders that were saved with one
+    """
+    return {order["symbol"]: order["spread_id"] for order in today_orders or [] if order.get("spread_id")}
+
+
+def spread_pnl_info(book, evaluation):
+    """
+    Adds the per-spread results of a PositionBook evaluation to the P&L information. Spreads are
+    reported as arrays in book.spread_keys order; only breached spreads are expanded into dicts.
+
+    Parameters:
+    - book: PositionBook that was evaluated
+    - evaluation: Result of book.evaluate()
+
+    Returns:
+    - dict: 'spread_keys', 'spread_pnl', 'spread_stop_loss' and 'breached_spreads', a list of dicts
+      with the 'spread' key, its 'legs', 'pnl', 'stop_loss' and 'reason' ('stop_loss')
+    """
+    return {
+        "spread_keys": book.spread_keys,
+        "spread_pnl": evaluation["spread_pnl"],
+        "spread_stop_loss": evaluation["spread_stop_loss"],
+        "breached_spreads": [
+            {
+                "spread": book.spread_keys[index],
+                "legs": book.spread_legs(index),
+                "pnl": float(evaluation["spread_pnl"][index]),
+                "stop_loss": float(evaluation["spread_stop_loss"][index]),
+                "reason": "stop_loss"
+            }
+            for index in evaluation["breached"]
+        ]
+    }
+
+
+def risk_exit_spreads(book, evaluation, risk, params=SPREAD_PARAMS):
+    """
+    Finds the spreads the risk exit rules close, on top of those already at their stop-loss level
+
+    Parameters:
+    - book: PositionBook that was evaluated
+    - evaluation: Result of book.evaluate()
+    - risk: Result of risk_snapshot() over the same book
+    - params: Spread parameters with the risk exit thresholds
+
+    Returns:
+    - list: Dicts shaped like spread_pnl_info's breached spreads, with 'reason' 'risk' and the spread's 'short_delta'
+    """
+    exits = (risk_exit_signal(risk["spread_short_delta"], params) & evaluation["spread_priced"]
+             & ~evaluation["spread_closing"])
+    exits[evaluation["breached"]] = False
+    return [
+        {
+            "spread": book.spread_keys[index],
+            "legs": book.spread_legs(index),
+            "pnl": float(evaluation["spread_pnl"][index]),
+            "stop_loss": float(evaluation["spread_stop_loss"][index]),
+            "reason": "risk",
+            "short_delta": float(risk["spread_short_delta"][index])
+        }
+        for index in np.nonzero(exits)[0]
+    ]
+
+
+def calculate_leg_pnl(symbol, qty, avg_entry_price, current_price, premium=None):
+    """
+    Calculates the P&L entry for a single option leg
+
+    Parameters:
+    - symbol: Option symbol
+    - qty: Signed position quantity (negative for short)
+    - avg_entry_price: Average entry price per contract
+    - current_price: Current option price
+    - premium: Optional premium recorded for the leg's order
+
+    Returns:
+    - dict: Position details with P&L
+    """
+    # Calculate P&L based on position direction
+    if qty > 0:  # Long position
+        pnl = (current_price - avg_entry_price) * qty * 100  # * 100 for option contracts
+    else:  # Short position
+        pnl = (avg_entry_price - current_price) * abs(qty) * 100
+
+    leg = {
+        "symbol": symbol,
+        "qty": qty,
+        "avg_entry_price": avg_entry_price,
+        "current_price": current_price,
+        "pnl": pnl,
+        "pnl_percentage": (pnl / (avg_entry_price * abs(qty) * 100)) * 100 if avg_entry_price > 0 else 0
+    }
+
+    # Add premium information if available
+    if premium is not None:
+        leg["premium"] = premium
+
+    return leg
+
+
 def calculate_option_pnl(positions, today_orders=None):
     """
     Calculates current P&L for option positions
@@ -144,7 +473,7 @@ def calculate_option_pnl(positions, today_orders=None):
     - today_orders: Optional list of today's orders with premium information
 
     Returns:
-    - dict: P&L information for each position and the total P&L
+    - dict: P&L information for each position, each spread (see spread_pnl_info) and the total P&L
     """
     try:
         # Get symbols from positions
@@ -153,8 +482,10 @@ def calculate_option_pnl(positions, today_orders=None):
         if not symbols:
             return {"total_pnl": 0, "positions": {}}
 
-        # Get current prices
-        current_prices = get_current_option_prices(symbols)
+        # Get current prices, marking legs without a usable quote off the IV surface
+        spots = get_underlying_prices({parse_option_symbol(symbol)[0] for symbol in symbols
+                                       if is_option_symbol(symbol)})
+        current_prices = get_current_option_prices(symbols, spots)
 
         # Initialize results
         pnl_info = {
@@ -164,36 +495,8 @@ def calculate_option_pnl(positions, today_orders=None):
         }
 
         # If today's orders are provided, extract premium information
-        order_premium_map = {}
-
-        if today_orders:
-            # Calculate total premium for the strategy
-            premium_paid = 0
-            premium_received = 0
-
-            for order in today_orders:
-                if order.get("side") == "buy":
-                    # For simplicity, we'll assume the fills happened at the limit price
-                    # In a production system, you'd use the actual fill price
-                    premium_paid += order.get("limit_price", 0) * order.get("qty",
-                                                                            0) * 100  # * 100 for option contracts
-                elif order.get("side") == "sell":
-                    premium_received += order.get("limit_price", 0) * order.get("qty", 0) * 100
-
-                # Map order symbol to premium
-                order_premium_map[order.get("symbol")] = order.get("limit_price", 0) * 100
-
-            # Net premium is what you paid minus what you received
-            net_premium = premium_paid - premium_received
-
-            pnl_info["strategy_premium"] = {
-                "paid": premium_paid,
-                "received": premium_received,
-                "net": net_premium
-            }
-
-            # Stop-loss is at -2x the premium (a negative number)
-            pnl_info["stop_loss"] = -2 * net_premium
+        premium_info, order_premium_map = summarize_order_premiums(today_orders)
+        pnl_info.update(premium_info)
 
         # Calculate P&L for each position
         for position in positions:
@@ -203,106 +506,432 @@ def calculate_option_pnl(positions, today_orders=None):
 
             # If we have current price for this symbol
             if symbol in current_prices:
-                current_price = current_prices[symbol]
-
-                # Calculate P&L based on position direction
-                if qty > 0:  # Long position
-                    pnl = (current_price - avg_entry_price) * qty * 100  # * 100 for option contracts
-                else:  # Short position
-                    pnl = (avg_entry_price - current_price) * abs(qty) * 100
-
-                # Store position details
-                pnl_info["positions"][symbol] = {
-                    "symbol": symbol,
-                    "qty": qty,
-                    "avg_entry_price": avg_entry_price,
-                    "current_price": current_price,
-                    "pnl": pnl,
-                    "pnl_percentage": (pnl / (avg_entry_price * abs(qty) * 100)) * 100 if avg_entry_price > 0 else 0
-                }
-
-                # Add premium information if available
-                if symbol in order_premium_map:
-                    pnl_info["positions"][symbol]["premium"] = order_premium_map[symbol]
+                leg = calculate_leg_pnl(symbol, qty, avg_entry_price, current_prices[symbol],
+                                        order_premium_map.get(symbol))
+                pnl_info["positions"][symbol] = leg
 
                 # Add to total P&L
-                pnl_info["total_pnl"] += pnl
+                pnl_info["total_pnl"] += leg["pnl"]
+
+        # Group the legs into spreads for the per-spread stop loss
+        book = PositionBook()
+        book.set_order_spreads(order_spreads(today_orders))
+        book.set_positions({symbol: (leg["qty"], leg["avg_entry_price"])
+                            for symbol, leg in pnl_info["positions"].items()})
+        book.update_prices(current_prices)
+        pnl_info.update(spread_pnl_info(book, book.evaluate()))
 
         return pnl_info
 
     except Exception as e:
-        logging.error(f"Error calculating option P&L: {str(e)}")
+        logging.error("Error calculating option P&L: %s", e)
         return {"total_pnl": 0, "positions": {}, "error": str(e)}
 
 
-def check_and_close_losing_positions():
+class PnLTracker:
+    """
+    Stateful P&L engine for the intraday stop-loss loop.
+
+    Today's orders are loaded once per session and their premiums and spread IDs cached. Positions
+    are re-fetched only when this process sent an order or POSITION_REFRESH_SECONDS elapsed. Open
+    legs live in a PositionBook, so each tick updates prices in place and computes leg and
+    spread P&L over numpy arrays. With fresh underlying prices, each evaluation also takes a
+    risk snapshot (implied volatilities and Greeks, see data_process.risk) for the risk exit rules.
+    When nothing changed the previous result is returned as is.
     """
-    Checks if current loss exceeds 2x the premium paid and closes positions if it does.
-    This is a stop-loss function that triggers only on significant losses.
+
+    def __init__(self, position_refresh_seconds=POSITION_REFRESH_SECONDS):
+        self.position_refresh_seconds = position_refresh_seconds
+        self.session_date = None
+        self.premium_info = {}
+        self.order_premium_map = {}
+        self.book = PositionBook()
+        self.today_orders = []
+        self.spots = {}
+        self._spots_at = None
+        self._order_revision = None
+        self._fill_revision = None
+        self._position_revision = None
+        self._positions_fetched_at = None
+        self._result = None
+        self._lock = threading.RLock()
+
+    @property
+    def positions(self):
+        """
+        Snapshot of the open option legs, symbol to row in the position book
+        """
+        with self._lock:
+            return dict(self.book.rows)
+
+    def load_session(self, force=False):
+        """
+        Loads today's orders and caches their premium information and spread IDs, once per session
+        or when this process has written new orders since the last load. Premiums are recomputed
+        from the cached orders when new fills reach the fill ledger.
+        """
+        today = market_today().strftime("%d%m%Y")
+        revision = get_store_revision()
+        ledger = get_fill_ledger()
+        fill_revision = ledger.revision
+        reload_orders = force or today != self.session_date or revision != self._order_revision
+        if not reload_orders and fill_revision == self._fill_revision:
+            return
+
+        today_orders = load_order_history(date=today) if reload_orders else self.today_orders
+        premium_info, order_premium_map = summarize_order_premiums(today_orders, ledger)
+
+        with self._lock:
+            if today != self.session_date:
+                self.book = PositionBook()
+                self._positions_fetched_at = None
+            self.session_date = today
+            self.today_orders = today_orders
+            self._order_revision = revision
+            self._fill_revision = fill_revision
+            self.premium_info = premium_info
+            self.order_premium_map = order_premium_map
+            self.book.set_order_spreads(order_spreads(today_orders))
+            self._result = None
+
+        if reload_orders:
+            logging.info("Loaded %d orders for PnL session %s", len(today_orders), today)
+
+    def invalidate_positions(self):
+        """
+        Forces the next tick to re-fetch positions from the broker
+        """
+        self._positions_fetched_at = None
+
+    def refresh_positions(self, force=False):
+        """
+        Re-fetches open option positions when they may have changed
+        """
+        now = time.monotonic()
+        revision = get_position_revision()
+        if (not force and self._positions_fetched_at is not None
+                and revision == self._position_revision
+                and now - self._positions_fetched_at < self.position_refresh_seconds):
+            return
+
+        trading_client = get_trading_client()
+        all_positions = call_broker("get_all_positions", trading_client.get_all_positions)
+        option_positions = [p for p in all_positions if is_option_symbol(p.symbol)]
+        self.set_positions(option_positions)
+
+        self._positions_fetched_at = now
+        self._position_revision = revision
+
+    def set_positions(self, positions):
+        """
+        Replaces the open legs in the position book
+
+        Parameters:
+        - positions: List of option positions
+        """
+        updated = {}
+        for position in positions:
+            avg_entry_price = float(position.avg_entry_price) if hasattr(position, 'avg_entry_price') else 0
+            updated[position.symbol] = (float(position.qty), avg_entry_price)
+
+        with self._lock:
+            if self.book.set_positions(updated):
+                self._result = None
+
+    def update_prices(self, prices):
+        """
+        Records new option prices of open legs
+
+        Parameters:
+        - prices: Symbol to price mapping
+        """
+        with self._lock:
+            if self.book.update_prices(prices):
+                self._result = None
+
+    def update_spots(self, spots):
+        """
+        Records the latest underlying prices the Greeks are computed from
+
+        Parameters:
+        - spots: Underlying symbol to price mapping
+        """
+        with self._lock:
+            self._spots_at = time.monotonic()
+            if spots != self.spots:
+                self.spots = dict(spots)
+                self._result = None
+
+    def refresh_spots(self):
+        """
+        Re-fetches the underlying prices of the open legs, e.g. between quote-driven evaluations
+
+        Returns:
+        - bool: True if any underlying price changed
+        """
+        spots = get_underlying_prices(list(self.book.underlyings))
+        if not spots:
+            return False
+        changed = spots != self.spots
+        self.update_spots(spots)
+        return changed
+
+    def mark_closing(self, symbols, closing=True):
+        """
+        Marks legs whose closing orders are in flight, so their spreads are not closed twice
+
+        Parameters:
+        - symbols: Option symbols
+        - closing: False to check the legs again, e.g. after their closing orders failed
+        """
+        with self._lock:
+            self.book.mark_closing(symbols, closing)
+            self._result = None
+
+    def evaluate(self):
+        """
+        Computes leg and spread P&L over the position book and returns the current P&L information
+
+        Returns:
+        - dict: 'total_pnl', today's premiums and stop loss (as in calculate_option_pnl) and the
+          per-spread results (see spread_pnl_info); leg details are available from legs(). With
+          fresh underlying prices also the 'risk' snapshot, and spreads the risk exit rules close
+          are added to 'breached_spreads'
+        """
+        with self._lock:
+            if self._result is not None:
+                return self._result
+
+            evaluation = self.book.evaluate(SPREAD_PARAMS)
+            pnl_info = {"total_pnl": evaluation["total_pnl"], "premiums": {}}
+            pnl_info.update(self.premium_info)
+            pnl_info.update(spread_pnl_info(self.book, evaluation))
+
+            # Greeks from stale underlying prices would not match the option prices
+            if self.spots and time.monotonic() - self._spots_at <= MAX_QUOTE_AGE_SECONDS:
+                risk = risk_snapshot(self.book, self.spots)
+                pnl_info["risk"] = risk
+                pnl_info["breached_spreads"] += risk_exit_spreads(self.book, evaluation, risk)
+            self._result = pnl_info
+            return pnl_info
+
+    def legs(self):
+        """
+        Returns the details of every open leg with its premium and spread, for reports
+
+        Returns:
+        - dict: Symbol to leg details
+        """
+        with self._lock:
+            legs = self.book.legs()
+        for symbol, leg in legs.items():
+            if symbol in self.order_premium_map:
+                leg["premium"] = self.order_premium_map[symbol]
+        return legs
+
+    def tick(self):
+        """
+        Runs one stop-loss cycle: session and position refresh when due, one quote fetch (legs
+        without a usable quote are marked off the IV surface), then a P&L evaluation over the position book
+
+        Returns:
+        - dict: P&L information, or None when there are no open option positions
+        """
+        with span("pnl.load_session"):
+            self.load_session()
+        with span("pnl.refresh_positions"):
+            self.refresh_positions()
+
+        if not self.positions:
+            return None
+
+        symbols = list(self.positions)
+        with span("pnl.fetch_quotes"), ThreadPoolExecutor(max_workers=1) as executor:
+            # Underlying prices for the Greeks and the IV surface are fetched alongside the option quotes
+            spots = executor.submit(get_underlying_prices, list(self.book.underlyings))
+            prices = get_option_quote_prices(symbols)
+            spots = spots.result()
+        with span("pnl.price_unquoted"):
+            prices = price_unquoted_options(symbols, prices, spots)
+        with span("pnl.evaluate"):
+            self.update_prices(prices)
+            if spots:
+                self.update_spots(spots)
+            return self.evaluate()
+
+
+_tracker = PnLTracker()
+
+
+def get_pnl_tracker():
+    """
+    Returns the process-wide PnLTracker
 
     Returns:
-    - dict: Results of the check and any actions taken
+    - PnLTracker: Shared tracker instance
+    """
+    return _tracker
+
+
+def _book_stop_loss_reached(pnl_info):
+    """
+    Tells whether the total P&L is at or below the stop loss of today's premiums
+    """
+    return "stop_loss" in pnl_info and pnl_info["total_pnl"] <= pnl_info["stop_loss"]
+
+
+def _spreads_to_close(pnl_info, scope):
+    """
+    Spreads the stop loss closes on their own: every breached spread in 'spread' scope, only the
+    ones hit by a risk exit rule (off unless configured) in 'book' scope
+    """
+    breached = pnl_info.get("breached_spreads", [])
+    if scope == "book":
+        return [spread for spread in breached if spread.get("reason") == "risk"]
+    return breached
+
+
+def stop_loss_triggered(pnl_info, scope=None):
+    """
+    Tells whether the stop loss should act on the current P&L
+
+    Parameters:
+    - pnl_info: P&L information from calculate_option_pnl or PnLTracker
+    - scope: 'book' or 'spread', defaults to STOP_LOSS_SCOPE
+
+    Returns:
+    - bool: True if the whole book is at or below its stop-loss level, or a spread is to be closed
+      on its own (see apply_stop_loss)
+    """
+    return _book_stop_loss_reached(pnl_info) or bool(_spreads_to_close(pnl_info, scope or STOP_LOSS_SCOPE))
+
+
+def _journal_stop_loss(scope, spreads, legs):
+    """
+    Records a stop-loss action in the session journal before its closing orders are sent. A journal
+    failure is logged and does not hold up the closing orders.
     """
     try:
-        # Initialize trading client
-        trading_client = TradingClient(API_KEY, API_SECRET, paper=True)
+        get_session_journal().append("stop_loss", scope=scope, spreads=spreads, legs=legs)
+    except Exception as e:
+        logging.error("Could not journal the %s stop loss: %s", scope, e)
 
-        # Get today's date
-        today = datetime.now().strftime("%d%m%Y")
 
-        # Get all open option positions
-        all_positions = trading_client.get_all_positions()
-        option_positions = [p for p in all_positions if len(p.symbol) > 6]  # Simple filter for options
+def _close_breached_spreads(pnl_info, breached):
+    """
+    Closes the legs of the given spreads, at or below their own stop-loss level or hit by a risk
+    exit rule, leaving the other spreads open
+    """
+    symbols = []
+    for spread in breached:
+        if spread.get("reason") == "risk":
+            logging.info("Spread risk exit triggered for %s: short leg delta %.2f, P&L $%.2f",
+                         spread["spread"], spread["short_delta"], spread["pnl"])
+        else:
+            logging.info("Spread stop-loss triggered for %s: P&L $%.2f <= Stop-loss: $%.2f",
+                         spread["spread"], spread["pnl"], spread["stop_loss"])
+        symbols.extend(spread["legs"])
+
+    # Keep the legs out of the next evaluations until the refreshed positions drop them
+    _journal_stop_loss("spread", [spread["spread"] for spread in breached], symbols)
+    _tracker.mark_closing(symbols)
+    close_result = close_option_legs(symbols)
+    failed = [details["symbol"] for details in close_result.get("failed_positions", [])]
+    if close_result["status"] == "error":
+        failed = symbols
+    if failed:
+        _tracker.mark_closing(failed, closing=False)
+    _tracker.invalidate_positions()
+
+    return {
+        "status": "spread_stop_loss_triggered",
+        "message": f"Stop-loss triggered for {len(breached)} spreads, their legs closed",
+        "closed_spreads": [spread["spread"] for spread in breached],
+        "pnl_info": pnl_info,
+        "close_result": close_result
+    }
+
+
+def apply_stop_loss(pnl_info, scope=None):
+    """
+    Compares the current P&L against the stop-loss levels and closes what hit them.
 
-        if not option_positions:
-            logging.info("No open option positions found")
-            return {"status": "info", "message": "No open option positions"}
+    The total P&L is always checked against the stop loss of today's premiums, and all option
+    positions are closed when it is reached. Below it, spreads hit by a risk exit rule are closed
+    on their own, and in 'spread' scope also each spread at or below its own stop-loss level.
+
+    Parameters:
+    - pnl_info: P&L information from calculate_option_pnl or PnLTracker
+    - scope: 'book' or 'spread', defaults to STOP_LOSS_SCOPE
+
+    Returns:
+    - dict: Results of the check and any actions taken
+    """
+    logging.info("Current total P&L: $%.2f", pnl_info['total_pnl'])
 
-        # Get today's orders for premium information
-        today_orders = load_order_history(date=today)
-
-        # Calculate current P&L
-        pnl_info = calculate_option_pnl(option_positions, today_orders)
-
-        logging.info(f"Current total P&L: ${pnl_info['total_pnl']:.2f}")
-
-        # Check if we have stop-loss information
-        if "stop_loss" in pnl_info:
-            stop_loss = pnl_info["stop_loss"]
-            current_pnl = pnl_info["total_pnl"]
-
-            logging.info(f"Stop-loss level (2x premium): ${stop_loss:.2f}")
-
-            # If P&L is below stop-loss (more negative), close all positions
-            if current_pnl <= stop_loss:
-                logging.info(f"Stop-loss triggered! Current P&L: ${current_pnl:.2f} <= Stop-loss: ${stop_loss:.2f}")
-                logging.info("Closing all option positions to limit losses...")
-
-                # Close all option positions
-                close_result = close_all_option_positions()
-
-                return {
-                    "status": "stop_loss_triggered",
-                    "message": "Stop-loss triggered, positions closed",
-                    "pnl_info": pnl_info,
-                    "close_result": close_result
-                }
-            else:
-                logging.info(
-                    f"Current loss not at stop-loss level. Current P&L: ${current_pnl:.2f} > Stop-loss: ${stop_loss:.2f}")
-                return {
-                    "status": "info",
-                    "message": "Stop-loss not triggered",
-                    "pnl_info": pnl_info
-                }
+    spreads = _spreads_to_close(pnl_info, scope or STOP_LOSS_SCOPE)
+    if spreads and not _book_stop_loss_reached(pnl_info):
+        return _close_breached_spreads(pnl_info, spreads)
+
+    # Check if we have stop-loss information
+    if "stop_loss" in pnl_info:
+        stop_loss = pnl_info["stop_loss"]
+        current_pnl = pnl_info["total_pnl"]
+
+        logging.info("Stop-loss level (2x premium): $%.2f", stop_loss)
+
+        # If P&L is below stop-loss (more negative), close all positions
+        if current_pnl <= stop_loss:
+            logging.info("Stop-loss triggered! Current P&L: $%.2f <= Stop-loss: $%.2f", current_pnl, stop_loss)
+            logging.info("Closing all option positions to limit losses...")
+
+            # Close all option positions
+            _journal_stop_loss("book", [], list(_tracker.positions))
+            close_result = close_all_option_positions()
+            _tracker.invalidate_positions()
+
+            return {
+                "status": "stop_loss_triggered",
+                "message": "Stop-loss triggered, positions closed",
+                "pnl_info": pnl_info,
+                "close_result": close_result
+            }
         else:
-            # If we don't have premium information, just report the current P&L
-            logging.info("Premium information not available, cannot determine stop-loss level")
+            logging.info("Current loss not at stop-loss level. Current P&L: $%.2f > Stop-loss: $%.2f",
+                         current_pnl, stop_loss)
             return {
                 "status": "info",
-                "message": "Premium information not available",
+                "message": "Stop-loss not triggered",
                 "pnl_info": pnl_info
             }
+    else:
+        # If we don't have premium information, just report the current P&L
+        logging.info("Premium information not available, cannot determine stop-loss level")
+        return {
+            "status": "info",
+            "message": "Premium information not available",
+            "pnl_info": pnl_info
+        }
+
+
+@traced("pnl.check_and_close_losing_positions")
+def check_and_close_losing_positions():
+    """
+    Checks if current loss exceeds 2x the premium paid and closes positions if it does.
+    This is a stop-loss function that triggers only on significant losses.
+
+    Returns:
+    - dict: Results of the check and any actions taken
+    """
+    try:
+        # Incremental P&L over cached orders and positions
+        pnl_info = _tracker.tick()
+
+        if pnl_info is None:
+            logging.info("No open option positions found")
+            return {"status": "info", "message": "No open option positions"}
+
+        return apply_stop_loss(pnl_info)
 
     except Exception as e:
         error_message = f"Error checking stop-loss and closing positions: {str(e)}"
@@ -311,6 +940,10 @@ def check_and_close_losing_positions():
 
 
 if __name__ == "__main__":
+    # Without the trade update stream, load today's fills once
+    get_fill_ledger().backfill(get_trading_client(),
+                               datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0))
+
     # Test the stop-loss function
     result = check_and_close_losing_positions()
 
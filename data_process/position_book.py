@@ -0,0 +1,302 @@
+import bisect
+import numpy as np
+from helper.option_symbol import parse_option_symbol
+from strategy.spread_rules import DEFAULT_SPREAD_PARAMS, stop_loss_level
+
+# Rows are allocated in blocks of this size as the book grows
+BOOK_GROWTH = 64
+
+_RIGHT_CODES = {"P": -1, "C": 1}
+
+
+class PositionBook:
+    """
+    Open option legs stored as parallel numpy arrays (struct of arrays), one row per leg. The last
+    implied volatility solved for each leg is kept too, to seed the next solve (see data_process.risk).
+
+    OCC fields are parsed once per symbol; underlyings are kept as integer IDs into a list of
+    interned names. Legs are grouped into spreads, using the spread IDs recorded with the entry
+    orders first and pairing the remaining short and long legs by underlying, expiry and right.
+    Per-spread P&L and stop-loss levels are then computed with bincount over the spread IDs.
+    """
+
+    def __init__(self):
+        self.symbols = []
+        self.rows = {}
+        self.underlyings = []
+        self._underlying_ids = {}
+        self.size = 0
+        self._allocate(BOOK_GROWTH)
+
+        # Spread grouping, rebuilt when the set of legs changes
+        self.order_spreads = {}
+        self.spread_keys = []
+        self.spread_count = 0
+        self._grouped = True
+
+    def _allocate(self, capacity):
+        """
+        Grows the row arrays to capacity, keeping the existing rows
+        """
+        def grow(array, dtype, fill):
+            grown = np.full(capacity, fill, dtype=dtype)
+            if array is not None:
+                grown[:self.size] = array[:self.size]
+            return grown
+
+        self.underlying_id = grow(getattr(self, "underlying_id", None), np.int32, -1)
+        self.expiry = grow(getattr(self, "expiry", None), "datetime64[D]", np.datetime64("NaT"))
+        self.right = grow(getattr(self, "right", None), np.int8, 0)
+        self.strike = grow(getattr(self, "strike", None), np.float64, np.nan)
+        self.qty = grow(getattr(self, "qty", None), np.float64, 0.0)
+        self.avg_entry_price = grow(getattr(self, "avg_entry_price", None), np.float64, 0.0)
+        self.price = grow(getattr(self, "price", None), np.float64, np.nan)
+        self.spread_id = grow(getattr(self, "spread_id", None), np.int32, -1)
+        self.closing = grow(getattr(self, "closing", None), bool, False)
+        self.iv = grow(getattr(self, "iv", None), np.float64, np.nan)
+
+    def _intern_underlying(self, underlying):
+        """
+        Returns the integer ID of an underlying, adding it on first use
+        """
+        underlying_id = self._underlying_ids.get(underlying)
+        if underlying_id is None:
+            underlying_id = self._underlying_ids[underlying] = len(self.underlyings)
+            self.underlyings.append(underlying)
+        return underlying_id
+
+    def __len__(self):
+        return self.size
+
+    def set_positions(self, positions):
+        """
+        Replaces the open legs, keeping the rows and prices of legs that stay open
+
+        Parameters:
+        - positions: Dict of option symbol to (signed qty, avg_entry_price)
+
+        Returns:
+        - bool: True if any leg was added, removed or changed
+        """
+        changed = False
+
+        # Drop closed legs by moving the last row into their place
+        for symbol in [symbol for symbol in self.rows if symbol not in positions]:
+            row = self.rows.pop(symbol)
+            last = self.size - 1
+            if row != last:
+                moved = self.symbols[last]
+                self.symbols[row] = moved
+                self.rows[moved] = row
+                for array in (self.underlying_id, self.expiry, self.right, self.strike, self.qty,
+                              self.avg_entry_price, self.price, self.spread_id, self.closing, self.iv):
+                    array[row] = array[last]
+            self.symbols.pop()
+            self.price[last] = np.nan
+            self.iv[last] = np.nan
+            self.closing[last] = False
+            self.size = last
+            changed = True
+
+        for symbol, (qty, avg_entry_price) in positions.items():
+            row = self.rows.get(symbol)
+            if row is None:
+                fields = parse_option_symbol(symbol)
+                if fields is None:
+                    continue
+                if self.size == len(self.qty):
+                    self._allocate(len(self.qty) * 2)
+                row = self.rows[symbol] = self.size
+                self.symbols.append(symbol)
+                self.size += 1
+                underlying, expiration, right, strike = fields
+                self.underlying_id[row] = self._intern_underlying(underlying)
+                self.expiry[row] = expiration
+                self.right[row] = _RIGHT_CODES[right]
+                self.strike[row] = strike
+                self.price[row] = np.nan
+                self.closing[row] = False
+                self.iv[row] = np.nan
+                changed = True
+            elif self.qty[row] == qty and self.avg_entry_price[row] == avg_entry_price:
+                continue
+
+            self.qty[row] = qty
+            self.avg_entry_price[row] = avg_entry_price
+            changed = True
+
+        if changed:
+            self._grouped = False
+        return changed
+
+    def set_order_spreads(self, order_spreads):
+        """
+        Sets which spread each leg was entered in
+
+        Parameters:
+        - order_spreads: Dict of option symbol to the spread ID saved with its entry order
+        """
+        if order_spreads != self.order_spreads:
+            self.order_spreads = dict(order_spreads)
+            self._grouped = False
+
+    def update_prices(self, prices):
+        """
+        Records current option prices of open legs
+
+        Parameters:
+        - prices: Symbol to price mapping
+
+        Returns:
+        - bool: True if any price changed
+        """
+        changed = False
+        for symbol, price in prices.items():
+            row = self.rows.get(symbol)
+            if row is not None and self.price[row] != price:
+                self.price[row] = price
+                changed = True
+        return changed
+
+    def _group_spreads(self):
+        """
+        Assigns every leg a spread ID. Legs entered together keep the spread ID of their orders;
+        the remaining short legs are paired with the closest-strike long leg of the same
+        underlying, expiry, right and size. Legs left over form single-leg groups.
+        """
+        spread_id = np.full(self.size, -1, dtype=np.int32)
+        ids = {}
+
+        for row, symbol in enumerate(self.symbols):
+            order_spread = self.order_spreads.get(symbol)
+            if order_spread is not None:
+                spread_id[row] = ids.setdefault(order_spread, len(ids))
+        count = len(ids)
+
+        # Unpaired long legs bucketed by underlying, expiry, right and size, sorted by strike
+        n = self.size
+        underlying_id, expiry = self.underlying_id[:n].tolist(), self.expiry[:n].astype(np.int64).tolist()
+        right, strike, qty = self.right[:n].tolist(), self.strike[:n].tolist(), self.qty[:n].tolist()
+        unassigned = np.nonzero(spread_id < 0)[0].tolist()
+        buckets = {}
+        for row in sorted((row for row in unassigned if qty[row] >= 0), key=strike.__getitem__):
+            bucket = buckets.setdefault((underlying_id[row], expiry[row], right[row], qty[row]), ([], []))
+            bucket[0].append(strike[row])
+            bucket[1].append(row)
+
+        for row in sorted((row for row in unassigned if qty[row] < 0), key=strike.__getitem__):
+            spread_id[row] = count
+            bucket = buckets.get((underlying_id[row], expiry[row], right[row], -qty[row]))
+            if bucket and bucket[1]:
+                # Closest strike on either side of the short leg
+                strikes, rows = bucket
+                i = bisect.bisect_left(strikes, strike[row])
+                if i == len(rows) or (i > 0 and strike[row] - strikes[i - 1] <= strikes[i] - strike[row]):
+                    i -= 1
+                strikes.pop(i)
+                spread_id[rows.pop(i)] = count
+            count += 1
+
+        for row in sorted(row for _, rows in buckets.values() for row in rows):
+            spread_id[row] = count
+            count += 1
+
+        # Spreads are named by their legs, lowest strike first
+        legs = [[] for _ in range(count)]
+        for row in np.argsort(self.strike[:self.size], kind="stable"):
+            legs[spread_id[row]].append(self.symbols[row])
+
+        self.spread_id[:self.size] = spread_id
+        self.spread_keys = ["/".join(symbols) for symbols in legs]
+        self.spread_count = count
+        self._grouped = True
+
+    def group_spreads(self):
+        """
+        Regroups the legs into spreads if the legs or the order spread IDs changed since the last grouping
+        """
+        if not self._grouped:
+            self._group_spreads()
+
+    def mark_closing(self, symbols, closing=True):
+        """
+        Leaves the spreads of these legs out of the stop-loss check while their closing orders are in
+        flight, so they are not closed twice. The mark goes away with the leg, or with closing=False.
+        """
+        for symbol in symbols:
+            row = self.rows.get(symbol)
+            if row is not None:
+                self.closing[row] = closing
+
+    def spread_legs(self, spread_index):
+        """
+        Returns the symbols of one spread's legs
+        """
+        return [self.symbols[row] for row in np.nonzero(self.spread_id[:self.size] == spread_index)[0]]
+
+    def evaluate(self, params=None):
+        """
+        Computes leg and spread P&L and the per-spread stop-loss levels in one pass over the arrays.
+
+        A spread's stop-loss level is derived from the entry prices of its legs. Spreads with a leg
+        that has no price yet are not checked.
+
+        Parameters:
+        - params: Optional spread parameters for stop_loss_level
+
+        Returns:
+        - dict: 'total_pnl', and per spread (in spread_keys order) 'spread_pnl', 'spread_stop_loss',
+          'spread_priced', 'spread_closing' and the indexes of spreads at or below their stop ('breached')
+        """
+        self.group_spreads()
+
+        n = self.size
+        qty = self.qty[:n]
+        avg = self.avg_entry_price[:n]
+        price = self.price[:n]
+        spread_id = self.spread_id[:n]
+        count = self.spread_count
+
+        priced = ~np.isnan(price)
+        leg_pnl = np.where(priced, (price - avg) * qty * 100, 0.0)  # * 100 for option contracts
+
+        spread_pnl = np.bincount(spread_id, weights=leg_pnl, minlength=count)
+        spread_priced = np.bincount(spread_id, weights=~priced, minlength=count) == 0
+        premium_paid = np.bincount(spread_id, weights=np.where(qty > 0, avg * qty * 100, 0.0), minlength=count)
+        premium_received = np.bincount(spread_id, weights=np.where(qty < 0, -avg * qty * 100, 0.0), minlength=count)
+        spread_stop = stop_loss_level(premium_paid, premium_received, params or DEFAULT_SPREAD_PARAMS)
+        spread_closing = np.bincount(spread_id, weights=self.closing[:n], minlength=count) > 0
+
+        breached = spread_priced & ~spread_closing & (spread_stop < 0) & (spread_pnl <= spread_stop)
+
+        return {
+            "total_pnl": float(leg_pnl.sum()),
+            "spread_pnl": spread_pnl,
+            "spread_stop_loss": spread_stop,
+            "spread_priced": spread_priced,
+            "spread_closing": spread_closing,
+            "breached": np.nonzero(breached)[0]
+        }
+
+    def legs(self):
+        """
+        Returns leg details keyed by symbol, for reports and debugging (builds dicts, not used per tick)
+        """
+        legs = {}
+        for row, symbol in enumerate(self.symbols):
+            qty = float(self.qty[row])
+            avg = float(self.avg_entry_price[row])
+            price = float(self.price[row])
+            pnl = (price - avg) * qty * 100 if price == price else None
+            legs[symbol] = {
+                "symbol": symbol,
+                "underlying": self.underlyings[self.underlying_id[row]],
+                "expiration": str(self.expiry[row]),
+                "strike": float(self.strike[row]),
+                "qty": qty,
+                "avg_entry_price": avg,
+                "current_price": price if price == price else None,
+                "pnl": pnl,
+                "spread": self.spread_keys[self.spread_id[row]] if self._grouped else None
+            }
+        return legs
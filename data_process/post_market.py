@@ -1,47 +1,70 @@
-import os
-from datetime import datetime
-from alpaca.data.historical import StockHistoricalDataClient
-from alpaca.data.requests import StockLatestBarRequest
-from dir_path import base_dirname
-from log_config import configure_logging
+from helper.broker_call import call_broker
+from helper.clients import get_stock_data_client
+from helper.market_clock import market_today
+from helper.price_store import get_price_store
+from strategy.simple_strategy import STRATEGY_UNDERLYINGS
+from bootstrap import bootstrap
 import logging
 
-from dotenv import load_dotenv
-load_dotenv()
+bootstrap()
 
-configure_logging()
 
-
-API_KEY = os.getenv("ALP_KEY")
-API_SECRET = os.getenv("ALP_SECRET")
-
-
-def fetch_and_save_qqq_price():
+def fetch_and_save_prices(symbols=None):
     """
-    Fetches the current price of QQQ ETF using Alpaca's Market Data API
-    and saves it to a text file with the filename in format DDMMYYYY.txt
+    Fetches the current price of every underlying using Alpaca's Market Data API
+    and appends today's rows to the price store
+
+    Parameters:
+    - symbols: List of symbols (default STRATEGY_UNDERLYINGS)
 
     Returns:
-    - current_price: The latest price of QQQ
+    - dict: Symbol to its latest price
+    - str: Directory of the price store
     """
+    from alpaca.data.requests import StockSnapshotRequest
+
+    today = market_today()
+    symbols = list(symbols or STRATEGY_UNDERLYINGS)
+
+    # Use the shared market data client
+    client = get_stock_data_client()
 
-    now = datetime.now()
-    date_str = now.strftime("%d%m%Y")
-    filename = os.path.join(base_dirname, "data", "qqq_price", f"{date_str}.txt")
+    # One batched snapshot request carries the latest minute bar and today's daily bar of every symbol
+    request_params = StockSnapshotRequest(symbol_or_symbols=symbols)
+    snapshots = call_broker("get_stock_snapshot", client.get_stock_snapshot, request_params,
+                            api="market_data")
 
-    # Initialize the Stock Historical Data client
-    client = StockHistoricalDataClient(API_KEY, API_SECRET)
+    store = get_price_store()
+    prices = {}
+    for symbol in symbols:
+        snapshot = snapshots.get(symbol)
+        if snapshot is None or snapshot.minute_bar is None:
+            logging.error("No snapshot for %s, price not saved for %s", symbol, today)
+            continue
 
-    # Method 1: Get the latest bar data for QQQ
-    request_params = StockLatestBarRequest(symbol_or_symbols="QQQ")
-    latest_bar = client.get_stock_latest_bar(request_params)
+        # The close is the latest minute bar, as before; the rest of the row comes from the daily bar
+        current_price = snapshot.minute_bar.close
+        daily_bar = snapshot.daily_bar
 
-    # Extract the closing price
-    current_price = str(latest_bar["QQQ"].close)
+        store.append(symbol, [today], [current_price],
+                     open_=[daily_bar.open if daily_bar else float("nan")],
+                     high=[daily_bar.high if daily_bar else float("nan")],
+                     low=[daily_bar.low if daily_bar else float("nan")],
+                     volume=[daily_bar.volume if daily_bar else float("nan")])
+        prices[symbol] = current_price
 
-    # Save to file
-    with open(filename, 'w') as file:
-        file.write(current_price)
+        logging.info("Successfully saved %s price %s for %s to %s", symbol, current_price, today, store.root)
 
-    logging.info(f"Successfully saved QQQ price to {filename}")
-    return current_price, filename
+    return prices, store.root
+
+
+def fetch_and_save_qqq_price():
+    """
+    Fetches and saves the current price of QQQ, see fetch_and_save_prices
+
+    Returns:
+    - current_price: The latest price of QQQ
+    - str: Directory of the price store
+    """
+    prices, root = fetch_and_save_prices(["QQQ"])
+    return prices.get("QQQ"), root
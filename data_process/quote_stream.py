@@ -0,0 +1,314 @@
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from data_process.pnl import get_pnl_tracker, apply_stop_loss, stop_loss_triggered, quote_mid_price
+from helper.clients import API_KEY, API_SECRET
+from bootstrap import bootstrap
+import logging
+
+bootstrap()
+
+# Override the option quote websocket, e.g. to point at a local fake server
+OPTION_STREAM_URL = os.getenv("ALP_OPTION_STREAM_URL")
+
+# Minimum time between two stop-loss evaluations triggered by quotes
+DEBOUNCE_SECONDS = 0.25
+
+# Without a quote for this long the stream is treated as having a gap and positions are re-priced over REST
+GAP_SECONDS = 10
+
+# How often the watchdog checks for gaps, pending evaluations and new legs to subscribe
+WATCHDOG_INTERVAL_SECONDS = 0.25
+
+# How often the watchdog re-fetches the underlying prices the risk exit rules are computed from,
+# well inside the age after which the tracker stops using them
+SPOT_REFRESH_SECONDS = 5
+
+# Number of recent tick-to-decision samples kept for the latency metric
+LATENCY_SAMPLES = 1000
+
+
+class StopLossQuoteStream:
+    """
+    Evaluates the stop-loss rule on every option quote for the open legs instead of on a 15-second poll.
+
+    Quotes update the shared PnLTracker and trigger an evaluation at most once per DEBOUNCE_SECONDS;
+    a quote arriving inside the window is evaluated by the watchdog once the window passes.
+    The websocket client reconnects on its own, and the watchdog detects gaps (no quotes for
+    GAP_SECONDS) and re-prices over REST until quotes resume.
+
+    The websocket is only started once there is an open leg to subscribe: without a subscription
+    the client busy-waits for one and would hold a CPU core (and the GIL) all session.
+
+    Quotes are handled on the websocket thread and debounced or gap evaluations on the watchdog
+    thread; the debounce state, the evaluation and the hand-off of a triggered close happen under
+    one lock, so a breach is closed once.
+    """
+
+    def __init__(self, url_override=OPTION_STREAM_URL, debounce_seconds=DEBOUNCE_SECONDS, gap_seconds=GAP_SECONDS):
+        self.url_override = url_override
+        self.debounce_seconds = debounce_seconds
+        self.gap_seconds = gap_seconds
+        self.tracker = get_pnl_tracker()
+        self.stream = None
+        self.subscribed = set()
+        self.triggered = False
+        self._running = threading.Event()
+        self._pending_since = None
+        self._last_evaluation = 0.0
+        self._last_quote_at = None
+        self._spots_refreshed_at = 0.0
+        self._in_gap = False
+        self._stream_thread = None
+        self._watchdog_thread = None
+        self._lock = threading.Lock()
+        self._close_executor = None
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._metrics = {"quotes": 0, "evaluations": 0, "gaps": 0, "reconnects": 0, "rest_fallbacks": 0}
+
+    def start(self):
+        """
+        Starts the watchdog thread, and the stream thread if there are open option legs to subscribe
+        """
+        if self._running.is_set():
+            return
+
+        self.triggered = False
+        self._close_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stop-loss-close")
+        self._running.set()
+        self.tracker.load_session()
+        self.tracker.refresh_positions(force=True)
+
+        self._watchdog_thread = threading.Thread(target=self._run_watchdog, name="stop-loss-watchdog", daemon=True)
+        self._watchdog_thread.start()
+        self._start_stream_if_needed()
+        logging.info("Stop-loss quote stream started for %d legs", len(self.tracker.positions))
+
+    def stop(self):
+        """
+        Stops the stream and the watchdog; a close already handed to the worker thread still completes
+        """
+        self._running.clear()
+        if self._close_executor is not None:
+            # Also called from the worker thread once the book is closed, so it cannot wait for it
+            self._close_executor.shutdown(wait=False)
+        if self.stream is not None:
+            try:
+                self.stream.stop()
+            except Exception as e:
+                logging.warning("Error stopping option quote stream: %s", e)
+        logging.info("Stop-loss quote stream stopped. Metrics: %s", self.get_metrics())
+
+    def _start_stream_if_needed(self):
+        """
+        Starts the stream thread once there are open legs, unless it is already running
+        """
+        if not self.tracker.positions or (self._stream_thread is not None and self._stream_thread.is_alive()):
+            return
+
+        self._stream_thread = threading.Thread(target=self._run_stream, name="stop-loss-stream", daemon=True)
+        self._stream_thread.start()
+
+    def _run_stream(self):
+        """
+        Runs the websocket client, recreating it if it exits while the stream should be running.
+        Returns when no leg is left to subscribe; the watchdog starts it again for the next one.
+        """
+        from alpaca.data.live.option import OptionDataStream
+
+        while self._running.is_set() and self.tracker.positions:
+            self.stream = OptionDataStream(API_KEY, API_SECRET, url_override=self.url_override)
+            self.subscribed = set()
+            self._subscribe_open_legs()
+            try:
+                self.stream.run()
+            except Exception as e:
+                logging.error("Option quote stream failed: %s", e)
+
+            if self._running.is_set():
+                with self._lock:
+                    self._metrics["reconnects"] += 1
+                logging.warning("Option quote stream disconnected, reconnecting")
+                time.sleep(1)
+        self.stream = None
+
+    def _subscribe_open_legs(self):
+        """
+        Subscribes to quotes for open legs that are not subscribed yet
+        """
+        if self.stream is None:
+            return
+
+        new_symbols = [symbol for symbol in self.tracker.positions if symbol not in self.subscribed]
+        if new_symbols:
+            self.stream.subscribe_quotes(self._on_quote, *new_symbols)
+            self.subscribed.update(new_symbols)
+            logging.info("Subscribed to option quotes: %s", new_symbols)
+
+    async def _on_quote(self, quote):
+        """
+        Handles one quote: updates the leg price and evaluates the stop loss unless debounced
+        """
+        received_at = time.time()
+        price = quote_mid_price(quote.bid_price, quote.ask_price)
+
+        with self._lock:
+            self._metrics["quotes"] += 1
+            if self._in_gap:
+                logging.info("Option quotes resumed after a gap of %.1fs", received_at - self._last_quote_at)
+                self._in_gap = False
+            self._last_quote_at = received_at
+
+            if price is None:
+                return
+            self.tracker.update_prices({quote.symbol: price})
+
+            if received_at - self._last_evaluation >= self.debounce_seconds:
+                self._evaluate(quote_time=quote.timestamp.timestamp() if quote.timestamp else received_at,
+                               received_at=received_at)
+            elif self._pending_since is None:
+                self._pending_since = received_at
+
+    def _evaluate(self, quote_time, received_at):
+        """
+        Evaluates the stop-loss rule against the tracker and hands a triggered close to a worker thread;
+        the caller holds the lock
+        """
+        self._pending_since = None
+        self._last_evaluation = time.time()
+        self._metrics["evaluations"] += 1
+
+        pnl_info = self.tracker.evaluate()
+        triggered = stop_loss_triggered(pnl_info)
+
+        decided_at = time.time()
+        self._latencies.append((decided_at - quote_time, decided_at - received_at))
+
+        if triggered and not self.triggered and self._running.is_set():
+            self.triggered = True
+            self._close_executor.submit(self._close_positions, pnl_info)
+
+    def _close_positions(self, pnl_info):
+        """
+        Runs the shared stop-loss action. Streaming stops once the whole book is closed; after
+        closing single spreads it goes on watching the remaining ones.
+        """
+        result = apply_stop_loss(pnl_info)
+        logging.info("Streaming stop-loss result: %s", result['status'])
+        if result["status"] == "stop_loss_triggered":
+            self.stop()
+        else:
+            with self._lock:
+                self.triggered = False
+
+    def _run_watchdog(self):
+        """
+        Flushes debounced evaluations, picks up new orders and fills, subscribes new legs (starting
+        the stream for the first one), refreshes underlying prices and covers stream gaps with REST re-pricing
+        """
+        while self._running.is_set():
+            time.sleep(WATCHDOG_INTERVAL_SECONDS)
+            now = time.time()
+
+            try:
+                with self._lock:
+                    if self._pending_since is not None and now - self._last_evaluation >= self.debounce_seconds:
+                        self._evaluate(quote_time=self._pending_since, received_at=self._pending_since)
+
+                self.tracker.load_session()
+                self.tracker.refresh_positions()
+                self._subscribe_open_legs()
+                self._start_stream_if_needed()
+
+                # Quotes only carry option prices, the Greeks also need current underlying prices
+                if self.tracker.positions and now - self._spots_refreshed_at >= SPOT_REFRESH_SECONDS:
+                    self._spots_refreshed_at = now
+                    if self.tracker.refresh_spots():
+                        with self._lock:
+                            if self._pending_since is None:
+                                self._pending_since = now
+
+                last_quote_at = self._last_quote_at or self._last_evaluation or now
+                if self.tracker.positions and now - last_quote_at >= self.gap_seconds:
+                    with self._lock:
+                        if not self._in_gap:
+                            self._in_gap = True
+                            self._metrics["gaps"] += 1
+                            logging.warning("No option quotes for %.1fs, re-pricing over REST", now - last_quote_at)
+                        rest_due = now - self._last_evaluation >= self.gap_seconds
+                        if rest_due:
+                            self._metrics["rest_fallbacks"] += 1
+
+                    # Re-price over REST at the gap interval until quotes resume; the REST calls run
+                    # outside the lock so quotes arriving meanwhile are not held up
+                    if rest_due and self.tracker.tick() is not None:
+                        with self._lock:
+                            self._evaluate(quote_time=now, received_at=now)
+            except Exception as e:
+                logging.error("Error in stop-loss stream watchdog: %s", e)
+
+    def get_metrics(self):
+        """
+        Returns stream counters and tick-to-decision latency statistics in milliseconds
+
+        Returns:
+        - dict: Counters plus 'tick_to_decision_ms' and 'receive_to_decision_ms' summaries
+        """
+        with self._lock:
+            metrics = dict(self._metrics)
+            samples = list(self._latencies)
+        for index, name in enumerate(("tick_to_decision_ms", "receive_to_decision_ms")):
+            values = sorted(sample[index] * 1000 for sample in samples)
+            if not values:
+                metrics[name] = {}
+                continue
+            metrics[name] = {
+                "count": len(values),
+                "last": samples[-1][index] * 1000,
+                "p50": values[len(values) // 2],
+                "p99": values[min(int(len(values) * 0.99), len(values) - 1)],
+                "max": values[-1]
+            }
+        return metrics
+
+
+_stream = None
+
+
+def start_stop_loss_stream():
+    """
+    Starts the process-wide streaming stop-loss evaluation
+
+    Returns:
+    - StopLossQuoteStream: The running stream
+    """
+    global _stream
+    if _stream is None:
+        _stream = StopLossQuoteStream()
+    _stream.start()
+    return _stream
+
+
+def stop_stop_loss_stream():
+    """
+    Stops the process-wide streaming stop-loss evaluation
+
+    Returns:
+    - dict: Final stream metrics, or None if the stream was never started
+    """
+    if _stream is None:
+        return None
+    _stream.stop()
+    return _stream.get_metrics()
+
+
+def get_stream_metrics():
+    """
+    Returns the metrics of the process-wide stop-loss stream
+
+    Returns:
+    - dict: Stream metrics, or None if the stream was never started
+    """
+    return _stream.get_metrics() if _stream is not None else None
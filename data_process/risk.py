@@ -0,0 +1,69 @@
+import os
+import numpy as np
+from helper.market_clock import minutes_to_expiry
+from helper.option_model import minutes_to_years, black_scholes_greeks, implied_volatility
+
+# Volatility used for legs whose price gives no implied volatility and that never had one
+DEFAULT_VOLATILITY = float(os.getenv("RISK_DEFAULT_VOLATILITY", "0.20"))
+
+# Greeks reported per leg, per spread and for the whole book
+GREEKS = ("delta", "gamma", "theta", "vega")
+
+
+def risk_snapshot(book, spots, now=None, rate=0.0):
+    """
+    Computes per-leg implied volatilities and Greeks of the open legs and sums them per spread,
+    in a few batched array passes over the position book.
+
+    Implied volatilities are solved from the legs' current prices, seeded with each leg's last
+    solved volatility. Legs whose price gives none (no price, or outside the no-arbitrage bounds)
+    keep their last volatility, or DEFAULT_VOLATILITY. Legs whose underlying has no spot price are
+    left out. Greeks are per position: per-share values times signed quantity times 100.
+
+    Parameters:
+    - book: PositionBook with current leg prices
+    - spots: Underlying symbol to price mapping
+    - now: Timezone-aware datetime (default market_now())
+    - rate: Risk-free rate
+
+    Returns:
+    - dict: 'iv' and the per-leg Greeks in book row order, 'spread_delta', 'spread_gamma',
+      'spread_theta', 'spread_vega' and 'spread_short_delta' (largest absolute per-share delta of
+      each spread's short legs) in book.spread_keys order, and the book totals of each Greek
+    """
+    book.group_spreads()
+    n = book.size
+    count = book.spread_count
+
+    spot_by_underlying = np.array([spots.get(underlying, np.nan) for underlying in book.underlyings], dtype=float)
+    spot = spot_by_underlying[book.underlying_id[:n]] if n else np.empty(0)
+    qty = book.qty[:n]
+    is_call = book.right[:n] > 0
+    strike = book.strike[:n]
+    time_to_expiry = minutes_to_years(minutes_to_expiry(book.expiry[:n], now))
+
+    last_iv = book.iv[:n]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        iv = implied_volatility(book.price[:n], spot, strike, time_to_expiry, is_call, rate, initial=last_iv)
+    solved = np.isfinite(iv)
+    last_iv[solved] = iv[solved]
+    volatility = np.where(np.isfinite(last_iv), last_iv, DEFAULT_VOLATILITY)
+
+    known = np.isfinite(spot)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        greeks = black_scholes_greeks(spot, strike, time_to_expiry, volatility, is_call, rate)
+    contracts = np.where(known, qty * 100, 0.0)  # * 100 for option contracts
+
+    spread_id = book.spread_id[:n]
+    snapshot = {"iv": np.where(solved, iv, np.nan)}
+    for greek in GREEKS:
+        leg = np.where(known, greeks[greek], 0.0) * contracts
+        snapshot[greek] = leg
+        snapshot[f"spread_{greek}"] = np.bincount(spread_id, weights=leg, minlength=count)
+        snapshot[f"total_{greek}"] = float(leg.sum())
+
+    short = (qty < 0) & known
+    spread_short_delta = np.zeros(count)
+    np.maximum.at(spread_short_delta, spread_id[short], np.abs(greeks["delta"][short]))
+    snapshot["spread_short_delta"] = spread_short_delta
+    return snapshot
@@ -0,0 +1,175 @@
+import os
+import time
+import threading
+from datetime import datetime, timezone
+from helper.accounts import TRADING_ACCOUNTS
+from helper.clients import get_account_client
+from helper.fill_ledger import get_fill_ledger
+from bootstrap import bootstrap
+import logging
+
+bootstrap()
+
+# Override the trade-updates websocket, e.g. to point at a local fake server
+TRADE_STREAM_URL = os.getenv("ALP_TRADE_STREAM_URL")
+
+# Events that carry an order's fill state
+FILL_EVENTS = ("fill", "partial_fill", "canceled", "expired", "rejected", "done_for_day")
+
+
+class TradeUpdateStream:
+    """
+    Keeps the fill ledger current from the trade-updates websocket of every trading account.
+
+    Each account has its own stream thread. Every time a stream (re)connects, fills it may have
+    missed are loaded with one orders request, so the ledger has no gaps after start-up or a disconnect.
+    """
+
+    def __init__(self, accounts=None, url_override=TRADE_STREAM_URL):
+        self.accounts = accounts or TRADING_ACCOUNTS
+        self.url_override = url_override
+        self.ledger = get_fill_ledger()
+        self.streams = {}
+        self.started_at = None
+        self._running = threading.Event()
+        self._threads = []
+        self._metrics = {"updates": 0, "fills": 0, "reconnects": 0, "backfilled": 0}
+        self._metrics_lock = threading.Lock()
+
+    def start(self, since=None):
+        """
+        Starts one stream thread per account
+
+        Parameters:
+        - since: Backfill fills of orders submitted after this datetime (default midnight UTC today)
+        """
+        if self._running.is_set():
+            return
+
+        self.started_at = since or datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        self._running.set()
+        self._threads = [threading.Thread(target=self._run_stream, args=(account,),
+                                          name=f"trade-updates-{account['name']}", daemon=True)
+                         for account in self.accounts]
+        for thread in self._threads:
+            thread.start()
+        logging.info("Trade update stream started for %d accounts", len(self.accounts))
+
+    def stop(self):
+        """
+        Stops every account stream
+        """
+        self._running.clear()
+        for name, stream in list(self.streams.items()):
+            try:
+                stream.stop()
+            except Exception as e:
+                logging.warning("Error stopping trade update stream of account %s: %s", name, e)
+        logging.info("Trade update stream stopped. Metrics: %s", self.get_metrics())
+
+    def _record(self, field, amount=1):
+        """
+        Adds to one counter; the stream and backfill threads of every account update them
+        """
+        with self._metrics_lock:
+            self._metrics[field] += amount
+
+    def _backfill(self, account):
+        """
+        Loads the fills the stream may have missed before it connected
+        """
+        try:
+            self._record("backfilled", self.ledger.backfill(get_account_client(account), self.started_at))
+        except Exception as e:
+            logging.warning("Could not backfill fills of account %s: %s", account['name'], e)
+
+    def _create_stream(self, account):
+        """
+        Creates the websocket client of one account, backfilling fills after each (re)connect
+        """
+        from alpaca.trading.stream import TradingStream
+
+        backfill = self._backfill
+
+        class BackfillingTradingStream(TradingStream):
+            async def _start_ws(self):
+                await super()._start_ws()
+                # Fills made while disconnected never come over the stream, load them once subscribed
+                threading.Thread(target=backfill, args=(account,), name=f"trade-backfill-{account['name']}",
+                                 daemon=True).start()
+
+        stream = BackfillingTradingStream(account["key"], account["secret"], paper=account["paper"],
+                                          url_override=self.url_override)
+        stream.subscribe_trade_updates(self._on_trade_update)
+        return stream
+
+    def _run_stream(self, account):
+        """
+        Runs the websocket client of one account, recreating it if it exits while the stream should be running
+        """
+        name = account["name"]
+        while self._running.is_set():
+            stream = self.streams[name] = self._create_stream(account)
+            try:
+                stream.run()
+            except Exception as e:
+                logging.error("Trade update stream of account %s failed: %s", name, e)
+
+            if self._running.is_set():
+                self._record("reconnects")
+                logging.warning("Trade update stream of account %s disconnected, reconnecting", name)
+                time.sleep(1)
+
+    async def _on_trade_update(self, update):
+        """
+        Records the order's fill state from one trade update
+        """
+        self._record("updates")
+        event = getattr(update.event, "value", update.event)
+        if event not in FILL_EVENTS:
+            return
+
+        if self.ledger.record_order(update.order, update.timestamp) and event in ("fill", "partial_fill"):
+            self._record("fills")
+            logging.info("Fill for order %s: %s %s of %s at %s", update.order.id, update.order.filled_qty,
+                         update.order.side, update.order.symbol, update.order.filled_avg_price)
+
+    def get_metrics(self):
+        """
+        Returns stream counters
+
+        Returns:
+        - dict: Trade updates received, fills recorded, reconnects and backfilled orders
+        """
+        with self._metrics_lock:
+            return dict(self._metrics)
+
+
+_stream = None
+
+
+def start_trade_update_stream():
+    """
+    Starts the process-wide trade update stream
+
+    Returns:
+    - TradeUpdateStream: The running stream
+    """
+    global _stream
+    if _stream is None:
+        _stream = TradeUpdateStream()
+    _stream.start()
+    return _stream
+
+
+def stop_trade_update_stream():
+    """
+    Stops the process-wide trade update stream
+
+    Returns:
+    - dict: Final stream metrics, or None if the stream was never started
+    """
+    if _stream is None:
+        return None
+    _stream.stop()
+    return _stream.get_metrics()
@@ -0,0 +1,82 @@
+import os
+import threading
+from bootstrap import bootstrap
+
+bootstrap()
+
+# Account behind ALP_KEY and ALP_SECRET, used by every single-account code path
+DEFAULT_ACCOUNT = "default"
+
+_client_accounts = {}
+_lock = threading.Lock()
+
+
+def _load_accounts():
+    """
+    Reads the trading accounts the strategy fans out to.
+
+    ALP_ACCOUNTS lists account names, e.g. ALP_ACCOUNTS=default,paper2,live. Accounts other than
+    'default' take their credentials from ALP_KEY_<NAME> and ALP_SECRET_<NAME>. ALP_PAPER_<NAME>=0
+    makes an account live and ALP_QTY_<NAME> sets its contracts per leg (default 1).
+
+    Returns:
+    - list: Account dicts with 'name', 'key', 'secret', 'paper' and 'quantity'
+    """
+    names = [name.strip() for name in os.getenv("ALP_ACCOUNTS", DEFAULT_ACCOUNT).split(",") if name.strip()]
+
+    accounts = []
+    for name in names:
+        suffix = name.upper()
+        is_default = name == DEFAULT_ACCOUNT
+        accounts.append({
+            "name": name,
+            "key": os.getenv("ALP_KEY" if is_default else f"ALP_KEY_{suffix}"),
+            "secret": os.getenv("ALP_SECRET" if is_default else f"ALP_SECRET_{suffix}"),
+            "paper": os.getenv(f"ALP_PAPER_{suffix}", "1") != "0",
+            "quantity": int(os.getenv(f"ALP_QTY_{suffix}", "1"))
+        })
+    return accounts
+
+
+TRADING_ACCOUNTS = _load_accounts()
+
+
+def get_account(name):
+    """
+    Returns the configured account with a name
+
+    Parameters:
+    - name: Account name
+
+    Returns:
+    - dict: Account, or None if no account has that name
+    """
+    for account in TRADING_ACCOUNTS:
+        if account["name"] == name:
+            return account
+    return None
+
+
+def register_client(trading_client, name):
+    """
+    Records which account a TradingClient trades, so rate limits and circuit breakers stay per account
+
+    Parameters:
+    - trading_client: Alpaca TradingClient instance
+    - name: Account name
+    """
+    with _lock:
+        _client_accounts[id(trading_client)] = name
+
+
+def client_account(trading_client):
+    """
+    Returns the account name of a TradingClient
+
+    Parameters:
+    - trading_client: Alpaca TradingClient instance (or None)
+
+    Returns:
+    - str: Account name, DEFAULT_ACCOUNT for clients that were not registered
+    """
+    return _client_accounts.get(id(trading_client), DEFAULT_ACCOUNT)
@@ -0,0 +1,342 @@
+import time
+import uuid
+import random
+import threading
+from helper.accounts import DEFAULT_ACCOUNT, client_account
+from helper.clients import REQUEST_TIMEOUT_SECONDS
+from helper.tracing import span
+from bootstrap import bootstrap
+import logging
+
+bootstrap()
+
+# Total time budget for one broker call including retries
+DEFAULT_DEADLINE_SECONDS = 10.0
+
+# Longest one attempt can take, connect plus read timeout; a retry is only started while this still fits the deadline
+ATTEMPT_TIMEOUT_SECONDS = sum(REQUEST_TIMEOUT_SECONDS)
+
+# Retry policy for idempotent calls: attempts and jittered exponential backoff bounds
+MAX_ATTEMPTS = 4
+BACKOFF_BASE_SECONDS = 0.2
+BACKOFF_MAX_SECONDS = 2.0
+
+# Circuit breaker: consecutive failures that open it and how long it stays open
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30.0
+
+# HTTP statuses worth retrying
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class BrokerUnavailableError(Exception):
+    """
+    Raised without calling the broker while its circuit breaker is open
+    """
+
+
+class CircuitBreaker:
+    """
+    Opens after BREAKER_FAILURE_THRESHOLD consecutive transport failures and fails fast until
+    BREAKER_RESET_SECONDS pass, then lets a single trial call through (half-open)
+    """
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_seconds=BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Raises BrokerUnavailableError while open, moves to half-open once the reset time passed
+        """
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    raise BrokerUnavailableError(f"Circuit breaker '{self.name}' is open, broker calls are failing fast")
+                self.state = "half_open"
+                logging.info("Circuit breaker '%s' half-open, trying one call", self.name)
+
+    def record_success(self):
+        """
+        Closes the breaker after a call reached the broker
+        """
+        with self._lock:
+            if self.state != "closed":
+                logging.info("Circuit breaker '%s' closed", self.name)
+            self.state = "closed"
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        """
+        Counts a transport failure and opens the breaker at the threshold or after a failed trial call
+        """
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                    logging.error("Circuit breaker '%s' opened after %s consecutive failures", self.name,
+                                  self.consecutive_failures)
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+_breakers = {
+    "trading": CircuitBreaker("trading"),
+    "market_data": CircuitBreaker("market_data")
+}
+_breakers_lock = threading.Lock()
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def _get_breaker(api, trading_client=None):
+    """
+    Returns the circuit breaker of an API; trading calls get one breaker per account so a failing
+    account does not stop the others
+
+    Parameters:
+    - api: 'trading' or 'market_data'
+    - trading_client: Client the call goes through, used to find its account
+    """
+    account = client_account(trading_client)
+    if api != "trading" or account == DEFAULT_ACCOUNT:
+        return _breakers[api]
+
+    name = f"trading:{account}"
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def _record(operation, field):
+    """
+    Increments one counter of an operation's metrics
+    """
+    with _metrics_lock:
+        counters = _metrics.setdefault(operation, {"calls": 0, "retries": 0, "failures": 0, "short_circuited": 0})
+        counters[field] += 1
+
+
+def is_retryable_error(error):
+    """
+    Tells transport errors and throttling, which are worth retrying, apart from business rejections
+
+    Parameters:
+    - error: Exception raised by a broker call
+
+    Returns:
+    - bool: True if the call may succeed when retried
+    """
+    from alpaca.common.exceptions import APIError
+    from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout
+
+    if isinstance(error, (RequestsConnectionError, Timeout)):
+        return True
+    if isinstance(error, APIError):
+        try:
+            return error.status_code in RETRYABLE_STATUS_CODES
+        except Exception:
+            return False
+    return False
+
+
+def _is_api_error(error):
+    """
+    Returns True if the broker answered with an HTTP error
+    """
+    from alpaca.common.exceptions import APIError
+    return isinstance(error, APIError)
+
+
+def _attempt_fits(deadline_at, delay=0.0):
+    """
+    Tells whether an attempt started after delay seconds ends before the deadline even if it runs
+    into the full request timeout
+    """
+    return time.monotonic() + delay + ATTEMPT_TIMEOUT_SECONDS <= deadline_at
+
+
+def _backoff(attempt, deadline_at):
+    """
+    Sleeps for a jittered exponential backoff, unless the attempt after it could run past the deadline
+
+    Returns:
+    - bool: False if the deadline leaves no room for another attempt
+    """
+    delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+    if not _attempt_fits(deadline_at, delay):
+        return False
+    time.sleep(delay)
+    return True
+
+
+def call_broker(operation, fn, *args, api="trading", idempotent=True, deadline=DEFAULT_DEADLINE_SECONDS, **kwargs):
+    """
+    Runs a broker call behind the circuit breaker, retrying idempotent calls within a deadline
+
+    Parameters:
+    - operation: Name used for metrics and logs, e.g. 'get_all_positions'
+    - fn: The client method to call
+    - api: Circuit breaker to use, 'trading' (per account of the client fn is bound to) or 'market_data'
+    - idempotent: Whether the call can be retried safely
+    - deadline: Total seconds allowed for the call including retries; a retry is only started if
+      it would end in time even after the full request timeout (see ATTEMPT_TIMEOUT_SECONDS)
+
+    Returns:
+    - Whatever fn returns
+    """
+    breaker = _get_breaker(api, getattr(fn, "__self__", None))
+    deadline_at = time.monotonic() + deadline
+    attempt = 0
+
+    while True:
+        try:
+            breaker.before_call()
+        except BrokerUnavailableError:
+            _record(operation, "short_circuited")
+            raise
+
+        _record(operation, "calls")
+        try:
+            with span(f"broker.{operation}"):
+                result = fn(*args, **kwargs)
+            breaker.record_success()
+            return result
+        except Exception as e:
+            if not is_retryable_error(e):
+                # The broker answered, so it is reachable even though it rejected the call
+                if _is_api_error(e):
+                    breaker.record_success()
+                raise
+
+            breaker.record_failure()
+            attempt += 1
+            if not idempotent or attempt >= MAX_ATTEMPTS or not _backoff(attempt, deadline_at):
+                _record(operation, "failures")
+                raise
+
+            _record(operation, "retries")
+            logging.warning("Retrying %s (attempt %d) after error: %s", operation, attempt + 1, e)
+
+
+def _find_order(trading_client, client_order_id, error):
+    """
+    Looks up an order by client_order_id after a send failed with error
+
+    Returns:
+    - Order: The broker's order, or None if the broker does not have it or could not be asked
+    """
+    try:
+        existing = trading_client.get_order_by_client_id(client_order_id)
+    except Exception as lookup_error:
+        try:
+            not_found = _is_api_error(lookup_error) and lookup_error.status_code == 404
+        except Exception:
+            not_found = False
+        if not not_found:
+            logging.warning("Could not look up order %s: %s", client_order_id, lookup_error)
+        return None
+
+    logging.warning("Order %s was accepted despite error: %s", client_order_id, error)
+    return existing
+
+
+def submit_order_idempotent(trading_client, order_request, deadline=DEFAULT_DEADLINE_SECONDS):
+    """
+    Submits an order so that retries can never create a duplicate.
+
+    The order carries a client_order_id. After a transport failure the broker is asked
+    whether that client_order_id was accepted before the order is sent again with the same ID,
+    and a rejection of a resend (e.g. as a duplicate client_order_id) is checked the same way.
+
+    Parameters:
+    - trading_client: Alpaca TradingClient instance
+    - order_request: Alpaca order request
+    - deadline: Total seconds allowed including retries
+
+    Returns:
+    - Order: The broker's order
+    """
+    if not getattr(order_request, "client_order_id", None):
+        order_request.client_order_id = uuid.uuid4().hex
+    client_order_id = order_request.client_order_id
+
+    breaker = _get_breaker("trading", trading_client)
+    deadline_at = time.monotonic() + deadline
+    attempt = 0
+
+    while True:
+        try:
+            breaker.before_call()
+        except BrokerUnavailableError:
+            _record("submit_order", "short_circuited")
+            raise
+
+        _record("submit_order", "calls")
+        try:
+            with span("broker.submit_order"):
+                order = trading_client.submit_order(order_data=order_request)
+            breaker.record_success()
+            return order
+        except Exception as e:
+            if not is_retryable_error(e):
+                # The broker answered, so it is reachable even though it rejected the call
+                if _is_api_error(e):
+                    breaker.record_success()
+                    # A resend is rejected as a duplicate client_order_id when an earlier send went through
+                    if attempt > 0:
+                        existing = _find_order(trading_client, client_order_id, e)
+                        if existing is not None:
+                            return existing
+                raise
+
+            breaker.record_failure()
+            attempt += 1
+            if attempt >= MAX_ATTEMPTS or not _backoff(attempt, deadline_at):
+                _record("submit_order", "failures")
+                raise
+
+            # The order may have reached the broker even though the response did not reach us
+            existing = _find_order(trading_client, client_order_id, e)
+            if existing is not None:
+                return existing
+
+            # The lookup took part of the budget, the order is only sent again if it still fits
+            if not _attempt_fits(deadline_at):
+                _record("submit_order", "failures")
+                raise e
+
+            _record("submit_order", "retries")
+            logging.warning("Retrying order %s (attempt %d) after error: %s", client_order_id, attempt + 1, e)
+
+
+def get_broker_call_metrics():
+    """
+    Returns per-operation call counters and the state of each circuit breaker
+
+    Returns:
+    - dict: 'operations' counters and 'circuit_breakers' states
+    """
+    with _metrics_lock:
+        operations = {name: dict(counters) for name, counters in _metrics.items()}
+
+    return {
+        "operations": operations,
+        "circuit_breakers": {
+            name: {
+                "state": breaker.state,
+                "consecutive_failures": breaker.consecutive_failures,
+                "times_opened": breaker.times_opened
+            }
+            for name, breaker in list(_breakers.items())
+        }
+    }
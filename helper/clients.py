@@ -0,0 +1,258 @@
+import os
+import time
+import importlib
+import threading
+from requests.adapters import HTTPAdapter
+from helper.accounts import DEFAULT_ACCOUNT, TRADING_ACCOUNTS, register_client
+from bootstrap import bootstrap
+import logging
+
+bootstrap()
+
+API_KEY = os.getenv("ALP_KEY")
+API_SECRET = os.getenv("ALP_SECRET")
+
+# Optional base URLs for the trading and market data APIs (e.g. a local stand-in for benchmarks)
+TRADING_URL_OVERRIDE = os.getenv("ALP_TRADING_URL")
+DATA_URL_OVERRIDE = os.getenv("ALP_DATA_URL")
+
+# SDK modules the trading paths import on first use, loaded ahead of time by warm_up_clients
+SDK_MODULES = (
+    "alpaca.trading.client",
+    "alpaca.trading.requests",
+    "alpaca.trading.enums",
+    "alpaca.data.historical",
+    "alpaca.data.requests",
+    "alpaca.common.exceptions"
+)
+
+# Keep-alive pool sizing for each client session
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+
+# Connect and read timeouts applied to every HTTP request the clients make
+REQUEST_TIMEOUT_SECONDS = (3.05, 5.0)
+
+_clients = {}
+_adapters = {}
+_lock = threading.Lock()
+
+
+class _TimeoutHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that applies REQUEST_TIMEOUT_SECONDS when the caller did not pass a timeout
+    """
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = REQUEST_TIMEOUT_SECONDS
+        return super().send(request, **kwargs)
+
+
+def _mount_pooled_adapter(name, client):
+    """
+    Replaces the default adapter on the client's HTTP session with a larger keep-alive pool
+    and default request timeouts
+
+    Parameters:
+    - name: Registry key of the client
+    - client: Alpaca REST client instance
+    """
+    session = getattr(client, "_session", None)
+    if session is None:
+        logging.warning("Client %s has no HTTP session, connection pooling not configured", name)
+        return
+
+    adapter = _TimeoutHTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    _adapters[name] = adapter
+
+    # Retries are handled by helper.broker_call within a deadline, not by the SDK's fixed 3 second waits
+    if hasattr(client, "_retry"):
+        client._retry = 0
+
+
+def _get_client(name, factory):
+    """
+    Returns the shared client registered under name, creating it on first use
+
+    Parameters:
+    - name: Registry key of the client
+    - factory: Callable that builds the client
+
+    Returns:
+    - The shared client instance
+    """
+    client = _clients.get(name)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(name)
+        if client is None:
+            client = factory()
+            _mount_pooled_adapter(name, client)
+            _clients[name] = client
+            logging.info("Created shared Alpaca client: %s", name)
+
+    return client
+
+
+def get_trading_client(paper=True):
+    """
+    Returns the process-wide TradingClient
+
+    Parameters:
+    - paper: Whether to use the paper trading endpoint
+
+    Returns:
+    - TradingClient: Shared client instance
+    """
+    from alpaca.trading.client import TradingClient
+
+    name = "trading_paper" if paper else "trading_live"
+    return _get_client(name, lambda: TradingClient(API_KEY, API_SECRET, paper=paper,
+                                                      url_override=TRADING_URL_OVERRIDE))
+
+
+def get_account_client(account):
+    """
+    Returns the shared TradingClient of an account; the default account uses get_trading_client
+
+    Parameters:
+    - account: Account dict from helper.accounts.TRADING_ACCOUNTS
+
+    Returns:
+    - TradingClient: Shared client instance
+    """
+    if account["name"] == DEFAULT_ACCOUNT:
+        return get_trading_client(paper=account["paper"])
+
+    from alpaca.trading.client import TradingClient
+
+    client = _get_client(f"trading_{account['name']}",
+                         lambda: TradingClient(account["key"], account["secret"], paper=account["paper"],
+                                               url_override=TRADING_URL_OVERRIDE))
+    register_client(client, account["name"])
+    return client
+
+
+def get_account_clients(accounts=None):
+    """
+    Returns the TradingClient of every account the strategy trades
+
+    Parameters:
+    - accounts: List of account dicts (default TRADING_ACCOUNTS)
+
+    Returns:
+    - list: (account, TradingClient) tuples
+    """
+    return [(account, get_account_client(account)) for account in (accounts or TRADING_ACCOUNTS)]
+
+
+def get_stock_data_client():
+    """
+    Returns the process-wide StockHistoricalDataClient
+
+    Returns:
+    - StockHistoricalDataClient: Shared client instance
+    """
+    from alpaca.data.historical import StockHistoricalDataClient
+
+    return _get_client("stock_data", lambda: StockHistoricalDataClient(API_KEY, API_SECRET,
+                                                                        url_override=DATA_URL_OVERRIDE))
+
+
+def get_option_data_client():
+    """
+    Returns the process-wide OptionHistoricalDataClient
+
+    Returns:
+    - OptionHistoricalDataClient: Shared client instance
+    """
+    from alpaca.data.historical import OptionHistoricalDataClient
+
+    return _get_client("option_data", lambda: OptionHistoricalDataClient(API_KEY, API_SECRET,
+                                                                          url_override=DATA_URL_OVERRIDE))
+
+
+def import_sdk_modules():
+    """
+    Imports the Alpaca SDK modules used on the order and stop-loss paths.
+
+    The SDK (and pandas behind it) is imported lazily so the process starts quickly; this
+    loads it ahead of the first order instead.
+
+    Returns:
+    - float: Seconds spent importing
+    """
+    started_at = time.perf_counter()
+    for module in SDK_MODULES:
+        importlib.import_module(module)
+    return time.perf_counter() - started_at
+
+
+def warm_up_clients(symbol="QQQ"):
+    """
+    Opens the pooled connections ahead of time so the entry, exit and stop-loss
+    paths do not pay for the TLS handshake
+
+    Parameters:
+    - symbol: Symbol used for the market data warm-up request
+
+    Returns:
+    - dict: Connection statistics after the warm-up
+    """
+    logging.info("Imported Alpaca SDK in %.3fs", import_sdk_modules())
+
+    try:
+        get_trading_client().get_clock()
+    except Exception as e:
+        logging.warning("Trading client warm-up failed: %s", e)
+
+    from alpaca.data.requests import StockLatestQuoteRequest
+
+    try:
+        get_stock_data_client().get_stock_latest_quote(StockLatestQuoteRequest(symbol_or_symbols=symbol))
+    except Exception as e:
+        logging.warning("Market data client warm-up failed: %s", e)
+
+    stats = get_connection_stats()
+    logging.info("Alpaca clients warmed up: %s", stats['total'])
+    return stats
+
+
+def get_connection_stats():
+    """
+    Reports how often requests reused a pooled connection versus opened a new one
+
+    Returns:
+    - dict: Per-client and total counters of requests, new connections and reused connections
+    """
+    stats = {}
+    total = {"requests": 0, "new_connections": 0, "reused_connections": 0}
+
+    for name, adapter in list(_adapters.items()):
+        requests_count = 0
+        new_connections = 0
+
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_count += pool.num_requests
+            new_connections += pool.num_connections
+
+        stats[name] = {
+            "requests": requests_count,
+            "new_connections": new_connections,
+            "reused_connections": max(requests_count - new_connections, 0)
+        }
+
+        for field in total:
+            total[field] += stats[name][field]
+
+    stats["total"] = total
+    return stats
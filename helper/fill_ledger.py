@@ -0,0 +1,162 @@
+import threading
+from datetime import datetime, timezone
+from helper.broker_call import call_broker
+from bootstrap import bootstrap
+import logging
+
+bootstrap()
+
+# Orders per page when backfilling fills from the orders endpoint (the API maximum)
+BACKFILL_PAGE_LIMIT = 500
+
+
+def _enum_value(value):
+    """
+    Returns the string value of an SDK enum, or the value itself
+    """
+    return getattr(value, "value", value)
+
+
+class FillLedger:
+    """
+    Fills of the strategy's orders keyed by order ID: filled quantity, average fill price, status
+    and the first and last fill times.
+
+    The ledger is fed by the trade-updates stream (see data_process.trade_stream), so P&L and
+    stop-loss code read real fill prices without asking the broker about each order. A revision
+    counter changes with every recorded fill so readers know when to recompute.
+    """
+
+    def __init__(self):
+        self.fills = {}
+        self.revision = 0
+        self._lock = threading.Lock()
+
+    def record(self, order_id, symbol, side, filled_qty, filled_avg_price, status, timestamp=None):
+        """
+        Records the fill state of one order. Updates that arrive out of order and report less
+        filled quantity than already recorded are ignored.
+
+        Parameters:
+        - order_id: Broker order ID
+        - symbol: Order symbol
+        - side: 'buy' or 'sell'
+        - filled_qty: Quantity filled so far
+        - filled_avg_price: Average price of the filled quantity (None before the first fill)
+        - status: Order status, e.g. 'partially_filled', 'filled' or 'canceled'
+        - timestamp: Time of the update (default now)
+
+        Returns:
+        - bool: True if the ledger changed
+        """
+        order_id = str(order_id)
+        filled_qty = float(filled_qty or 0)
+        filled_avg_price = float(filled_avg_price) if filled_avg_price is not None else None
+        timestamp = timestamp or datetime.now(timezone.utc)
+
+        with self._lock:
+            fill = self.fills.get(order_id)
+            if fill is not None and (filled_qty < fill["filled_qty"]
+                                     or (filled_qty == fill["filled_qty"] and status == fill["status"])):
+                return False
+
+            if fill is None:
+                fill = self.fills[order_id] = {
+                    "order_id": order_id,
+                    "symbol": symbol,
+                    "side": side,
+                    "filled_qty": 0.0,
+                    "filled_avg_price": None,
+                    "status": None,
+                    "first_fill_at": None,
+                    "last_fill_at": None
+                }
+            if filled_qty > fill["filled_qty"]:
+                fill["first_fill_at"] = fill["first_fill_at"] or timestamp
+                fill["last_fill_at"] = timestamp
+            fill["filled_qty"] = filled_qty
+            fill["filled_avg_price"] = filled_avg_price
+            fill["status"] = status
+            self.revision += 1
+        return True
+
+    def record_order(self, order, timestamp=None):
+        """
+        Records the fill state of an SDK Order, including the legs of a multi-leg order
+
+        Parameters:
+        - order: Alpaca Order (from a trade update or the orders endpoint)
+        - timestamp: Time of the update (default the order's filled_at or updated_at)
+
+        Returns:
+        - bool: True if the ledger changed
+        """
+        changed = False
+        for leg in order.legs or []:
+            changed = self.record_order(leg, timestamp) or changed
+
+        if order.symbol is None:
+            # Multi-leg parent order, its legs carry the fills
+            return changed
+
+        return self.record(order.id, order.symbol, _enum_value(order.side), order.filled_qty,
+                           order.filled_avg_price, _enum_value(order.status),
+                           timestamp or order.filled_at or order.updated_at) or changed
+
+    def get(self, order_id):
+        """
+        Returns the fill of one order
+
+        Parameters:
+        - order_id: Broker order ID
+
+        Returns:
+        - dict: Fill with 'filled_qty', 'filled_avg_price', 'status', 'first_fill_at' and 'last_fill_at',
+          or None if no update for the order was seen
+        """
+        return self.fills.get(str(order_id))
+
+    def backfill(self, trading_client, after):
+        """
+        Loads the fills of orders submitted since a time from the orders endpoint, e.g. on start-up
+        or after the stream was disconnected. One paged request covers every order.
+
+        Parameters:
+        - trading_client: Alpaca TradingClient instance
+        - after: datetime; orders submitted before it are skipped
+
+        Returns:
+        - int: Number of orders whose fill state changed
+        """
+        from alpaca.trading.requests import GetOrdersRequest
+        from alpaca.trading.enums import QueryOrderStatus
+        from alpaca.common.enums import Sort
+
+        changed = 0
+        until = None
+        while True:
+            request = GetOrdersRequest(status=QueryOrderStatus.ALL, after=after, until=until,
+                                       limit=BACKFILL_PAGE_LIMIT, direction=Sort.DESC, nested=True)
+            orders = call_broker("get_orders", trading_client.get_orders, request)
+            for order in orders:
+                changed += self.record_order(order)
+            # Orders come newest first, page back from the oldest one seen
+            if len(orders) < BACKFILL_PAGE_LIMIT or orders[-1].submitted_at == until:
+                break
+            until = orders[-1].submitted_at
+
+        logging.info("Backfilled fills of %s orders submitted since %s", changed, after)
+        return changed
+
+
+_ledger = FillLedger()
+
+
+def get_fill_ledger():
+    """
+    Returns the process-wide FillLedger
+
+    Returns:
+    - FillLedger: Shared ledger instance
+    """
+    return _ledger
@@ -0,0 +1,243 @@
+import os
+import time
+import datetime
+import threading
+import numpy as np
+from helper.market_clock import minutes_to_expiry
+from helper.option_model import minutes_to_years, implied_volatility, black_scholes_price
+from helper.option_symbol import parse_option_symbol
+from bootstrap import bootstrap
+import logging
+
+bootstrap()
+
+# Listed strikes on each side of the underlying price that are quoted when a slice is refreshed
+SURFACE_STRIKE_WINDOW = int(os.getenv("IV_SURFACE_STRIKE_WINDOW", "10"))
+
+# Strikes whose quote did not change are solved again once the underlying moved more than this fraction
+SURFACE_SPOT_TOLERANCE = 0.0005
+
+
+def _to_date(expiration):
+    """
+    Normalizes an expiration given as datetime.date or YYYY-MM-DD string
+    """
+    if isinstance(expiration, str):
+        return datetime.datetime.strptime(expiration, "%Y-%m-%d").date()
+    return expiration
+
+
+class IVSlice:
+    """
+    Implied volatilities of one underlying and expiry on a sorted strike grid. Puts are row 0 and
+    calls row 1 of the 2 x strikes arrays; each cell keeps the price and underlying price it was
+    solved from, so unchanged quotes are not solved again.
+    """
+
+    def __init__(self):
+        self.strikes = np.empty(0)
+        self.mid = np.empty((2, 0))
+        self.iv = np.empty((2, 0))
+        self.solved_spot = np.empty((2, 0))
+        self.spot = None
+        self.updated_at = None
+        self._curve = None
+
+    def _add_strikes(self, strikes):
+        """
+        Extends the grid with strikes not seen before, keeping the solved cells
+        """
+        grid = np.union1d(self.strikes, strikes)
+        if len(grid) == len(self.strikes):
+            return
+        rows = np.searchsorted(grid, self.strikes)
+        for name in ("mid", "iv", "solved_spot"):
+            grown = np.full((2, len(grid)), np.nan)
+            grown[:, rows] = getattr(self, name)
+            setattr(self, name, grown)
+        self.strikes = grid
+
+    def update(self, strikes, is_call, prices, spot, time_to_expiry):
+        """
+        Solves the implied volatilities of the quotes that changed
+
+        Parameters:
+        - strikes: numpy array of strikes
+        - is_call: numpy bool array, True for calls
+        - prices: numpy array of option mid prices
+        - spot: Underlying price
+        - time_to_expiry: Time to expiry in years
+
+        Returns:
+        - int: Number of cells solved
+        """
+        self._add_strikes(strikes)
+        rows = np.searchsorted(self.strikes, strikes)
+        sides = is_call.astype(np.intp)
+        if spot != self.spot:
+            self.spot = spot
+            self._curve = None
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            moved = ~(np.abs(spot / self.solved_spot[sides, rows] - 1) <= SURFACE_SPOT_TOLERANCE)
+        changed = moved | (prices != self.mid[sides, rows])
+        if not changed.any():
+            return 0
+
+        rows, sides, prices = rows[changed], sides[changed], prices[changed]
+        self.iv[sides, rows] = implied_volatility(prices, spot, self.strikes[rows], time_to_expiry, sides == 1,
+                                                  initial=self.iv[sides, rows])
+        self.mid[sides, rows] = prices
+        self.solved_spot[sides, rows] = spot
+        self._curve = None
+        return len(rows)
+
+    def curve(self):
+        """
+        Volatility smile across strikes: the out-of-the-money side of each strike (puts below the
+        underlying, calls above), or the other side where that one has no volatility
+
+        Returns:
+        - tuple: (strikes, volatilities) numpy arrays, strikes ascending
+        """
+        if self._curve is None:
+            below = self.strikes < self.spot
+            otm = np.where(below, self.iv[0], self.iv[1])
+            iv = np.where(np.isfinite(otm), otm, np.where(below, self.iv[1], self.iv[0]))
+            known = np.isfinite(iv)
+            self._curve = (self.strikes[known], iv[known])
+        return self._curve
+
+    def volatility(self, strikes):
+        """
+        Interpolates the smile linearly between strikes, flat beyond the outermost ones
+
+        Parameters:
+        - strikes: Scalar or numpy array of strikes
+
+        Returns:
+        - numpy.ndarray: Volatilities, NaN if no strike of the slice has one
+        """
+        known_strikes, iv = self.curve()
+        if not len(iv):
+            return np.full(np.shape(strikes), np.nan)
+        return np.interp(strikes, known_strikes, iv)
+
+
+class IVSurface:
+    """
+    Intraday implied-volatility surface: one IVSlice per underlying and expiry, built from option
+    quote snapshots.
+
+    Updates only solve the strikes whose quote changed (or whose underlying moved), seeded with
+    their previous volatility. Lookups interpolate across strikes, so contracts without a usable
+    quote can still be priced, e.g. to mark illiquid legs or to estimate a spread's credit before
+    its orders are sent.
+    """
+
+    def __init__(self):
+        self.slices = {}
+        self._lock = threading.Lock()
+
+    def update(self, prices, spots, now=None):
+        """
+        Records option prices and solves the implied volatilities of the ones that changed
+
+        Parameters:
+        - prices: OCC option symbol to mid price mapping
+        - spots: Underlying symbol to price mapping; options on other underlyings are skipped
+        - now: Timezone-aware datetime (default market_now())
+
+        Returns:
+        - int: Number of strikes solved
+        """
+        groups = {}
+        for symbol, price in prices.items():
+            fields = parse_option_symbol(symbol)
+            if fields is None or fields[0] not in spots:
+                continue
+            underlying, expiration, right, strike = fields
+            group = groups.setdefault((underlying, expiration), ([], [], []))
+            group[0].append(strike)
+            group[1].append(right == "C")
+            group[2].append(price)
+
+        solved = 0
+        with self._lock:
+            for (underlying, expiration), (strikes, calls, slice_prices) in groups.items():
+                time_to_expiry = minutes_to_years(minutes_to_expiry([expiration], now))[0]
+                iv_slice = self.slices.get((underlying, expiration))
+                if iv_slice is None:
+                    iv_slice = self.slices[(underlying, expiration)] = IVSlice()
+                solved += iv_slice.update(np.array(strikes), np.array(calls), np.array(slice_prices, dtype=float),
+                                          spots[underlying], time_to_expiry)
+                iv_slice.updated_at = time.time()
+
+        logging.debug("IV surface update solved %d of %d quotes", solved, len(prices))
+        return solved
+
+    def volatility(self, underlying, expiration, strikes):
+        """
+        Looks up interpolated implied volatilities
+
+        Parameters:
+        - underlying: Underlying symbol
+        - expiration: datetime.date or YYYY-MM-DD string
+        - strikes: Scalar or numpy array of strikes
+
+        Returns:
+        - numpy.ndarray: Volatilities, NaN when the surface has no volatility for the expiry
+        """
+        with self._lock:
+            iv_slice = self.slices.get((underlying, _to_date(expiration)))
+            if iv_slice is None:
+                return np.full(np.shape(strikes), np.nan)
+            return iv_slice.volatility(strikes)
+
+    def mark_prices(self, symbols, spots=None, now=None):
+        """
+        Prices options off the surface with Black-Scholes at their interpolated volatilities
+
+        Parameters:
+        - symbols: OCC option symbols
+        - spots: Optional underlying symbol to price mapping (default the price of the last update)
+        - now: Timezone-aware datetime (default market_now())
+
+        Returns:
+        - dict: Symbol to model price, for the symbols whose expiry has volatilities on the surface
+        """
+        spots = spots or {}
+        legs = []
+        with self._lock:
+            for symbol in symbols:
+                fields = parse_option_symbol(symbol)
+                iv_slice = self.slices.get(fields[:2]) if fields else None
+                if iv_slice is None:
+                    continue
+                underlying, expiration, right, strike = fields
+                volatility = float(iv_slice.volatility(strike))
+                if volatility == volatility:
+                    legs.append((symbol, expiration, right == "C", strike, spots.get(underlying, iv_slice.spot),
+                                 volatility))
+
+        if not legs:
+            return {}
+
+        symbols, expirations, calls, strikes, leg_spots, volatilities = zip(*legs)
+        time_to_expiry = minutes_to_years(minutes_to_expiry(expirations, now))
+        marks = black_scholes_price(np.array(leg_spots, dtype=float), np.array(strikes), time_to_expiry,
+                                    np.array(volatilities), np.array(calls))
+        return dict(zip(symbols, marks.tolist()))
+
+
+_surface = IVSurface()
+
+
+def get_iv_surface():
+    """
+    Returns the process-wide IVSurface
+
+    Returns:
+    - IVSurface: Shared surface instance
+    """
+    return _surface
@@ -0,0 +1,420 @@
+import time
+import datetime
+from functools import lru_cache
+import numpy as np
+import pytz
+from helper.option_model import MINUTES_PER_SESSION
+
+MARKET_TIMEZONE = pytz.timezone('America/New_York')
+
+REGULAR_OPEN = datetime.time(9, 30)
+REGULAR_CLOSE = datetime.time(16, 0)
+EARLY_CLOSE = datetime.time(13, 0)
+
+# Closures that do not follow the regular holiday rules (national days of mourning)
+SPECIAL_CLOSURES = {
+    datetime.date(2018, 12, 5),
+    datetime.date(2025, 1, 9),
+}
+
+# Underlyings with an expiry on every trading day; all others expire weekly on Fridays
+DAILY_EXPIRY_UNDERLYINGS = {"QQQ", "SPY", "IWM"}
+
+_clock_cache = {"offset": None, "valid_until": 0.0}
+
+
+def market_now():
+    """
+    Returns the current time in America/New_York.
+
+    The UTC offset is cached until the next whole UTC hour; DST transitions happen on the hour,
+    so the pytz conversion runs at most once an hour instead of on every call.
+
+    Returns:
+    - datetime: Timezone-aware current market time
+    """
+    now = time.time()
+    if now >= _clock_cache["valid_until"]:
+        _clock_cache["offset"] = datetime.datetime.fromtimestamp(now, MARKET_TIMEZONE).utcoffset()
+        _clock_cache["valid_until"] = (now // 3600 + 1) * 3600
+
+    offset = _clock_cache["offset"]
+    return datetime.datetime.fromtimestamp(now, datetime.timezone(offset))
+
+
+def market_today():
+    """
+    Returns today's date in America/New_York
+    """
+    return market_now().date()
+
+
+def _easter_sunday(year):
+    """
+    Returns Easter Sunday for a year (anonymous Gregorian algorithm)
+    """
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return datetime.date(year, month, day + 1)
+
+
+def _nth_weekday(year, month, weekday, n):
+    """
+    Returns the n-th given weekday of a month (n=-1 for the last one)
+    """
+    if n > 0:
+        first = datetime.date(year, month, 1)
+        return first + datetime.timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+    next_month = datetime.date(year + month // 12, month % 12 + 1, 1)
+    last = next_month - datetime.timedelta(days=1)
+    return last - datetime.timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(date_):
+    """
+    Moves a fixed-date holiday falling on a weekend to the weekday the exchange observes it
+    """
+    if date_.weekday() == 5:
+        return date_ - datetime.timedelta(days=1)
+    if date_.weekday() == 6:
+        return date_ + datetime.timedelta(days=1)
+    return date_
+
+
+def exchange_holidays(year):
+    """
+    Returns the NYSE full-day holidays of a year
+
+    Parameters:
+    - year: Calendar year
+
+    Returns:
+    - set: datetime.date holidays
+    """
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),                   # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),                   # Washington's Birthday
+        _easter_sunday(year) - datetime.timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),                  # Memorial Day
+        _observed(datetime.date(year, 7, 4)),          # Independence Day
+        _nth_weekday(year, 9, 0, 1),                   # Labor Day
+        _nth_weekday(year, 11, 3, 4),                  # Thanksgiving
+        _observed(datetime.date(year, 12, 25)),        # Christmas
+    }
+
+    # New Year's Day is moved to Monday when on a Sunday but not to the previous Friday when on a Saturday
+    new_year = datetime.date(year, 1, 1)
+    if new_year.weekday() == 6:
+        holidays.add(new_year + datetime.timedelta(days=1))
+    elif new_year.weekday() < 5:
+        holidays.add(new_year)
+
+    if year >= 2022:
+        holidays.add(_observed(datetime.date(year, 6, 19)))  # Juneteenth
+
+    holidays.update(d for d in SPECIAL_CLOSURES if d.year == year)
+    return holidays
+
+
+def early_closes(year):
+    """
+    Returns the days of a year on which the exchange closes at 13:00
+
+    Parameters:
+    - year: Calendar year
+
+    Returns:
+    - set: datetime.date early-close days
+    """
+    closes = {_nth_weekday(year, 11, 3, 4) + datetime.timedelta(days=1)}  # Day after Thanksgiving
+
+    for date_ in (datetime.date(year, 7, 3), datetime.date(year, 12, 24)):
+        if date_.weekday() < 4:
+            closes.add(date_)
+
+    return closes
+
+
+class SessionCalendar:
+    """
+    Precomputed trading calendar of one year.
+
+    Point lookups (trading day, previous/next trading day, session close, expiries) are dict or
+    set lookups; range queries return views into the sorted numpy array of trading days.
+    """
+
+    def __init__(self, year):
+        self.year = year
+        self.holidays = exchange_holidays(year)
+        self.early_closes = early_closes(year)
+
+        days = np.arange(np.datetime64(f"{year}-01-01"), np.datetime64(f"{year + 1}-01-01"))
+        self.holiday_array = np.array(sorted(self.holidays), dtype="datetime64[D]")
+        self.trading_days = days[np.is_busday(days, holidays=self.holiday_array)]
+        self.trading_day_list = self.trading_days.astype(datetime.date).tolist()
+        self.index = {date_: i for i, date_ in enumerate(self.trading_day_list)}
+
+        self.monthly_expiries = set()
+        self.weekly_expiries = set()
+        for month in range(1, 13):
+            self.monthly_expiries.add(self._expiry_on_or_before(_nth_weekday(year, month, 4, 3)))
+
+        friday = _nth_weekday(year, 1, 4, 1)
+        while friday.year == year:
+            self.weekly_expiries.add(self._expiry_on_or_before(friday))
+            friday += datetime.timedelta(days=7)
+
+    def _expiry_on_or_before(self, date_):
+        """
+        Moves an expiry that falls on a holiday to the preceding trading day
+        """
+        while date_ not in self.index and date_.year == self.year:
+            date_ -= datetime.timedelta(days=1)
+        return date_
+
+
+@lru_cache(maxsize=None)
+def get_session_calendar(year):
+    """
+    Returns the cached SessionCalendar of a year, building it on first use
+
+    Parameters:
+    - year: Calendar year
+
+    Returns:
+    - SessionCalendar: Calendar of that year
+    """
+    return SessionCalendar(year)
+
+
+def is_trading_day(date_):
+    """
+    Tells whether the exchange is open on a date
+
+    Parameters:
+    - date_: datetime.date
+
+    Returns:
+    - bool: True on trading days
+    """
+    return date_ in get_session_calendar(date_.year).index
+
+
+def previous_trading_day(date_):
+    """
+    Returns the last trading day strictly before a date
+
+    Parameters:
+    - date_: datetime.date
+
+    Returns:
+    - datetime.date: Previous trading day
+    """
+    calendar = get_session_calendar(date_.year)
+    position = calendar.index.get(date_)
+    if position is None:
+        position = int(np.searchsorted(calendar.trading_days, np.datetime64(date_)))
+
+    if position > 0:
+        return calendar.trading_day_list[position - 1]
+    return get_session_calendar(date_.year - 1).trading_day_list[-1]
+
+
+def next_trading_day(date_):
+    """
+    Returns the first trading day strictly after a date
+
+    Parameters:
+    - date_: datetime.date
+
+    Returns:
+    - datetime.date: Next trading day
+    """
+    calendar = get_session_calendar(date_.year)
+    position = calendar.index.get(date_)
+    position = position + 1 if position is not None else int(
+        np.searchsorted(calendar.trading_days, np.datetime64(date_)))
+
+    if position < len(calendar.trading_day_list):
+        return calendar.trading_day_list[position]
+    return get_session_calendar(date_.year + 1).trading_day_list[0]
+
+
+def session_close(date_):
+    """
+    Returns the closing time of a trading day
+
+    Parameters:
+    - date_: datetime.date
+
+    Returns:
+    - datetime.time: 13:00 on early-close days, 16:00 otherwise, None when the market is closed
+    """
+    calendar = get_session_calendar(date_.year)
+    if date_ not in calendar.index:
+        return None
+    return EARLY_CLOSE if date_ in calendar.early_closes else REGULAR_CLOSE
+
+
+def is_monthly_expiry(date_):
+    """
+    Tells whether a date is the standard monthly option expiry (third Friday or the trading day before it)
+    """
+    return date_ in get_session_calendar(date_.year).monthly_expiries
+
+
+def is_expiry_day(date_, underlying="QQQ"):
+    """
+    Tells whether options on an underlying expire on a date
+
+    Parameters:
+    - date_: datetime.date
+    - underlying: Underlying symbol
+
+    Returns:
+    - bool: True if a contract expires that day
+    """
+    calendar = get_session_calendar(date_.year)
+    if underlying in DAILY_EXPIRY_UNDERLYINGS:
+        return date_ in calendar.index
+    return date_ in calendar.weekly_expiries
+
+
+def _calendars_for(start, end):
+    """
+    Returns the cached calendars of every year from start to end
+    """
+    return [get_session_calendar(year) for year in range(start.year, end.year + 1)]
+
+
+def trading_days_between(start, end):
+    """
+    Returns the trading days in [start, end]; a view into the cached array when the range is within one year
+
+    Parameters:
+    - start: datetime.date
+    - end: datetime.date
+
+    Returns:
+    - numpy.ndarray: datetime64[D] trading days
+    """
+    parts = []
+    for calendar in _calendars_for(start, end):
+        days = calendar.trading_days
+        lo = np.searchsorted(days, np.datetime64(start))
+        hi = np.searchsorted(days, np.datetime64(end), side="right")
+        parts.append(days[lo:hi])
+    return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+
+def minutes_to_expiry(expiry, now=None):
+    """
+    Trading minutes left until each expiry's close: the rest of today's session plus a full
+    session for every trading day after today up to the expiry
+
+    Parameters:
+    - expiry: Array-like of expiration dates (datetime64[D] or convertible)
+    - now: Timezone-aware datetime (default market_now())
+
+    Returns:
+    - numpy.ndarray: Minutes to expiry, 0 for expired contracts
+    """
+    expiry = np.asarray(expiry, dtype="datetime64[D]")
+    now = (now or market_now()).astimezone(MARKET_TIMEZONE).replace(tzinfo=None)
+    today = now.date()
+
+    close = session_close(today)
+    minutes_today = 0.0
+    if close is not None:
+        minutes_today = (datetime.datetime.combine(today, close) - now).total_seconds() / 60
+        minutes_today = min(max(minutes_today, 0.0), MINUTES_PER_SESSION)
+
+    # Few distinct expiries, count the sessions of each once
+    dates, inverse = np.unique(expiry, return_inverse=True)
+    sessions = np.array([len(trading_days_between(today + datetime.timedelta(days=1), date.astype(object)))
+                         if date >= np.datetime64(today) else -1 for date in dates], dtype=float)
+    minutes = minutes_today + sessions * MINUTES_PER_SESSION
+    return np.where(sessions < 0, 0.0, minutes)[inverse]
+
+
+def trading_day_mask(dates):
+    """
+    Vectorized trading-day test over an array of dates
+
+    Parameters:
+    - dates: Array-like of dates (datetime64[D] or convertible)
+
+    Returns:
+    - numpy.ndarray: Boolean mask, True where the exchange is open
+    """
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    if dates.size == 0:
+        return np.zeros(0, dtype=bool)
+
+    years = dates.astype("datetime64[Y]").astype(int) + 1970
+    holidays = np.concatenate([get_session_calendar(int(year)).holiday_array for year in np.unique(years)])
+    return np.is_busday(dates, holidays=holidays)
+
+
+def previous_trading_days(dates):
+    """
+    Vectorized previous_trading_day over an array of dates
+
+    Parameters:
+    - dates: Array-like of dates (datetime64[D] or convertible)
+
+    Returns:
+    - numpy.ndarray: datetime64[D] previous trading day of each date
+    """
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    if dates.size == 0:
+        return dates
+
+    first = dates.min().astype(datetime.date)
+    last = dates.max().astype(datetime.date)
+    days = trading_days_between(datetime.date(first.year - 1, 1, 1), last)
+    return days[np.searchsorted(days, dates) - 1]
+
+
+def monthly_expiry_mask(dates):
+    """
+    Vectorized is_monthly_expiry over an array of dates
+
+    Parameters:
+    - dates: Array-like of dates (datetime64[D] or convertible)
+
+    Returns:
+    - numpy.ndarray: Boolean mask, True on monthly expiries
+    """
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    if dates.size == 0:
+        return np.zeros(0, dtype=bool)
+
+    years = np.unique(dates.astype("datetime64[Y]").astype(int) + 1970)
+    expiries = np.array(sorted(d for year in years for d in get_session_calendar(int(year)).monthly_expiries),
+                        dtype="datetime64[D]")
+    return np.isin(dates, expiries)
+
+
+def last_weekday_of_month_mask(dates):
+    """
+    Vectorized test for dates that are the last of their weekday in their month
+    (the same weekday a week later falls in the next month)
+
+    Parameters:
+    - dates: Array-like of dates (datetime64[D] or convertible)
+
+    Returns:
+    - numpy.ndarray: Boolean mask
+    """
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    return (dates + 7).astype("datetime64[M]") != dates.astype("datetime64[M]")
@@ -0,0 +1,202 @@
+import time
+import datetime
+import threading
+import numpy as np
+from helper.broker_call import call_broker
+from helper.clients import get_trading_client
+from bootstrap import bootstrap
+import logging
+
+bootstrap()
+
+# Contracts per page of the option contracts API (the API maximum)
+CONTRACTS_PAGE_LIMIT = 10000
+
+
+def _to_date(expiration):
+    """
+    Normalizes an expiration given as datetime.date or YYYY-MM-DD string
+    """
+    if isinstance(expiration, str):
+        return datetime.datetime.strptime(expiration, "%Y-%m-%d").date()
+    return expiration
+
+
+class OptionChainIndex:
+    """
+    Listed option strikes per underlying, expiry and right, loaded once before the open.
+
+    Each chain is a sorted numpy array of strikes with the matching OCC symbols, so finding
+    the nearest listed strike is a binary search and needs no API call on the entry path.
+    """
+
+    def __init__(self):
+        self.chains = {}
+        self.loaded_at = {}
+        self._lock = threading.Lock()
+
+    def set_chain(self, underlying, expiration, right, strikes, symbols):
+        """
+        Replaces one chain
+
+        Parameters:
+        - underlying: Underlying symbol
+        - expiration: datetime.date or YYYY-MM-DD string
+        - right: 'P' or 'C'
+        - strikes: Listed strikes, in any order
+        - symbols: OCC symbol of each strike
+        """
+        strikes = np.asarray(strikes, dtype=np.float64)
+        order = np.argsort(strikes, kind="stable")
+        with self._lock:
+            self.chains[(underlying, _to_date(expiration), right)] = (strikes[order], [symbols[i] for i in order])
+
+    def has_chain(self, underlying, expiration):
+        """
+        Tells whether the chain of an underlying and expiry was loaded
+        """
+        expiration = _to_date(expiration)
+        return (underlying, expiration, "P") in self.chains or (underlying, expiration, "C") in self.chains
+
+    def load(self, underlyings, expiration, trading_client=None):
+        """
+        Fetches the active contracts of every underlying for one expiry and rebuilds their chains
+
+        Parameters:
+        - underlyings: List of underlying symbols
+        - expiration: datetime.date or YYYY-MM-DD string
+        - trading_client: Optional TradingClient (default the shared client)
+
+        Returns:
+        - dict: Number of contracts loaded per underlying
+        """
+        from alpaca.trading.requests import GetOptionContractsRequest
+        from alpaca.trading.enums import AssetStatus
+
+        expiration = _to_date(expiration)
+        trading_client = trading_client or get_trading_client()
+        started_at = time.perf_counter()
+
+        listed = {}
+        page_token = None
+        while True:
+            request = GetOptionContractsRequest(underlying_symbols=list(underlyings), status=AssetStatus.ACTIVE,
+                                                expiration_date=expiration, limit=CONTRACTS_PAGE_LIMIT,
+                                                page_token=page_token)
+            response = call_broker("get_option_contracts", trading_client.get_option_contracts, request)
+            for contract in response.option_contracts or []:
+                if not contract.tradable:
+                    continue
+                right = "C" if contract.type.value == "call" else "P"
+                chain = listed.setdefault((contract.underlying_symbol, right), ([], []))
+                chain[0].append(contract.strike_price)
+                chain[1].append(contract.symbol)
+            page_token = response.next_page_token
+            if not page_token:
+                break
+
+        counts = {}
+        for (underlying, right), (strikes, symbols) in listed.items():
+            self.set_chain(underlying, expiration, right, strikes, symbols)
+            counts[underlying] = counts.get(underlying, 0) + len(strikes)
+        for underlying in underlyings:
+            self.loaded_at[(underlying, expiration)] = time.time()
+            if underlying not in counts:
+                logging.warning("No listed %s options expire on %s", underlying, expiration)
+
+        logging.info("Loaded %d option contracts expiring %s for %d underlyings in %.2fs", sum(counts.values()),
+                     expiration, len(underlyings), time.perf_counter() - started_at)
+        return counts
+
+    def nearest_strike(self, underlying, expiration, right, target, beyond=True):
+        """
+        Finds the nearest listed strike at or beyond a target, i.e. at or below it for puts and at
+        or above it for calls (further out of the money)
+
+        Parameters:
+        - underlying: Underlying symbol
+        - expiration: datetime.date or YYYY-MM-DD string
+        - right: 'P' or 'C'
+        - target: Strike price to snap
+        - beyond: If False, snap towards the money instead (at or above for puts, at or below for calls)
+
+        Returns:
+        - tuple: (strike, OCC symbol), or None if no listed strike qualifies or the chain is not loaded
+        """
+        chain = self.chains.get((underlying, _to_date(expiration), right))
+        if chain is None:
+            return None
+
+        strikes, symbols = chain
+        if (right == "P") == beyond:
+            i = int(np.searchsorted(strikes, target, side="right")) - 1
+        else:
+            i = int(np.searchsorted(strikes, target, side="left"))
+        if i < 0 or i >= len(strikes):
+            return None
+        return float(strikes[i]), symbols[i]
+
+    def contracts_near(self, underlying, expiration, price, window):
+        """
+        Lists the contracts of both rights within window listed strikes of a price
+
+        Parameters:
+        - underlying: Underlying symbol
+        - expiration: datetime.date or YYYY-MM-DD string
+        - price: Underlying price
+        - window: Listed strikes taken on each side of the price
+
+        Returns:
+        - list: OCC symbols, empty if the chain is not loaded
+        """
+        symbols = []
+        for right in ("P", "C"):
+            chain = self.chains.get((underlying, _to_date(expiration), right))
+            if chain is None:
+                continue
+            strikes, chain_symbols = chain
+            i = int(np.searchsorted(strikes, price))
+            symbols.extend(chain_symbols[max(i - window, 0):i + window])
+        return symbols
+
+    def spread_legs(self, underlying, expiration, right, buy_target, sell_target):
+        """
+        Snaps both legs of a credit spread to listed contracts. The short leg takes the nearest listed
+        strike at or beyond its target, the long leg the nearest listed strike at or beyond its own
+        target that is further out of the money than the short leg.
+
+        Parameters:
+        - underlying: Underlying symbol
+        - expiration: datetime.date or YYYY-MM-DD string
+        - right: 'P' or 'C'
+        - buy_target: Target strike of the long leg
+        - sell_target: Target strike of the short leg
+
+        Returns:
+        - dict: 'buy' and 'sell' (strike, OCC symbol) tuples, or None if the spread cannot be built
+        """
+        sell = self.nearest_strike(underlying, expiration, right, sell_target)
+        if sell is None:
+            return None
+
+        buy = self.nearest_strike(underlying, expiration, right, buy_target)
+        if buy is not None and buy[0] == sell[0]:
+            # Step one listed strike further out so the spread keeps a width
+            step = np.nextafter(sell[0], -np.inf if right == "P" else np.inf)
+            buy = self.nearest_strike(underlying, expiration, right, step)
+        if buy is None:
+            return None
+        return {"buy": buy, "sell": sell}
+
+
+_index = OptionChainIndex()
+
+
+def get_option_chain_index():
+    """
+    Returns the process-wide OptionChainIndex
+
+    Returns:
+    - OptionChainIndex: Shared index instance
+    """
+    return _index
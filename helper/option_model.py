@@ -0,0 +1,203 @@
+import numpy as np
+
+# Trading minutes per session and sessions per year, used to annualize time to expiry
+MINUTES_PER_SESSION = 390
+SESSIONS_PER_YEAR = 252
+
+# Floor on time to expiry so prices at the bell stay finite
+MIN_TIME_TO_EXPIRY = 1e-8
+
+
+def norm_cdf(x):
+    """
+    Vectorized standard normal CDF (Abramowitz-Stegun 7.1.26 erf approximation, |error| < 1.5e-7)
+
+    Parameters:
+    - x: Scalar or numpy array
+
+    Returns:
+    - numpy.ndarray: CDF values
+    """
+    x = np.asarray(x, dtype=float)
+    z = np.abs(x) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.3275911 * z)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1.0 - poly * np.exp(-z * z)
+    return 0.5 * (1.0 + np.sign(x) * erf)
+
+
+def norm_pdf(x):
+    """
+    Vectorized standard normal density
+    """
+    x = np.asarray(x, dtype=float)
+    return np.exp(-0.5 * x * x) / np.sqrt(2.0 * np.pi)
+
+
+def minutes_to_years(minutes):
+    """
+    Converts trading minutes left in the session to years of trading time
+
+    Parameters:
+    - minutes: Scalar or numpy array of minutes
+
+    Returns:
+    - numpy.ndarray: Time in years
+    """
+    return np.asarray(minutes, dtype=float) / (MINUTES_PER_SESSION * SESSIONS_PER_YEAR)
+
+
+def black_scholes_price(spot, strike, time_to_expiry, volatility, is_call, rate=0.0):
+    """
+    Vectorized Black-Scholes price of European options; all inputs broadcast against each other
+
+    Parameters:
+    - spot: Underlying price
+    - strike: Strike price
+    - time_to_expiry: Time to expiry in years
+    - volatility: Annualized volatility
+    - is_call: True for calls, False for puts (bool or bool array)
+    - rate: Risk-free rate
+
+    Returns:
+    - numpy.ndarray: Option prices per share
+    """
+    spot = np.asarray(spot, dtype=float)
+    strike = np.asarray(strike, dtype=float)
+    t = np.maximum(np.asarray(time_to_expiry, dtype=float), MIN_TIME_TO_EXPIRY)
+    volatility = np.asarray(volatility, dtype=float)
+
+    sqrt_t = np.sqrt(t)
+    vol_sqrt_t = np.maximum(volatility * sqrt_t, 1e-12)
+    d1 = (np.log(spot / strike) + (rate + 0.5 * volatility * volatility) * t) / vol_sqrt_t
+    d2 = d1 - vol_sqrt_t
+    discount = np.exp(-rate * t)
+
+    call = spot * norm_cdf(d1) - strike * discount * norm_cdf(d2)
+    put = strike * discount * norm_cdf(-d2) - spot * norm_cdf(-d1)
+    return np.where(is_call, call, put)
+
+
+def black_scholes_greeks(spot, strike, time_to_expiry, volatility, is_call, rate=0.0):
+    """
+    Vectorized Black-Scholes price and Greeks of European options; all inputs broadcast against each other
+
+    Parameters:
+    - spot: Underlying price
+    - strike: Strike price
+    - time_to_expiry: Time to expiry in years
+    - volatility: Annualized volatility
+    - is_call: True for calls, False for puts (bool or bool array)
+    - rate: Risk-free rate
+
+    Returns:
+    - dict: 'price', 'delta', 'gamma', 'theta' (per trading session) and 'vega' (per volatility point,
+      i.e. 0.01), all per share
+    """
+    spot = np.asarray(spot, dtype=float)
+    strike = np.asarray(strike, dtype=float)
+    t = np.maximum(np.asarray(time_to_expiry, dtype=float), MIN_TIME_TO_EXPIRY)
+    volatility = np.asarray(volatility, dtype=float)
+
+    sqrt_t = np.sqrt(t)
+    vol_sqrt_t = np.maximum(volatility * sqrt_t, 1e-12)
+    d1 = (np.log(spot / strike) + (rate + 0.5 * volatility * volatility) * t) / vol_sqrt_t
+    d2 = d1 - vol_sqrt_t
+    discount = np.exp(-rate * t)
+    nd1 = norm_cdf(d1)
+    nd2 = norm_cdf(d2)
+    pdf_d1 = norm_pdf(d1)
+
+    call = spot * nd1 - strike * discount * nd2
+    put = call - spot + strike * discount  # put-call parity
+    decay = -spot * pdf_d1 * volatility / (2 * sqrt_t)
+    return {
+        "price": np.where(is_call, call, put),
+        "delta": np.where(is_call, nd1, nd1 - 1.0),
+        "gamma": pdf_d1 / (spot * vol_sqrt_t),
+        "theta": np.where(is_call, decay - rate * strike * discount * nd2,
+                          decay + rate * strike * discount * (1.0 - nd2)) / SESSIONS_PER_YEAR,
+        "vega": spot * pdf_d1 * sqrt_t / 100
+    }
+
+
+# Implied volatility search range and Newton iterations
+IV_MIN = 0.01
+IV_MAX = 5.0
+IV_ITERATIONS = 12
+IV_PRICE_TOLERANCE = 1e-5
+
+# Solves stop once every volatility is this close, or the option's time value is below a half-cent quote tick
+IV_VOL_TOLERANCE = 1e-4
+IV_MIN_TIME_VALUE = 0.005
+
+
+def implied_volatility(price, spot, strike, time_to_expiry, is_call, rate=0.0, initial=None,
+                       iterations=IV_ITERATIONS):
+    """
+    Vectorized implied volatility from option prices: Newton steps on vega, falling back to
+    bisection whenever a step leaves the bracket, so every element converges in a fixed number
+    of array passes. Puts are solved as calls through put-call parity. Without a starting value
+    the Corrado-Miller approximation is used; seeding with the previous tick's volatilities
+    usually converges in one or two steps.
+
+    Parameters:
+    - price: Option prices per share
+    - spot: Underlying price
+    - strike: Strike price
+    - time_to_expiry: Time to expiry in years
+    - is_call: True for calls, False for puts (bool or bool array)
+    - rate: Risk-free rate
+    - initial: Optional starting volatilities (NaN elements use the approximation)
+    - iterations: Maximum number of Newton or bisection steps
+
+    Returns:
+    - numpy.ndarray: Implied volatilities, NaN where the price is outside the no-arbitrage bounds
+      or the option has expired
+    """
+    price = np.asarray(price, dtype=float)
+    spot = np.asarray(spot, dtype=float)
+    time_to_expiry = np.asarray(time_to_expiry, dtype=float)
+    t = np.maximum(time_to_expiry, MIN_TIME_TO_EXPIRY)
+    strike_pv = np.asarray(strike, dtype=float) * np.exp(-rate * t)
+    shape = np.broadcast(price, spot, strike_pv, is_call).shape
+
+    # Outside [intrinsic, upper bound] no volatility reproduces the price
+    call_price = np.where(is_call, price, price + spot - strike_pv)
+    time_value = call_price - np.maximum(spot - strike_pv, 0.0)
+    valid = (np.isfinite(call_price) & (time_value >= -IV_PRICE_TOLERANCE) & (call_price < spot)
+             & (time_to_expiry > 0))
+
+    # With almost no time value the price barely depends on volatility, such options need not converge
+    solving = valid & (time_value >= IV_MIN_TIME_VALUE)
+
+    sqrt_t = np.sqrt(t)
+    with np.errstate(invalid="ignore"):
+        # Corrado-Miller approximation as the starting point
+        half_gap = (spot - strike_pv) / 2
+        approx = (np.sqrt(2 * np.pi) / (sqrt_t * (spot + strike_pv))
+                  * (call_price - half_gap + np.sqrt(np.maximum((call_price - half_gap) ** 2
+                                                                - 4 * half_gap * half_gap / np.pi, 0.0))))
+    if initial is not None:
+        approx = np.where(np.isfinite(initial), initial, approx)
+    vol = np.clip(np.where(np.isfinite(approx), approx, 0.3), IV_MIN, IV_MAX) * np.ones(shape)
+
+    lo = np.full(shape, IV_MIN)
+    hi = np.full(shape, IV_MAX)
+    log_moneyness = np.log(spot / strike_pv)
+    for _ in range(iterations):
+        vol_sqrt_t = vol * sqrt_t
+        d1 = log_moneyness / vol_sqrt_t + 0.5 * vol_sqrt_t
+        diff = spot * norm_cdf(d1) - strike_pv * norm_cdf(d1 - vol_sqrt_t) - call_price
+        vega = spot * norm_pdf(d1) * sqrt_t
+        if not np.any(solving & (np.abs(diff) >= np.maximum(IV_PRICE_TOLERANCE, vega * IV_VOL_TOLERANCE))):
+            break
+
+        # Price rises with volatility, so the sign of the error tightens the bracket
+        hi = np.where(diff > 0, vol, hi)
+        lo = np.where(diff < 0, vol, lo)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = vol - diff / vega
+        vol = np.where((step > lo) & (step < hi), step, 0.5 * (lo + hi))
+
+    return np.where(valid, vol, np.nan)
@@ -0,0 +1,57 @@
+import sys
+import datetime
+from functools import lru_cache
+
+
+def format_option_symbol(underlying, expiration, right, strike):
+    """
+    Builds an OCC option symbol, e.g. QQQ250117P00480000
+
+    Parameters:
+    - underlying: Underlying symbol
+    - expiration: Expiration as datetime.date or YYYY-MM-DD string
+    - right: 'P' or 'C'
+    - strike: Strike price
+
+    Returns:
+    - str: OCC option symbol
+    """
+    if isinstance(expiration, str):
+        expiration = datetime.datetime.strptime(expiration, "%Y-%m-%d").date()
+
+    # Strike is multiplied by 1000 and formatted as 8 digits
+    return f"{underlying}{expiration.strftime('%y%m%d')}{right}{int(round(strike * 1000)):08d}"
+
+
+@lru_cache(maxsize=65536)
+def parse_option_symbol(symbol):
+    """
+    Splits an OCC option symbol into its fields, e.g. QQQ250117P00480000 into
+    ('QQQ', date(2025, 1, 17), 'P', 480.0). Results are cached and the underlying is interned,
+    so repeated symbols are parsed once and share one string.
+
+    Parameters:
+    - symbol: Position or order symbol
+
+    Returns:
+    - tuple: (underlying, expiration date, 'P' or 'C', strike), or None if the symbol is not an option
+    """
+    # Root of 1-6 characters, then YYMMDD, the right and an 8 digit strike
+    if len(symbol) < 16 or len(symbol) > 21:
+        return None
+    root, expiry, right, strike = symbol[:-15], symbol[-15:-9], symbol[-9], symbol[-8:]
+    if right not in ("P", "C") or not expiry.isdigit() or not strike.isdigit():
+        return None
+
+    try:
+        expiration = datetime.date(2000 + int(expiry[:2]), int(expiry[2:4]), int(expiry[4:]))
+    except ValueError:
+        return None
+    return sys.intern(root.rstrip()), expiration, right, int(strike) / 1000
+
+
+def is_option_symbol(symbol):
+    """
+    Tells whether a position or order symbol is an OCC option symbol
+    """
+    return parse_option_symbol(symbol) is not None
@@ -1,25 +1,56 @@
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import json
-from alpaca.data.historical import StockHistoricalDataClient
-from alpaca.data.requests import StockLatestBarRequest
-from alpaca.trading.client import TradingClient
-from alpaca.trading.requests import MarketOrderRequest
-from alpaca.trading.enums import OrderSide, TimeInForce
-from dir_path import base_dirname
-from log_config import configure_logging
+from helper.accounts import DEFAULT_ACCOUNT, TRADING_ACCOUNTS, client_account
+from helper.clients import get_account_clients
+from helper.option_symbol import is_option_symbol
+from helper.order_store import insert_orders, ORDER_DB_PATH
+from helper.session_journal import get_session_journal
+from helper.rate_limit import get_trading_rate_limiter
+from helper.broker_call import call_broker, submit_order_idempotent
+from helper.tracing import traced
+from bootstrap import bootstrap
 import logging
 
-from dotenv import load_dotenv
+bootstrap()
 
-load_dotenv()
+# How spread legs are sent: 'concurrent', 'mleg' or 'sequential'
+SPREAD_EXECUTION_MODE = os.getenv("SPREAD_EXECUTION_MODE", "concurrent")
 
-configure_logging()
+# How positions are flattened: 'concurrent', 'broker' or 'sequential'
+CLOSE_POSITIONS_MODE = os.getenv("CLOSE_POSITIONS_MODE", "concurrent")
 
-API_KEY = os.getenv("ALP_KEY")
-API_SECRET = os.getenv("ALP_SECRET")
+# Maximum closing orders in flight at once (the rate limiter still applies)
+CLOSE_WORKERS = 8
 
+# Threads sending spread legs in 'concurrent' mode, shared by all spreads and accounts so entry does not start new threads
+LEG_WORKERS = 32
+_leg_executor = ThreadPoolExecutor(max_workers=LEG_WORKERS, thread_name_prefix="spread-leg")
 
+# Bumped whenever this process sends an order, so cached positions know they may be stale
+_position_revision = 0
+
+
+def get_position_revision():
+    """
+    Returns a counter that changes every time this process sends an order
+
+    Returns:
+    - int: Current position revision
+    """
+    return _position_revision
+
+
+def _bump_position_revision():
+    """
+    Marks cached positions as stale after an order was sent
+    """
+    global _position_revision
+    _position_revision += 1
+
+
+@traced("order.place_order")
 def place_order(trading_client, symbol, qty, side, order_type="market", time_in_force="day", limit_price=None):
     """
     Generic function to place an order on Alpaca
@@ -36,6 +67,9 @@ def place_order(trading_client, symbol, qty, side, order_type="market", time_in_
     Returns:
     - dict: Order details including the order ID
     """
+    from alpaca.trading.requests import MarketOrderRequest
+    from alpaca.trading.enums import OrderSide, TimeInForce
+
     try:
         # Convert string parameters to enums
         order_side = OrderSide.BUY if side.lower() == 'buy' else OrderSide.SELL
@@ -57,7 +91,9 @@ def place_order(trading_client, symbol, qty, side, order_type="market", time_in_
         order_request = MarketOrderRequest(**order_data)
 
         # Submit the order
-        order_result = trading_client.submit_order(order_data=order_request)
+        get_trading_rate_limiter(client_account(trading_client)).acquire()
+        order_result = submit_order_idempotent(trading_client, order_request)
+        _bump_position_revision()
 
         # Return order details
         return {
@@ -75,81 +111,429 @@ def place_order(trading_client, symbol, qty, side, order_type="market", time_in_
         }
 
     except Exception as e:
-        logging.error(f"Error placing order for {symbol}: {str(e)}")
+        logging.error("Error placing order for %s: %s", symbol, e)
         raise
 
 
-def save_order_ids(orders, strategy_name):
+def _timed_place_order(trading_client, symbol, qty, side):
     """
-    Saves order IDs to a text file with the date as the filename
+    Places a market order and records when it was sent and acknowledged
+
+    Returns:
+    - tuple: (order details or None, exception or None, sent time, acknowledgement time)
+    """
+    sent_at = time.perf_counter()
+    try:
+        order = place_order(
+            trading_client=trading_client,
+            symbol=symbol,
+            qty=qty,
+            side=side,
+            order_type='market',
+            time_in_force='day'
+        )
+        return order, None, sent_at, time.perf_counter()
+    except Exception as e:
+        return None, e, sent_at, time.perf_counter()
+
+
+def _unwind_legs(trading_client, orders):
+    """
+    Flattens legs that were filled when another leg of the same spread failed
+
+    Parameters:
+    - trading_client: Alpaca TradingClient instance
+    - orders: List of successfully placed leg orders
+
+    Returns:
+    - list: Unwind order details (or errors) for each leg
+    """
+    unwound = []
+    for order in orders:
+        opposite_side = 'sell' if order["side"] == 'buy' else 'buy'
+        try:
+            unwind_order = place_order(
+                trading_client=trading_client,
+                symbol=order["symbol"],
+                qty=order["qty"],
+                side=opposite_side,
+                order_type='market',
+                time_in_force='day'
+            )
+            logging.warning("Unwound leg %s with %s order %s", order['symbol'], opposite_side, unwind_order['order_id'])
+            unwound.append(unwind_order)
+        except Exception as e:
+            logging.critical("Failed to unwind leg %s, position left open: %s", order['symbol'], e)
+            unwound.append({"symbol": order["symbol"], "side": opposite_side, "error": str(e)})
+    return unwound
+
+
+def _place_multi_leg_order(trading_client, legs, qty):
+    """
+    Sends all legs as a single multi-leg order so the broker fills them together
+
+    Returns:
+    - list: Order details for each leg
+
+    Raises:
+    - RuntimeError: If the broker accepted the order but returned no leg order for a leg
+    """
+    from alpaca.trading.requests import MarketOrderRequest, OptionLegRequest
+    from alpaca.trading.enums import OrderClass, OrderSide, TimeInForce
+
+    order_request = MarketOrderRequest(
+        qty=qty,
+        order_class=OrderClass.MLEG,
+        time_in_force=TimeInForce.DAY,
+        legs=[
+            OptionLegRequest(
+                symbol=leg["symbol"],
+                ratio_qty=1,
+                side=OrderSide.BUY if leg["side"] == 'buy' else OrderSide.SELL
+            )
+            for leg in legs
+        ]
+    )
+
+    get_trading_rate_limiter(client_account(trading_client)).acquire()
+    order_result = submit_order_idempotent(trading_client, order_request)
+    _bump_position_revision()
+
+    # The broker assigns an order ID to each leg, keep them in the same shape as place_order
+    leg_results = {leg_order.symbol: leg_order for leg_order in (order_result.legs or [])}
+    if any(leg["symbol"] not in leg_results for leg in legs):
+        # The legs are not always nested in the submit response, ask for them once
+        from alpaca.trading.requests import GetOrderByIdRequest
+        nested = call_broker("get_order_by_id", trading_client.get_order_by_id, order_result.id,
+                             filter=GetOrderByIdRequest(nested=True))
+        leg_results = {leg_order.symbol: leg_order for leg_order in (nested.legs or [])}
+
+    missing = [leg["symbol"] for leg in legs if leg["symbol"] not in leg_results]
+    if missing:
+        # Recording the parent order for a leg would give both legs its ID and collapse them into one row
+        logging.critical("Multi-leg order %s was accepted but the broker returned no leg order for %s",
+                         order_result.id, missing)
+        raise RuntimeError(f"Multi-leg order {order_result.id} has no leg order for {missing}")
+
+    orders = []
+    for leg in legs:
+        leg_order = leg_results[leg["symbol"]]
+        orders.append({
+            "order_id": leg_order.id,
+            "client_order_id": leg_order.client_order_id,
+            "parent_order_id": order_result.id,
+            "symbol": leg["symbol"],
+            "qty": qty,
+            "side": leg["side"],
+            "type": 'market',
+            "time_in_force": 'day',
+            "limit_price": None,
+            "status": leg_order.status,
+            "created_at": leg_order.created_at.isoformat() if getattr(leg_order, 'created_at', None) else None,
+            "updated_at": leg_order.updated_at.isoformat() if getattr(leg_order, 'updated_at', None) else None
+        })
+    return orders
+
+
+@traced("order.place_spread_order")
+def place_spread_order(trading_client, legs, qty, mode=None):
+    """
+    Places every leg of a spread without waiting for one leg before sending the next
+
+    Modes:
+    - 'concurrent': each leg is sent as its own market order at the same time
+    - 'mleg': all legs are sent as one multi-leg order
+    - 'sequential': legacy behaviour, one leg after the other
+
+    If any leg fails, the legs that were placed are unwound with opposite market orders
+    and the error is raised.
+
+    Parameters:
+    - trading_client: Alpaca TradingClient instance
+    - legs: List of dicts with 'symbol' and 'side' ('buy' or 'sell')
+    - qty: Number of contracts per leg
+    - mode: Execution mode, defaults to SPREAD_EXECUTION_MODE
+
+    Returns:
+    - dict: Leg orders plus per-leg latency and acknowledgement skew in milliseconds
+    """
+    mode = (mode or SPREAD_EXECUTION_MODE).lower()
+    started_at = time.perf_counter()
+
+    if mode == 'mleg':
+        orders = _place_multi_leg_order(trading_client, legs, qty)
+        elapsed_ms = (time.perf_counter() - started_at) * 1000
+        execution = {
+            "mode": mode,
+            "leg_latency_ms": {leg["symbol"]: elapsed_ms for leg in legs},
+            "ack_skew_ms": 0.0,
+            "total_ms": elapsed_ms
+        }
+        logging.info("Multi-leg spread order acknowledged in %.1f ms", elapsed_ms)
+        return {"orders": orders, "execution": execution}
+
+    if mode == 'concurrent':
+        futures = [
+            _leg_executor.submit(_timed_place_order, trading_client, leg["symbol"], qty, leg["side"])
+            for leg in legs
+        ]
+        outcomes = [future.result() for future in futures]
+    elif mode == 'sequential':
+        outcomes = []
+        for leg in legs:
+            outcomes.append(_timed_place_order(trading_client, leg["symbol"], qty, leg["side"]))
+            if outcomes[-1][1] is not None:
+                break
+    else:
+        raise ValueError(f"Unknown spread execution mode: {mode}")
+
+    placed = [outcome[0] for outcome in outcomes if outcome[0] is not None]
+    errors = [outcome[1] for outcome in outcomes if outcome[1] is not None]
+
+    if errors or len(placed) != len(legs):
+        logging.error("Spread leg failed (%s), unwinding %d placed legs", errors[0] if errors else 'leg not sent',
+                      len(placed))
+        _unwind_legs(trading_client, placed)
+        raise errors[0] if errors else RuntimeError("Spread leg was not sent")
+
+    ack_times = [outcome[3] for outcome in outcomes]
+    execution = {
+        "mode": mode,
+        "leg_latency_ms": {
+            leg["symbol"]: (outcome[3] - outcome[2]) * 1000 for leg, outcome in zip(legs, outcomes)
+        },
+        "ack_skew_ms": (max(ack_times) - min(ack_times)) * 1000,
+        "total_ms": (time.perf_counter() - started_at) * 1000
+    }
+    logging.info("Spread legs acknowledged in %.1f ms (skew between legs %.1f ms)", execution['total_ms'],
+                 execution['ack_skew_ms'])
+
+    return {"orders": placed, "execution": execution}
+
+
+def save_order_ids(orders, strategy_name, account=DEFAULT_ACCOUNT, spread_id=None):
+    """
+    Saves order IDs to the session journal and the indexed order store under today's date
+
+    The orders are journaled first and only then written to the order store. If the store write
+    fails the orders are restored from the journal when the session resumes (see
+    restore_journaled_orders), so a failure to journal them is the only error raised.
 
     Parameters:
     - orders: List of order details
-    - strategy_name: Name of the strategy (for file naming)
+    - strategy_name: Name of the strategy the orders belong to
+    - account: Name of the account the orders were placed in
+    - spread_id: Optional ID of the spread the orders are the legs of, used to group positions by spread
 
     Returns:
-    - str: Path to the saved file
+    - str: Path to the order store
+
+    Raises:
+    - OSError: If the session journal cannot be written
     """
+    # Extract order IDs and details
+    order_details = []
+    for order in orders:
+        order_details.append({
+            "order_id": str(order["order_id"]),
+            "symbol": order["symbol"],
+            "side": order["side"],
+            "qty": order["qty"],
+            "account": account,
+            "spread_id": spread_id,
+            "timestamp": datetime.now().isoformat()
+        })
+
+    # Durable before the store write, concurrent spreads share one fsync
+    get_session_journal().append("orders", strategy=strategy_name, orders=order_details)
+
     try:
-        # Create directory if it doesn't exist
-        order_dir = os.path.join(base_dirname, "data", "orders")
-        os.makedirs(order_dir, exist_ok=True)
-
-        # Create filename with current date
-        today = datetime.now().strftime("%d%m%Y")
-        filename = os.path.join(order_dir, f"{strategy_name}_{today}.txt")
-
-        # Extract order IDs and details
-        order_details = []
-        for order in orders:
-            order_details.append({
-                "order_id": order["order_id"],
-                "symbol": order["symbol"],
-                "side": order["side"],
-                "qty": order["qty"],
-                "timestamp": datetime.now().isoformat()
-            })
+        insert_orders(order_details, strategy_name)
+    except Exception as e:
+        logging.error("Error saving order IDs to %s, they are kept in the session journal: %s", ORDER_DB_PATH, e)
+        return ORDER_DB_PATH
 
-        # Save to file
-        with open(filename, 'a') as file:  # Append mode in case we have multiple orders on the same day
-            for order in order_details:
-                file.write(json.dumps(order) + "\n")
+    logging.info("Saved %d order IDs to %s", len(orders), ORDER_DB_PATH)
+    return ORDER_DB_PATH
 
-        logging.info(f"Saved {len(orders)} order IDs to {filename}")
-        return filename
 
-    except Exception as e:
-        logging.error(f"Error saving order IDs: {str(e)}")
-        return None
+def restore_journaled_orders(state, trade_date=None):
+    """
+    Writes orders of the session journal that are missing from the order store, e.g. after a
+    crash between journaling and storing them. Orders already in the store are skipped.
+
+    Parameters:
+    - state: Session state from the journal
+    - trade_date: Trade date of the session (default today)
+
+    Returns:
+    - int: Number of orders written
+    """
+    by_strategy = {}
+    for order in state["orders"].values():
+        details = dict(order)
+        by_strategy.setdefault(details.pop("strategy"), []).append(details)
+
+    restored = sum(insert_orders(orders, strategy_name, trade_date) for strategy_name, orders in by_strategy.items())
+    if restored:
+        logging.warning("Restored %s journaled orders missing from %s", restored, ORDER_DB_PATH)
+    return restored
 
 
-def close_all_option_positions():
+def get_pending_order_symbols(symbols, accounts=None):
     """
-    Closes only option positions in the Alpaca account.
+    Finds which of the given symbols have an open order in any account, e.g. closing orders sent
+    before a restart that have not filled yet
+
+    Parameters:
+    - symbols: Option symbols
+    - accounts: List of account dicts (default TRADING_ACCOUNTS)
+
+    Returns:
+    - set: Symbols with an open order
+    """
+    from alpaca.trading.requests import GetOrdersRequest
+    from alpaca.trading.enums import QueryOrderStatus
+
+    symbols = set(symbols)
+    pending = set()
+    for account, trading_client in get_account_clients(accounts or TRADING_ACCOUNTS):
+        orders = call_broker("get_orders", trading_client.get_orders,
+                             GetOrdersRequest(status=QueryOrderStatus.OPEN, symbols=sorted(symbols), limit=500))
+        pending.update(order.symbol for order in orders if order.symbol in symbols)
+    return pending
+
+
+def _close_option_position(trading_client, position):
+    """
+    Submits the market order that closes one option position, respecting the trading rate limit
+
+    Parameters:
+    - trading_client: Alpaca TradingClient instance
+    - position: Open option position
 
     Returns:
-    - dict: Information about closed option positions
+    - tuple: (True, closed position details) or (False, failed position details)
     """
+    from alpaca.trading.requests import MarketOrderRequest
+    from alpaca.trading.enums import OrderSide, TimeInForce
+
+    symbol = position.symbol
+    qty = None
     try:
-        # Initialize trading client
-        trading_client = TradingClient(API_KEY, API_SECRET, paper=True)
+        qty = abs(float(position.qty))
+
+        # Determine the side for closing order (opposite of current position)
+        side = OrderSide.SELL if float(position.qty) > 0 else OrderSide.BUY
+
+        logging.info("Closing option position: %s units of %s with %s order", qty, symbol, side.name)
+
+        # Create order request
+        order_request = MarketOrderRequest(
+            symbol=symbol,
+            qty=qty,
+            side=side,
+            time_in_force=TimeInForce.DAY
+        )
+
+        # Submit the order
+        get_trading_rate_limiter(client_account(trading_client)).acquire()
+        order_result = submit_order_idempotent(trading_client, order_request)
+        _bump_position_revision()
+
+        logging.info("Successfully placed order to close %s option position. Order ID: %s", symbol, order_result.id)
+
+        return True, {
+            "symbol": symbol,
+            "qty": qty,
+            "side": side.name,
+            "order_id": order_result.id,
+            "order_status": order_result.status
+        }
+
+    except Exception as e:
+        logging.error("Failed to close option position for %s: %s", symbol, e)
+        return False, {
+            "symbol": symbol,
+            "qty": qty,
+            "error": str(e)
+        }
 
+
+def _close_with_broker_call(trading_client, option_positions, results):
+    """
+    Flattens the account with the broker's single close-all call
+
+    Parameters:
+    - trading_client: Alpaca TradingClient instance
+    - option_positions: Open option positions, used to report quantities
+    - results: Results dict to fill with closed and failed positions
+    """
+    quantities = {p.symbol: abs(float(p.qty)) for p in option_positions}
+
+    get_trading_rate_limiter(client_account(trading_client)).acquire()
+    responses = call_broker("close_all_positions", trading_client.close_all_positions, idempotent=False,
+                            cancel_orders=True)
+    _bump_position_revision()
+
+    for response in responses:
+        order = response.body if response.status == 200 else None
+        if order is not None and hasattr(order, "id"):
+            results["closed_positions"].append({
+                "symbol": response.symbol,
+                "qty": quantities.get(response.symbol),
+                "side": order.side.name if order.side else None,
+                "order_id": order.id,
+                "order_status": order.status
+            })
+        else:
+            results["failed_positions"].append({
+                "symbol": response.symbol,
+                "qty": quantities.get(response.symbol),
+                "error": str(response.body)
+            })
+
+
+def _close_account_option_positions(trading_client, mode, symbols=None):
+    """
+    Closes only option positions in one Alpaca account.
+
+    Modes:
+    - 'concurrent': closing orders are sent in parallel through the trading rate limiter,
+      short legs first so no spread is left with a naked short
+    - 'broker': one close-all call to the broker, used only when every open position is an option
+      and the whole account is closed
+    - 'sequential': legacy behaviour, one position after the other
+
+    Parameters:
+    - trading_client: Alpaca TradingClient instance of the account
+    - mode: Close mode
+    - symbols: Optional set of option symbols to close; other positions are left open
+
+    Returns:
+    - dict: Information about closed option positions and the wall-clock time to flatten
+    """
+    started_at = time.perf_counter()
+
+    try:
         # Get all open positions
-        positions = trading_client.get_all_positions()
+        positions = call_broker("get_all_positions", trading_client.get_all_positions)
 
         if not positions:
             logging.info("No open positions to close.")
             return {"status": "success", "message": "No open positions found"}
 
-        # Filter for option positions only (based on symbol format)
-        option_positions = [p for p in positions if len(p.symbol) > 6]  # Simple check for options
+        # Filter for option positions only (OCC symbol format)
+        option_positions = [p for p in positions if is_option_symbol(p.symbol)
+                            and (symbols is None or p.symbol in symbols)]
 
         if not option_positions:
             logging.info("No open option positions to close.")
             return {"status": "success", "message": "No open option positions found"}
 
         # Log the number of option positions to close
-        logging.info(f"Closing {len(option_positions)} open option positions...")
+        logging.info("Closing %d open option positions in account %s (%s)...", len(option_positions),
+                     client_account(trading_client), mode)
 
         results = {
             "status": "success",
@@ -157,62 +541,115 @@ def close_all_option_positions():
             "failed_positions": []
         }
 
-        # Close each option position one by one
-        for position in option_positions:
-            try:
-                symbol = position.symbol
-                qty = abs(float(position.qty))
-
-                # Determine the side for closing order (opposite of current position)
-                side = OrderSide.SELL if float(position.qty) > 0 else OrderSide.BUY
-
-                logging.info(f"Closing option position: {qty} units of {symbol} with {side.name} order")
-
-                # Create order request
-                order_request = MarketOrderRequest(
-                    symbol=symbol,
-                    qty=qty,
-                    side=side,
-                    time_in_force=TimeInForce.DAY
-                )
-
-                # Submit the order
-                order_result = trading_client.submit_order(order_data=order_request)
-
-                # Add to successful results
-                results["closed_positions"].append({
-                    "symbol": symbol,
-                    "qty": qty,
-                    "side": side.name,
-                    "order_id": order_result.id,
-                    "order_status": order_result.status
-                })
-
-                logging.info(
-                    f"Successfully placed order to close {symbol} option position. Order ID: {order_result.id}")
-
-            except Exception as e:
-                error_message = f"Failed to close option position for {symbol}: {str(e)}"
-                logging.error(error_message)
-
-                # Add to failed results
-                results["failed_positions"].append({
-                    "symbol": symbol,
-                    "qty": qty if 'qty' in locals() else None,
-                    "error": str(e)
-                })
+        if mode == 'broker' and len(option_positions) != len(positions):
+            logging.info("Not closing every position of the account, not using the broker close-all call")
+            mode = 'concurrent'
+
+        if mode == 'broker':
+            _close_with_broker_call(trading_client, option_positions, results)
+        elif mode == 'sequential':
+            for position in option_positions:
+                closed, details = _close_option_position(trading_client, position)
+                results["closed_positions" if closed else "failed_positions"].append(details)
+        else:
+            # Buy back short legs first, then sell the long legs
+            short_legs = [p for p in option_positions if float(p.qty) < 0]
+            long_legs = [p for p in option_positions if float(p.qty) > 0]
+
+            with ThreadPoolExecutor(max_workers=CLOSE_WORKERS) as executor:
+                for wave in (short_legs, long_legs):
+                    for closed, details in executor.map(lambda p: _close_option_position(trading_client, p), wave):
+                        results["closed_positions" if closed else "failed_positions"].append(details)
+
+        results["elapsed_seconds"] = time.perf_counter() - started_at
 
         # Check if all option positions were successfully closed
         if results["failed_positions"]:
             results["status"] = "partial_success"
-            logging.warning(
-                f"Closed {len(results['closed_positions'])} option positions, but failed to close {len(results['failed_positions'])} option positions.")
+            logging.warning("Closed %d option positions, but failed to close %d option positions.",
+                            len(results['closed_positions']), len(results['failed_positions']))
         else:
-            logging.info(f"Successfully closed all {len(results['closed_positions'])} option positions.")
+            logging.info("Successfully closed all %d option positions in %.3fs.", len(results['closed_positions']),
+                         results['elapsed_seconds'])
 
         return results
 
     except Exception as e:
         error_message = f"Error closing option positions: {str(e)}"
         logging.error(error_message)
-        return {"status": "error", "message": error_message}
\ No newline at end of file
+        return {"status": "error", "message": error_message}
+
+
+def _close_in_accounts(mode, accounts, symbols=None):
+    """
+    Runs _close_account_option_positions in every account at once and merges the results
+    """
+    started_at = time.perf_counter()
+    mode = (mode or CLOSE_POSITIONS_MODE).lower()
+
+    try:
+        account_clients = get_account_clients(accounts or TRADING_ACCOUNTS)
+    except Exception as e:
+        error_message = f"Error creating trading clients: {str(e)}"
+        logging.error(error_message)
+        return {"status": "error", "message": error_message}
+
+    with ThreadPoolExecutor(max_workers=len(account_clients)) as executor:
+        futures = {account["name"]: executor.submit(_close_account_option_positions, client, mode, symbols)
+                   for account, client in account_clients}
+        account_results = {name: future.result() for name, future in futures.items()}
+
+    results = {
+        "status": "success",
+        "closed_positions": [],
+        "failed_positions": [],
+        "accounts": account_results
+    }
+    for name, account_result in account_results.items():
+        for key in ("closed_positions", "failed_positions"):
+            results[key].extend({**details, "account": name} for details in account_result.get(key, []))
+        if account_result["status"] != "success":
+            results["status"] = "partial_success"
+
+    if all(account_result["status"] == "error" for account_result in account_results.values()):
+        results["status"] = "error"
+    results["elapsed_seconds"] = time.perf_counter() - started_at
+
+    if len(account_results) > 1:
+        logging.info("Closed option positions in %d accounts in %.3fs (%s)", len(account_results),
+                     results["elapsed_seconds"], results["status"])
+    return results
+
+
+@traced("order.close_all_option_positions")
+def close_all_option_positions(mode=None, accounts=None):
+    """
+    Closes only option positions, in every account the strategy trades at once.
+    Each account is flattened independently, so a failing account does not hold up the others.
+
+    Parameters:
+    - mode: Close mode, defaults to CLOSE_POSITIONS_MODE (see _close_account_option_positions)
+    - accounts: List of account dicts (default TRADING_ACCOUNTS)
+
+    Returns:
+    - dict: Closed and failed positions of all accounts (each tagged with its 'account'),
+      the per-account results under 'accounts' and the wall-clock time to flatten
+    """
+    return _close_in_accounts(mode, accounts)
+
+
+@traced("order.close_option_legs")
+def close_option_legs(symbols, mode=None, accounts=None):
+    """
+    Closes the given option legs, e.g. the legs of one spread, in every account that holds them.
+    Other positions stay open.
+
+    Parameters:
+    - symbols: Option symbols to close
+    - mode: 'concurrent' or 'sequential', defaults to CLOSE_POSITIONS_MODE ('broker' falls back to 'concurrent')
+    - accounts: List of account dicts (default TRADING_ACCOUNTS)
+
+    Returns:
+    - dict: Same shape as close_all_option_positions
+    """
+    return _close_in_accounts(mode, accounts, set(symbols))
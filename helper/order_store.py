@@ -0,0 +1,217 @@
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from dir_path import base_dirname
+from helper.market_clock import market_today
+from bootstrap import bootstrap
+import logging
+
+bootstrap()
+
+ORDER_DB_PATH = os.path.join(base_dirname, "data", "orders.db")
+LEGACY_ORDER_DIR = os.path.join(base_dirname, "data", "orders")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id TEXT NOT NULL UNIQUE,
+    strategy TEXT NOT NULL,
+    trade_date TEXT NOT NULL,
+    symbol TEXT,
+    side TEXT,
+    qty REAL,
+    timestamp TEXT,
+    details TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_orders_date_strategy ON orders (trade_date, strategy);
+CREATE INDEX IF NOT EXISTS idx_orders_strategy_date ON orders (strategy, trade_date);
+CREATE INDEX IF NOT EXISTS idx_orders_symbol_date ON orders (symbol, trade_date);
+"""
+
+_local = threading.local()
+
+# Bumped on every write so in-process caches can tell when orders changed without querying
+_revision = 0
+
+
+def get_store_revision():
+    """
+    Returns a counter that changes every time this process writes orders to the store
+
+    Returns:
+    - int: Current store revision
+    """
+    return _revision
+
+
+def get_connection(db_path=None):
+    """
+    Returns this thread's connection to the order store, creating the schema on first use
+
+    Parameters:
+    - db_path: Optional path of the SQLite database (default ORDER_DB_PATH)
+
+    Returns:
+    - sqlite3.Connection: Open connection
+    """
+    db_path = db_path or ORDER_DB_PATH
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    connection = connections.get(db_path)
+    if connection is None:
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        connection = sqlite3.connect(db_path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(_SCHEMA)
+        connections[db_path] = connection
+
+    return connection
+
+
+def to_trade_date(date):
+    """
+    Normalizes a date to the store's sortable YYYYMMDD key
+
+    Parameters:
+    - date: datetime/date object or DDMMYYYY string
+
+    Returns:
+    - str: Date in YYYYMMDD format
+    """
+    if hasattr(date, "strftime"):
+        return date.strftime("%Y%m%d")
+    return datetime.strptime(date, "%d%m%Y").strftime("%Y%m%d")
+
+
+def insert_orders(order_details, strategy_name, trade_date=None, db_path=None):
+    """
+    Appends order records to the store, ignoring order IDs that are already present
+
+    Parameters:
+    - order_details: List of order dicts, each with at least 'order_id'
+    - strategy_name: Name of the strategy that placed the orders
+    - trade_date: Optional trade date (default today in America/New_York, see market_today)
+    - db_path: Optional path of the SQLite database
+
+    Returns:
+    - int: Number of new records written
+    """
+    trade_date = to_trade_date(trade_date or market_today())
+    rows = [
+        (
+            str(order["order_id"]),
+            strategy_name,
+            trade_date,
+            order.get("symbol"),
+            order.get("side"),
+            order.get("qty"),
+            order.get("timestamp"),
+            json.dumps(order, default=str)
+        )
+        for order in order_details
+    ]
+
+    connection = get_connection(db_path)
+    with connection:
+        cursor = connection.executemany(
+            "INSERT OR IGNORE INTO orders "
+            "(order_id, strategy, trade_date, symbol, side, qty, timestamp, details) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+
+    global _revision
+    _revision += 1
+    return cursor.rowcount
+
+
+def query_orders(strategy_name=None, date=None, symbol=None, db_path=None):
+    """
+    Looks up orders through the store's indexes
+
+    Parameters:
+    - strategy_name: Optional filter by strategy name
+    - date: Optional filter by trade date (datetime/date object or DDMMYYYY string)
+    - symbol: Optional filter by symbol
+
+    Returns:
+    - list: Order details in insertion order
+    """
+    clauses = []
+    params = []
+
+    if date:
+        clauses.append("trade_date = ?")
+        params.append(to_trade_date(date))
+    if strategy_name:
+        clauses.append("strategy = ?")
+        params.append(strategy_name)
+    if symbol:
+        clauses.append("symbol = ?")
+        params.append(symbol)
+
+    sql = "SELECT details FROM orders"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY id"
+
+    cursor = get_connection(db_path).execute(sql, params)
+    return [json.loads(row[0]) for row in cursor]
+
+
+def import_text_order_files(order_dir=None, db_path=None):
+    """
+    One-shot import of the legacy {strategy}_{DDMMYYYY}.txt order files into the store.
+    Safe to re-run, orders that were already imported are skipped.
+
+    Parameters:
+    - order_dir: Directory with the legacy files (default data/orders)
+    - db_path: Optional path of the SQLite database
+
+    Returns:
+    - dict: Number of files read and orders imported
+    """
+    order_dir = order_dir or LEGACY_ORDER_DIR
+    summary = {"files": 0, "imported": 0, "skipped_lines": 0}
+
+    if not os.path.isdir(order_dir):
+        logging.info("No legacy order directory found at %s", order_dir)
+        return summary
+
+    for file_name in sorted(os.listdir(order_dir)):
+        if not file_name.endswith(".txt"):
+            continue
+
+        strategy_name, _, date_part = file_name[:-4].rpartition("_")
+        try:
+            trade_date = datetime.strptime(date_part, "%d%m%Y")
+        except ValueError:
+            logging.warning("Skipping order file with unexpected name: %s", file_name)
+            continue
+
+        orders = []
+        with open(os.path.join(order_dir, file_name), 'r') as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    orders.append(json.loads(line))
+                except json.JSONDecodeError:
+                    summary["skipped_lines"] += 1
+                    logging.warning("Could not parse line in %s: %s", file_name, line)
+
+        summary["files"] += 1
+        summary["imported"] += insert_orders(orders, strategy_name, trade_date, db_path)
+
+    logging.info("Imported %s orders from %s legacy order files", summary['imported'], summary['files'])
+    return summary
+
+
+if __name__ == "__main__":
+    print(import_text_order_files())
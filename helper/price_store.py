@@ -0,0 +1,363 @@
+import os
+import shutil
+import threading
+import datetime
+import numpy as np
+from dir_path import base_dirname
+from bootstrap import bootstrap
+import logging
+
+bootstrap()
+
+PRICE_STORE_DIR = os.path.join(base_dirname, "data", "prices")
+LEGACY_PRICE_DIR = os.path.join(base_dirname, "data", "qqq_price")
+
+# One append-only little-endian file per column; 'date' holds days since the epoch
+PRICE_COLUMNS = {
+    "date": np.dtype("<i8"),
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<f8")
+}
+
+_NO_ROW = -1
+
+
+def _to_day(date_):
+    """
+    Converts a date (datetime.date, datetime64 or ISO string) to days since the epoch
+    """
+    return int(np.datetime64(date_, "D").astype(np.int64))
+
+
+class PriceStore:
+    """
+    Columnar daily price history, one directory per symbol with one flat file per column.
+
+    Rows are appended in date order and the 'date' column is written last, so its length is the
+    committed row count and a torn append is ignored on the next open. Rows for earlier dates are
+    merged in by writing the symbol's columns to a staging directory and swapping it in. Columns are read through
+    read-only memory maps; range reads are slices of those maps and copy nothing. A dense array
+    from day offset to row index makes close and previous-close lookups O(1).
+    """
+
+    def __init__(self, root=None):
+        self.root = root or PRICE_STORE_DIR
+        self._symbols = {}
+        self._lock = threading.Lock()
+
+    def _column_path(self, symbol, column):
+        return os.path.join(self.root, symbol, f"{column}.bin")
+
+    def _swap_paths(self, symbol):
+        """
+        Returns the staging and previous directories of a merge; symbols never start with a dot
+        """
+        return os.path.join(self.root, f".{symbol}.merge"), os.path.join(self.root, f".{symbol}.old")
+
+    def _open(self, symbol):
+        """
+        Maps a symbol's columns and builds its day index; cached until the next append
+        """
+        cached = self._symbols.get(symbol)
+        if cached is not None:
+            return cached
+
+        # A merge interrupted between moving the old columns aside and moving the new ones in
+        staging_dir, old_dir = self._swap_paths(symbol)
+        if not os.path.isdir(os.path.join(self.root, symbol)) and os.path.isdir(old_dir):
+            os.rename(old_dir, os.path.join(self.root, symbol))
+
+        date_path = self._column_path(symbol, "date")
+        rows = os.path.getsize(date_path) // PRICE_COLUMNS["date"].itemsize if os.path.exists(date_path) else 0
+
+        columns = {}
+        for column, dtype in PRICE_COLUMNS.items():
+            if rows == 0:
+                columns[column] = np.empty(0, dtype=dtype)
+            else:
+                columns[column] = np.memmap(self._column_path(symbol, column), dtype=dtype, mode="r", shape=(rows,))
+
+        days = columns["date"]
+        first_day = int(days[0]) if rows else 0
+        row_at = np.full(int(days[-1]) - first_day + 1 if rows else 0, _NO_ROW, dtype=np.int64)
+        row_at[days - first_day] = np.arange(rows)
+
+        cached = {
+            "rows": rows,
+            "columns": columns,
+            "first_day": first_day,
+            "row_at": row_at,
+            # Last row on or before each day, for previous-close lookups on non-trading days
+            "last_row_at": np.maximum.accumulate(row_at) if rows else row_at
+        }
+        self._symbols[symbol] = cached
+        return cached
+
+    def symbols(self):
+        """
+        Returns the symbols that have price history in the store
+        """
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if not name.startswith(".") and os.path.isdir(os.path.join(self.root, name)))
+
+    def append(self, symbol, dates, close, open_=None, high=None, low=None, volume=None):
+        """
+        Appends daily rows for a symbol. Dates must be strictly increasing and after the last stored
+        date, except that a row for the last stored date replaces it (re-running the post-market job).
+
+        Parameters:
+        - symbol: Ticker symbol
+        - dates: Sequence of dates
+        - close: Sequence of closing prices
+        - open_, high, low, volume: Optional sequences (NaN when missing)
+
+        Returns:
+        - int: Number of rows stored for the symbol afterwards
+        """
+        days = np.array([_to_day(d) for d in dates], dtype=PRICE_COLUMNS["date"])
+        count = len(days)
+        if count == 0:
+            return self._open(symbol)["rows"]
+        if np.any(np.diff(days) <= 0):
+            raise ValueError(f"Dates for {symbol} must be strictly increasing")
+
+        values = {"open": open_, "high": high, "low": low, "close": close, "volume": volume}
+
+        with self._lock:
+            existing = self._open(symbol)
+            rows = existing["rows"]
+            if rows and days[0] < existing["columns"]["date"][-1]:
+                raise ValueError(f"{symbol} already has prices up to "
+                                 f"{np.datetime64(int(existing['columns']['date'][-1]), 'D')}")
+
+            # Overwrite the last row when the first new date repeats it
+            start_row = rows - 1 if rows and days[0] == existing["columns"]["date"][-1] else rows
+            return self._write_rows(symbol, start_row, days, values)
+
+    def merge(self, symbol, dates, close, open_=None, high=None, low=None, volume=None):
+        """
+        Adds daily rows for the dates a symbol has no row for yet, wherever they fall; rows already
+        stored are kept. Rows after the last stored date are appended, earlier ones rewrite the symbol.
+
+        Parameters:
+        - symbol: Ticker symbol
+        - dates: Sequence of distinct dates, in any order
+        - close: Sequence of closing prices
+        - open_, high, low, volume: Optional sequences (NaN when missing)
+
+        Returns:
+        - int: Number of rows added
+        """
+        days = np.array([_to_day(d) for d in dates], dtype=PRICE_COLUMNS["date"])
+        if len(np.unique(days)) != len(days):
+            raise ValueError(f"Dates for {symbol} must be distinct")
+
+        values = {}
+        for column, data in {"open": open_, "high": high, "low": low, "close": close, "volume": volume}.items():
+            dtype = PRICE_COLUMNS[column]
+            values[column] = np.full(len(days), np.nan, dtype=dtype) if data is None else np.asarray(data, dtype=dtype)
+
+        with self._lock:
+            existing = self._open(symbol)
+            stored_days = existing["columns"]["date"]
+            order = np.argsort(days)
+            new = order[~np.isin(days[order], stored_days)]
+            if len(new) == 0:
+                return 0
+
+            days = days[new]
+            values = {column: data[new] for column, data in values.items()}
+            if existing["rows"] == 0 or days[0] > stored_days[-1]:
+                self._write_rows(symbol, existing["rows"], days, values)
+                return len(days)
+
+            # Earlier dates: write the merged columns aside and swap them in, so readers and a crash
+            # see either the old rows or the new ones
+            merged_days = np.concatenate([stored_days, days])
+            order = np.argsort(merged_days, kind="stable")
+            merged = {column: np.concatenate([existing["columns"][column], values[column]])[order]
+                      for column in values}
+
+            staging_dir, old_dir = self._swap_paths(symbol)
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            shutil.rmtree(old_dir, ignore_errors=True)
+            self._write_rows(os.path.basename(staging_dir), 0, merged_days[order], merged)
+
+            self._symbols.pop(symbol, None)
+            os.rename(os.path.join(self.root, symbol), old_dir)
+            os.rename(staging_dir, os.path.join(self.root, symbol))
+            shutil.rmtree(old_dir)
+            return len(days)
+
+    def _write_rows(self, symbol, start_row, days, values):
+        """
+        Writes rows from start_row of a symbol's columns, the date column last; the caller holds the lock
+
+        Returns:
+        - int: Number of rows stored for the symbol afterwards
+        """
+        count = len(days)
+
+        # Drop the maps before writing so the files can grow
+        self._symbols.pop(symbol, None)
+        os.makedirs(os.path.join(self.root, symbol), exist_ok=True)
+
+        for column, dtype in PRICE_COLUMNS.items():
+            if column == "date":
+                continue
+            data = values[column]
+            data = np.full(count, np.nan) if data is None else np.asarray(data, dtype=dtype)
+            self._write_column(symbol, column, start_row, data.astype(dtype))
+
+        # The date column commits the rows
+        self._write_column(symbol, "date", start_row, days)
+
+        return start_row + count
+
+    def _write_column(self, symbol, column, start_row, data):
+        """
+        Writes data at start_row of a column file, truncating anything past it from a torn append
+        """
+        path = self._column_path(symbol, column)
+        mode = "r+b" if os.path.exists(path) else "wb"
+        with open(path, mode) as file:
+            file.truncate(start_row * data.itemsize)
+            file.seek(start_row * data.itemsize)
+            file.write(data.tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+
+    def get_range(self, symbol, start=None, end=None, columns=None):
+        """
+        Returns the rows of a symbol with start <= date <= end as zero-copy views of the memory maps
+
+        Parameters:
+        - symbol: Ticker symbol
+        - start, end: Optional date bounds (inclusive)
+        - columns: Optional list of column names (default all)
+
+        Returns:
+        - dict: Column name to read-only array; 'date' is datetime64[D]
+        """
+        data = self._open(symbol)
+        days = data["columns"]["date"]
+        lo = int(np.searchsorted(days, _to_day(start))) if start is not None else 0
+        hi = int(np.searchsorted(days, _to_day(end), side="right")) if end is not None else data["rows"]
+
+        result = {}
+        for column in columns or PRICE_COLUMNS:
+            view = data["columns"][column][lo:hi]
+            result[column] = view.view("datetime64[D]") if column == "date" else view
+        return result
+
+    def _row_on_or_before(self, data, day, exact):
+        """
+        Returns the row index for a day offset (exactly that day, or the last one on or before it)
+        """
+        offset = day - data["first_day"]
+        if data["rows"] == 0 or offset < 0:
+            return None
+        index = data["row_at"] if exact else data["last_row_at"]
+        if offset >= len(index):
+            return None if exact else data["rows"] - 1
+        row = int(index[offset])
+        return None if row == _NO_ROW else row
+
+    def get_close(self, symbol, date_):
+        """
+        Returns a symbol's close on a date
+
+        Parameters:
+        - symbol: Ticker symbol
+        - date_: Date
+
+        Returns:
+        - float: Close, or None if the store has no row for that date
+        """
+        data = self._open(symbol)
+        row = self._row_on_or_before(data, _to_day(date_), exact=True)
+        return None if row is None else float(data["columns"]["close"][row])
+
+    def previous_close(self, symbol, date_):
+        """
+        Returns the last close strictly before a date, whatever weekends or holidays lie between
+
+        Parameters:
+        - symbol: Ticker symbol
+        - date_: Date
+
+        Returns:
+        - tuple: (datetime.date, close) or None if the store has no earlier row
+        """
+        data = self._open(symbol)
+        row = self._row_on_or_before(data, _to_day(date_) - 1, exact=False)
+        if row is None:
+            return None
+        day = np.datetime64(int(data["columns"]["date"][row]), "D").astype(datetime.date)
+        return day, float(data["columns"]["close"][row])
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_price_store():
+    """
+    Returns the process-wide PriceStore under data/prices
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PriceStore()
+        return _store
+
+
+def import_text_price_files(symbol="QQQ", price_dir=None, store=None):
+    """
+    One-shot import of the legacy DDMMYYYY.txt close files into the store.
+    Safe to re-run and to run after the post-market job has stored newer closes: files are merged in
+    by date and dates the store already has are skipped.
+
+    Parameters:
+    - symbol: Symbol the files belong to
+    - price_dir: Directory with the legacy files (default data/qqq_price)
+    - store: Optional PriceStore (default the shared store)
+
+    Returns:
+    - dict: Number of files read and rows imported
+    """
+    price_dir = price_dir or LEGACY_PRICE_DIR
+    store = store or get_price_store()
+    summary = {"files": 0, "imported": 0}
+
+    if not os.path.isdir(price_dir):
+        logging.info("No legacy price directory found at %s", price_dir)
+        return summary
+
+    prices = {}
+    for file_name in os.listdir(price_dir):
+        if not file_name.endswith(".txt"):
+            continue
+        try:
+            date_ = datetime.datetime.strptime(file_name[:-4], "%d%m%Y").date()
+            with open(os.path.join(price_dir, file_name), 'r') as file:
+                prices[date_] = float(file.read().strip())
+        except ValueError:
+            logging.warning("Skipping price file with unexpected name or content: %s", file_name)
+            continue
+        summary["files"] += 1
+
+    dates = sorted(prices)
+    summary["imported"] = store.merge(symbol, dates, [prices[d] for d in dates])
+
+    logging.info("Imported %d %s closes from %d files in %s", summary['imported'], symbol, summary['files'], price_dir)
+    return summary
+
+
+if __name__ == "__main__":
+    import_text_price_files()
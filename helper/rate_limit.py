@@ -0,0 +1,76 @@
+import os
+import time
+import threading
+from helper.accounts import DEFAULT_ACCOUNT
+from bootstrap import bootstrap
+
+bootstrap()
+
+# Alpaca allows 200 trading API requests per minute per account
+TRADING_REQUESTS_PER_MINUTE = int(os.getenv("ALP_REQUESTS_PER_MINUTE", "200"))
+TRADING_BURST = 20
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: allows bursts of up to capacity calls and refills at rate tokens per second
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """
+        Blocks until the requested tokens are available and takes them
+
+        Parameters:
+        - tokens: Number of tokens to take
+
+        Returns:
+        - float: Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+
+                wait = (tokens - self._tokens) / self.rate
+
+            time.sleep(wait)
+            waited += wait
+
+
+_trading_bucket = TokenBucket(TRADING_REQUESTS_PER_MINUTE / 60.0, TRADING_BURST)
+_account_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_trading_rate_limiter(account=DEFAULT_ACCOUNT):
+    """
+    Returns the token bucket for an account's trading API requests; the limit applies per account
+
+    Parameters:
+    - account: Account name (default DEFAULT_ACCOUNT)
+
+    Returns:
+    - TokenBucket: Shared rate limiter
+    """
+    if account == DEFAULT_ACCOUNT:
+        return _trading_bucket
+
+    bucket = _account_buckets.get(account)
+    if bucket is None:
+        with _buckets_lock:
+            bucket = _account_buckets.setdefault(account,
+                                                 TokenBucket(TRADING_REQUESTS_PER_MINUTE / 60.0, TRADING_BURST))
+    return bucket
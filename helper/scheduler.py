@@ -0,0 +1,211 @@
+import heapq
+import time
+import threading
+import datetime
+from helper.market_clock import MARKET_TIMEZONE, REGULAR_CLOSE, session_close
+from helper.tracing import span
+from bootstrap import bootstrap
+import logging
+
+bootstrap()
+
+
+def market_time_to_epoch(date_, hour_, minute_, second_=0):
+    """
+    Converts a wall-clock time in America/New_York on a given date to a Unix timestamp,
+    honouring daylight saving time on that date
+
+    Parameters:
+    - date_: datetime.date in the market timezone
+    - hour_, minute_, second_: Wall-clock time in the market timezone
+
+    Returns:
+    - float: Unix timestamp
+    """
+    naive = datetime.datetime.combine(date_, datetime.time(hour_, minute_, second_))
+    return MARKET_TIMEZONE.localize(naive).timestamp()
+
+
+def session_time_to_epoch(date_, hour_, minute_):
+    """
+    Converts a market time on a trading day to a Unix timestamp, moving times after an early
+    close earlier by the same amount as the close (15:45 becomes 12:45 on a 13:00 close)
+
+    Parameters:
+    - date_: datetime.date in the market timezone
+    - hour_, minute_: Wall-clock time on a regular session
+
+    Returns:
+    - float: Unix timestamp, or None if the market is closed on that date
+    """
+    close = session_close(date_)
+    if close is None:
+        return None
+
+    run_at = market_time_to_epoch(date_, hour_, minute_)
+    if close != REGULAR_CLOSE and datetime.time(hour_, minute_) > close:
+        run_at -= market_time_to_epoch(date_, REGULAR_CLOSE.hour, REGULAR_CLOSE.minute) - \
+            market_time_to_epoch(date_, close.hour, close.minute)
+    return run_at
+
+
+class JobScheduler:
+    """
+    Heap-based scheduler that sleeps until the next deadline instead of polling.
+
+    All trigger times are computed in America/New_York, so they follow DST changes and do not
+    depend on the host's timezone. Each firing records how late it ran relative to its target.
+    A job that raises is logged and counted as a failure; it keeps its schedule and the other
+    jobs keep running. With trading_days_only, jobs are skipped on holidays and weekends and
+    times after an early close are moved ahead of it.
+    """
+
+    def __init__(self, trading_days_only=False):
+        self.trading_days_only = trading_days_only
+        self._heap = []
+        self._sequence = 0
+        self._stop = threading.Event()
+        self.lateness = {}
+
+    def _push(self, run_at, job):
+        """
+        Adds a job to the heap, the sequence number keeps ties in insertion order
+        """
+        self._sequence += 1
+        heapq.heappush(self._heap, (run_at, self._sequence, job))
+
+    def add_daily_job(self, name, hour_, minute_, fn):
+        """
+        Runs fn every day at hour_:minute_ market time
+
+        Parameters:
+        - name: Job name used in logs and lateness stats
+        - hour_, minute_: Trigger time in America/New_York
+        - fn: Callable to run
+        """
+        job = {"name": name, "fn": fn, "kind": "daily", "at": (hour_, minute_)}
+        self._push(self._next_daily_run(job, time.time()), job)
+
+    def add_interval_job(self, name, seconds, fn, start=None, end=None):
+        """
+        Runs fn every `seconds` seconds, optionally only inside a daily market-time window
+
+        Parameters:
+        - name: Job name used in logs and lateness stats
+        - seconds: Interval between runs
+        - fn: Callable to run
+        - start: Optional (hour, minute) window start in America/New_York
+        - end: Optional (hour, minute) window end in America/New_York
+        """
+        job = {"name": name, "fn": fn, "kind": "interval", "seconds": seconds, "start": start, "end": end}
+        self._push(self._next_interval_run(job, time.time()), job)
+
+    def add_one_off_job(self, name, fn, run_at=None):
+        """
+        Runs fn once, e.g. to catch up on a daily job whose time passed before the process started
+
+        Parameters:
+        - name: Job name used in logs and lateness stats
+        - fn: Callable to run
+        - run_at: Unix timestamp to run at (default now)
+        """
+        job = {"name": name, "fn": fn, "kind": "once"}
+        self._push(run_at if run_at is not None else time.time(), job)
+
+    def _job_time(self, date_, hour_, minute_):
+        """
+        Returns the Unix timestamp of a job time on a date, or None if jobs do not run that day
+        """
+        if self.trading_days_only:
+            return session_time_to_epoch(date_, hour_, minute_)
+        return market_time_to_epoch(date_, hour_, minute_)
+
+    def _next_daily_run(self, job, after):
+        """
+        Returns the first trigger time of a daily job strictly after `after`
+        """
+        date_ = datetime.datetime.fromtimestamp(after, MARKET_TIMEZONE).date()
+        while True:
+            run_at = self._job_time(date_, *job["at"])
+            if run_at is not None and run_at > after:
+                return run_at
+            date_ += datetime.timedelta(days=1)
+
+    def _next_interval_run(self, job, run_at):
+        """
+        Returns the first trigger time at or after run_at that falls inside the job's window
+        """
+        if job["start"] is None or job["end"] is None:
+            return run_at
+
+        date_ = datetime.datetime.fromtimestamp(run_at, MARKET_TIMEZONE).date()
+        while True:
+            window_start = self._job_time(date_, *job["start"])
+            window_end = self._job_time(date_, *job["end"])
+            if window_start is not None and run_at <= window_end:
+                return max(run_at, window_start)
+            date_ += datetime.timedelta(days=1)
+
+    def _record_lateness(self, name, late_seconds):
+        """
+        Keeps last, max and mean lateness per job in milliseconds
+        """
+        stats = self.lateness.setdefault(name, {"runs": 0, "failures": 0, "last_ms": 0.0, "max_ms": 0.0,
+                                                "mean_ms": 0.0})
+        late_ms = late_seconds * 1000
+        stats["runs"] += 1
+        stats["last_ms"] = late_ms
+        stats["max_ms"] = max(stats["max_ms"], late_ms)
+        stats["mean_ms"] += (late_ms - stats["mean_ms"]) / stats["runs"]
+
+    def stop(self):
+        """
+        Makes run() return after the current job
+        """
+        self._stop.set()
+
+    def run(self):
+        """
+        Runs jobs at their deadlines until stop() is called
+        """
+        while not self._stop.is_set() and self._heap:
+            run_at, _, job = self._heap[0]
+
+            # Sleep exactly until the next deadline; re-check in case the wait returned early
+            remaining = run_at - time.time()
+            if remaining > 0:
+                self._stop.wait(remaining)
+                continue
+
+            heapq.heappop(self._heap)
+            late_seconds = time.time() - run_at
+            self._record_lateness(job["name"], late_seconds)
+
+            if job["kind"] == "interval":
+                logging.debug("Running job %s (%.1f ms after target)", job['name'], late_seconds * 1000)
+            else:
+                logging.info("Running job %s (%.1f ms after target)", job['name'], late_seconds * 1000)
+
+            try:
+                with span(f"job.{job['name']}"):
+                    job["fn"]()
+            except Exception:
+                # One failing job must not take the session's later jobs down with it
+                self.lateness[job["name"]]["failures"] += 1
+                logging.exception("Job %s failed", job['name'])
+
+            if job["kind"] == "daily":
+                self._push(self._next_daily_run(job, run_at), job)
+            elif job["kind"] == "interval":
+                # Skip missed intervals instead of bursting to catch up
+                next_run = max(run_at + job["seconds"], time.time())
+                self._push(self._next_interval_run(job, next_run), job)
+
+    def get_lateness(self):
+        """
+        Returns how late each job fired relative to its target time, and how often it failed
+
+        Returns:
+        - dict: Job name to runs, failures and last/max/mean lateness in milliseconds
+        """
+        return {name: dict(stats) for name, stats in self.lateness.items()}
@@ -0,0 +1,373 @@
+import os
+import json
+import fcntl
+import zlib
+import time
+import threading
+from datetime import datetime
+from dir_path import base_dirname
+from helper.market_clock import market_today
+from bootstrap import bootstrap
+import logging
+
+bootstrap()
+
+JOURNAL_DIR = os.path.join(base_dirname, "data", "journal")
+
+# The session state is snapshotted after this many records, so a restart replays at most this many
+SNAPSHOT_EVERY = 500
+
+
+def spread_key(account, underlying, kind):
+    """
+    Key of one spread entry in the session state, e.g. 'default/QQQ/put_spread'
+    """
+    return f"{account}/{underlying}/{kind}"
+
+
+def new_session_state():
+    """
+    Returns the empty state of a trading session
+
+    Returns:
+    - dict: 'jobs' (job name to completion time), 'spreads' (spread key to entry status),
+      'orders' (order ID to saved order), 'closing_legs' (symbol to the time its close was sent)
+      and 'stop_losses' (stop-loss actions in order)
+    """
+    return {"jobs": {}, "spreads": {}, "orders": {}, "closing_legs": {}, "stop_losses": []}
+
+
+def apply_record(state, record):
+    """
+    Applies one journal record to the session state; replay applies every record in order
+
+    Parameters:
+    - state: Session state from new_session_state()
+    - record: Journal record with 'type', 'at' and the fields of its type
+    """
+    record_type = record["type"]
+    if record_type == "job_done":
+        state["jobs"][record["job"]] = record["at"]
+    elif record_type == "spread_intent":
+        state["spreads"][record["key"]] = {"account": record["account"], "underlying": record["underlying"],
+                                           "kind": record["kind"], "status": "pending", "at": record["at"]}
+    elif record_type == "spread_placed":
+        state["spreads"].setdefault(record["key"], {}).update(status="open", spread_id=record["spread_id"],
+                                                              legs=record["legs"])
+    elif record_type == "spread_failed":
+        state["spreads"].setdefault(record["key"], {}).update(status="failed", error=record["error"])
+    elif record_type == "orders":
+        for order in record["orders"]:
+            state["orders"][order["order_id"]] = {"strategy": record["strategy"], **order}
+    elif record_type == "stop_loss":
+        for symbol in record["legs"]:
+            state["closing_legs"][symbol] = record["at"]
+        state["stop_losses"].append({"at": record["at"], "scope": record["scope"], "spreads": record["spreads"]})
+    else:
+        logging.warning("Unknown session journal record type %s", record_type)
+
+
+def _encode(record):
+    """
+    Serializes a record as one line: CRC32 of the JSON body, a space, the body
+    """
+    body = json.dumps(record, separators=(",", ":"), default=str).encode()
+    return b"%08x %s\n" % (zlib.crc32(body), body)
+
+
+def _decode(line):
+    """
+    Parses a journal line, returning None for a torn or corrupt line
+    """
+    if not line.endswith(b"\n"):
+        return None
+    checksum, _, body = line[:-1].partition(b" ")
+    try:
+        if int(checksum, 16) != zlib.crc32(body):
+            return None
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+class SessionJournal:
+    """
+    Write-ahead journal of one trading session: which jobs ran, which spreads were entered,
+    the orders saved and the stop-loss actions, so a restarted process knows what already happened.
+
+    Records are appended to a CRC-checked JSON lines file. One writer thread flushes every record
+    queued since its last write with a single fsync (group commit), so concurrent callers share
+    the cost of making their records durable. The session state is kept up to date in memory and
+    snapshotted every SNAPSHOT_EVERY records; recovery loads the snapshot and replays only the
+    records written after it, dropping a torn last record.
+
+    Only one process can have a session's journal open: each keeps its own state, so a second one
+    would not see the spreads the first entered.
+    """
+
+    def __init__(self, trade_date, directory=None):
+        directory = directory or JOURNAL_DIR
+        name = trade_date.strftime("%Y%m%d")
+        self.trade_date = trade_date
+        self.path = os.path.join(directory, f"{name}.journal")
+        self.snapshot_path = os.path.join(directory, f"{name}.snapshot")
+        self.lock_path = os.path.join(directory, f"{name}.lock")
+        self.state = new_session_state()
+        self.seq = 0
+        self.committed_seq = 0
+        self.recovery = None
+        self._pending = []
+        self._records_since_snapshot = 0
+        self._file = None
+        self._lock_file = None
+        self._writer = None
+        self._error = None
+        self._closing = False
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._metrics = {"records": 0, "commits": 0, "snapshots": 0}
+
+    def open(self):
+        """
+        Locks the journal for this process, recovers the session state from disk and starts the writer thread
+
+        Returns:
+        - dict: Recovery statistics, see recover()
+
+        Raises:
+        - RuntimeError: If another process has the session's journal open
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        lock_file = open(self.lock_path, "a+")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.seek(0)
+            owner = lock_file.read().strip() or "unknown"
+            lock_file.close()
+            raise RuntimeError(f"Session journal {self.path} is in use by another process (pid {owner})")
+        lock_file.truncate(0)
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        self._lock_file = lock_file
+
+        self.recover()
+        self._file = open(self.path, "ab")
+        self._writer = threading.Thread(target=self._run_writer, name="session-journal", daemon=True)
+        self._writer.start()
+        return self.recovery
+
+    def recover(self):
+        """
+        Loads the latest snapshot and replays the journal records written after it. A torn or
+        corrupt record ends the replay and is cut off the file, with everything after it.
+
+        Returns:
+        - dict: Records replayed, whether a snapshot was used, bytes truncated and the time taken
+        """
+        started_at = time.perf_counter()
+        state, seq, offset = new_session_state(), 0, 0
+        journal_size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, "rb") as file:
+                    snapshot = json.load(file)
+                if snapshot["offset"] <= journal_size:
+                    state, seq, offset = snapshot["state"], snapshot["seq"], snapshot["offset"]
+                else:
+                    logging.warning("Session snapshot %s is ahead of its journal, replaying all", self.snapshot_path)
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning("Ignoring unreadable session snapshot %s: %s", self.snapshot_path, e)
+        snapshot_seq = seq
+
+        replayed = 0
+        if journal_size > offset:
+            with open(self.path, "rb") as file:
+                file.seek(offset)
+                for line in file:
+                    record = _decode(line)
+                    if record is None:
+                        break
+                    apply_record(state, record)
+                    seq = record["seq"]
+                    offset += len(line)
+                    replayed += 1
+
+        truncated = journal_size - offset
+        if truncated > 0:
+            logging.warning("Dropping %s bytes of torn records at the end of %s", truncated, self.path)
+            with open(self.path, "r+b") as file:
+                file.truncate(offset)
+                os.fsync(file.fileno())
+
+        self.state, self.seq, self.committed_seq = state, seq, seq
+        self._records_since_snapshot = replayed
+        self.recovery = {
+            "records": seq,
+            "replayed": replayed,
+            "snapshot_seq": snapshot_seq,
+            "truncated_bytes": max(truncated, 0),
+            "ms": (time.perf_counter() - started_at) * 1000
+        }
+        if seq:
+            logging.info("Recovered session %s from %s: %s", self.trade_date, self.path, self.recovery)
+        return self.recovery
+
+    def append(self, record_type, durable=True, **fields):
+        """
+        Appends a record and applies it to the session state
+
+        Parameters:
+        - record_type: One of the types handled by apply_record
+        - durable: Wait until the record is fsynced (default); False returns once it is queued
+        - fields: Fields of the record
+
+        Returns:
+        - int: Sequence number of the record
+
+        Raises:
+        - OSError: If the journal can no longer be written
+        """
+        with self._lock:
+            if self._error is not None:
+                raise OSError(f"Session journal {self.path} failed: {self._error}")
+            self.seq += 1
+            record = {"seq": self.seq, "type": record_type, "at": datetime.now().isoformat(), **fields}
+            apply_record(self.state, record)
+            self._pending.append(_encode(record))
+            self._changed.notify_all()
+
+            while durable and self.committed_seq < record["seq"] and self._error is None:
+                self._changed.wait()
+            if durable and self._error is not None:
+                raise OSError(f"Session journal {self.path} failed: {self._error}")
+        return record["seq"]
+
+    def _run_writer(self):
+        """
+        Writes the queued records with one fsync per batch, then snapshots the state when due
+        """
+        while True:
+            with self._lock:
+                while not self._pending and not self._closing:
+                    self._changed.wait()
+                if not self._pending:
+                    return
+                lines, self._pending = self._pending, []
+                batch_seq = self.seq
+                self._records_since_snapshot += len(lines)
+                # The state matches the file once this batch is written, serialize it now if a snapshot is due
+                snapshot = None
+                if self._records_since_snapshot >= SNAPSHOT_EVERY:
+                    snapshot = json.dumps(self.state, default=str)
+                    self._records_since_snapshot = 0
+
+            try:
+                self._file.write(b"".join(lines))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                offset = self._file.tell()
+            except OSError as e:
+                logging.critical("Could not write session journal %s: %s", self.path, e)
+                with self._lock:
+                    self._error = e
+                    self._changed.notify_all()
+                return
+
+            with self._lock:
+                self.committed_seq = batch_seq
+                self._metrics["records"] += len(lines)
+                self._metrics["commits"] += 1
+                self._changed.notify_all()
+
+            if snapshot is not None:
+                self._write_snapshot(batch_seq, offset, snapshot)
+
+    def _write_snapshot(self, seq, offset, state_json):
+        """
+        Atomically replaces the snapshot with the state as of a journal sequence number and offset
+        """
+        temp_path = self.snapshot_path + ".tmp"
+        try:
+            with open(temp_path, "w") as file:
+                file.write(f'{{"seq": {seq}, "offset": {offset}, "state": {state_json}}}')
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp_path, self.snapshot_path)
+            self._metrics["snapshots"] += 1
+        except OSError as e:
+            # The journal alone still recovers the session, only more slowly
+            logging.warning("Could not write session snapshot %s: %s", self.snapshot_path, e)
+
+    def close(self):
+        """
+        Writes the queued records and a final snapshot, stops the writer thread and unlocks the journal
+        """
+        with self._lock:
+            self._closing = True
+            self._changed.notify_all()
+        if self._writer is not None:
+            self._writer.join()
+        if self._file is not None and self._error is None:
+            with self._lock:
+                snapshot = json.dumps(self.state, default=str)
+            self._write_snapshot(self.committed_seq, self._file.tell(), snapshot)
+            self._file.close()
+        if self._lock_file is not None:
+            # Closing the file releases the lock
+            self._lock_file.close()
+            self._lock_file = None
+
+    def get_metrics(self):
+        """
+        Returns journal counters
+
+        Returns:
+        - dict: Records written, commits (fsyncs) and snapshots taken
+        """
+        return dict(self._metrics)
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_session_journal(trade_date=None):
+    """
+    Returns the journal of a session, recovering it from disk on first use. The journal of the
+    previous session is closed when the date changes.
+
+    Parameters:
+    - trade_date: datetime.date (default today in the market timezone)
+
+    Returns:
+    - SessionJournal: Open journal
+    """
+    global _journal
+    trade_date = trade_date or market_today()
+    with _journal_lock:
+        if _journal is None or _journal.trade_date != trade_date:
+            if _journal is not None:
+                _journal.close()
+            journal = SessionJournal(trade_date)
+            journal.open()
+            _journal = journal
+    return _journal
+
+
+def close_session_journal():
+    """
+    Closes the current session journal with a final snapshot
+
+    Returns:
+    - dict: Journal metrics, or None if no journal was opened
+    """
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            return None
+        _journal.close()
+        metrics = _journal.get_metrics()
+        _journal = None
+    return metrics
@@ -0,0 +1,296 @@
+import os
+import json
+import time
+import threading
+import functools
+from dir_path import base_dirname
+from bootstrap import bootstrap
+import logging
+
+bootstrap()
+
+# Tracing is off unless TRACING=1; spans are then a shared no-op context manager
+TRACING_ENABLED = os.getenv("TRACING", "0") == "1"
+
+TRACE_DIR = os.path.join(base_dirname, "data", "traces")
+
+# Histogram resolution: 2**SUB_BUCKET_BITS buckets per power of two of microseconds (~6% relative error)
+SUB_BUCKET_BITS = 4
+_SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+
+class LatencyHistogram:
+    """
+    Log-linear (HDR-style) latency histogram in microseconds.
+
+    Values below 2**SUB_BUCKET_BITS us are exact; above that every power of two is split into
+    2**SUB_BUCKET_BITS equal buckets, so memory stays small for any range while percentiles keep
+    a bounded relative error.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bucket(value_us):
+        """
+        Returns the bucket index of a value
+        """
+        if value_us < _SUB_BUCKETS:
+            return value_us
+        shift = value_us.bit_length() - SUB_BUCKET_BITS - 1
+        return (shift + 1) * _SUB_BUCKETS + (value_us >> shift) - _SUB_BUCKETS
+
+    @staticmethod
+    def _bucket_upper(index):
+        """
+        Returns the highest value that falls into a bucket
+        """
+        if index < _SUB_BUCKETS:
+            return index
+        shift = index // _SUB_BUCKETS - 1
+        mantissa = index % _SUB_BUCKETS + _SUB_BUCKETS
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value_us):
+        """
+        Adds one latency sample in microseconds
+        """
+        value_us = max(int(value_us), 0)
+        bucket = self._bucket(value_us)
+        with self._lock:
+            self.counts[bucket] = self.counts.get(bucket, 0) + 1
+            self.count += 1
+            self.total_us += value_us
+            self.max_us = max(self.max_us, value_us)
+            self.min_us = value_us if self.min_us is None else min(self.min_us, value_us)
+
+    def percentile(self, percent):
+        """
+        Returns the value at a percentile (upper edge of its bucket, capped at the max)
+
+        Parameters:
+        - percent: Percentile between 0 and 100
+
+        Returns:
+        - int: Latency in microseconds
+        """
+        with self._lock:
+            if self.count == 0:
+                return 0
+            target = max(1, int(round(self.count * percent / 100.0)))
+            seen = 0
+            for bucket in sorted(self.counts):
+                seen += self.counts[bucket]
+                if seen >= target:
+                    return min(self._bucket_upper(bucket), self.max_us)
+            return self.max_us
+
+    def summary(self):
+        """
+        Returns count, mean, min, p50, p90, p99 and max in milliseconds
+        """
+        if self.count == 0:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_ms": self.total_us / self.count / 1000,
+            "min_ms": self.min_us / 1000,
+            "p50_ms": self.percentile(50) / 1000,
+            "p90_ms": self.percentile(90) / 1000,
+            "p99_ms": self.percentile(99) / 1000,
+            "max_ms": self.max_us / 1000
+        }
+
+
+_histograms = {}
+_breakdowns = {}
+_registry_lock = threading.Lock()
+_local = threading.local()
+
+
+class _NoopSpan:
+    """
+    Span used while tracing is off
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    """
+    Timed section of code; nested spans on the same thread add to their root span's breakdown
+    """
+
+    __slots__ = ("name", "started_ns")
+
+    def __init__(self, name):
+        self.name = name
+        self.started_ns = 0
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        self.started_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed_us = (time.perf_counter_ns() - self.started_ns) // 1000
+        stack = _local.stack
+        stack.pop()
+
+        _get_histogram(self.name).record(elapsed_us)
+
+        # Attribute the time to the outermost span as a path like 'pnl.tick/broker.get_all_positions'
+        root = stack[0].name if stack else self.name
+        path = "/".join([span.name for span in stack[1:]] + [self.name]) if stack else None
+        with _registry_lock:
+            breakdown = _breakdowns.setdefault(root, {"runs": 0, "total_us": 0, "children": {}})
+            if path is None:
+                breakdown["runs"] += 1
+                breakdown["total_us"] += elapsed_us
+            else:
+                child = breakdown["children"].setdefault(path, {"calls": 0, "total_us": 0})
+                child["calls"] += 1
+                child["total_us"] += elapsed_us
+        return False
+
+
+def _get_histogram(name):
+    """
+    Returns the histogram of an operation, creating it on first use
+    """
+    histogram = _histograms.get(name)
+    if histogram is None:
+        with _registry_lock:
+            histogram = _histograms.setdefault(name, LatencyHistogram())
+    return histogram
+
+
+def enable_tracing(enabled=True):
+    """
+    Turns tracing on or off at runtime
+    """
+    global TRACING_ENABLED
+    TRACING_ENABLED = enabled
+
+
+def span(name):
+    """
+    Returns a context manager that times a block as operation `name`
+
+    Parameters:
+    - name: Operation name, e.g. 'broker.get_all_positions'
+
+    Returns:
+    - Context manager (a shared no-op when tracing is off)
+    """
+    if not TRACING_ENABLED:
+        return _NOOP_SPAN
+    return _Span(name)
+
+
+def traced(name=None):
+    """
+    Decorator that wraps every call of a function in a span
+
+    Parameters:
+    - name: Operation name (default the function's qualified name)
+    """
+    def decorator(fn):
+        operation = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not TRACING_ENABLED:
+                return fn(*args, **kwargs)
+            with _Span(operation):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def get_trace_report():
+    """
+    Returns latency percentiles per operation and the time breakdown of each root span
+
+    Returns:
+    - dict: 'operations' histogram summaries and 'breakdown' per root span with each nested
+      path's total time and share of the root's time
+    """
+    with _registry_lock:
+        histograms = dict(_histograms)
+        breakdowns = {root: {"runs": data["runs"], "total_us": data["total_us"],
+                             "children": {path: dict(child) for path, child in data["children"].items()}}
+                      for root, data in _breakdowns.items()}
+
+    report = {"operations": {name: histogram.summary() for name, histogram in sorted(histograms.items())},
+              "breakdown": {}}
+
+    for root, data in breakdowns.items():
+        total_us = data["total_us"]
+        report["breakdown"][root] = {
+            "runs": data["runs"],
+            "total_ms": total_us / 1000,
+            "children": {
+                path: {
+                    "calls": child["calls"],
+                    "total_ms": child["total_us"] / 1000,
+                    "share": child["total_us"] / total_us if total_us else 0.0
+                }
+                for path, child in sorted(data["children"].items(), key=lambda item: -item[1]["total_us"])
+            }
+        }
+    return report
+
+
+def reset_tracing():
+    """
+    Clears all recorded histograms and breakdowns
+    """
+    with _registry_lock:
+        _histograms.clear()
+        _breakdowns.clear()
+
+
+def dump_trace_report(path=None):
+    """
+    Writes the trace report to a JSON file and logs a one-line summary per operation
+
+    Parameters:
+    - path: Optional file path (default data/traces/trace_YYYYMMDD_HHMMSS.json)
+
+    Returns:
+    - str: Path of the written file, or None when tracing is off
+    """
+    if not TRACING_ENABLED:
+        return None
+
+    report = get_trace_report()
+    path = path or os.path.join(TRACE_DIR, f"trace_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2)
+
+    for name, stats in report["operations"].items():
+        if stats["count"]:
+            logging.info("Latency %s: n=%s p50=%.1fms p99=%.1fms max=%.1fms", name, stats['count'], stats['p50_ms'],
+                         stats['p99_ms'], stats['max_ms'])
+    logging.info("Trace report written to %s", path)
+    return path
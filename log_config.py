@@ -1,15 +1,148 @@
+import os
+import gzip
+import json
+import queue
+import shutil
+import atexit
+import threading
 import logging
+import logging.handlers
+
+LOG_FILE = os.getenv("LOG_FILE", "uv_trading.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# 'size' rotates at LOG_MAX_BYTES, 'daily' at midnight; rotated files are gzip-compressed
+LOG_ROTATION = os.getenv("LOG_ROTATION", "size")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "14"))
+
+CONSOLE_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Attributes every LogRecord has; anything else was passed through `extra` and goes into the JSON record
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+_listener_pid = None
+_configure_lock = threading.Lock()
+
+
+def _json_default(value):
+    """
+    Serializes values json cannot, e.g. objects passed through `extra`. Those are only formatted by
+    the writer thread, by when a weakly-referenced one may be gone.
+    """
+    try:
+        return str(value)
+    except Exception:
+        return f"<{type(value).__name__}>"
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line, including fields passed with `extra`
+    """
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, DATE_FORMAT),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=_json_default)
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves formatting to the writer thread.
+
+    The caller only merges the message with its arguments (so later mutation of the arguments
+    cannot change the record) and renders a traceback if there is one.
+    """
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _gzip_rotator(source, destination):
+    """
+    Compresses a rotated log file and removes the uncompressed copy
+    """
+    with open(source, 'rb') as uncompressed, gzip.open(destination, 'wb') as compressed:
+        shutil.copyfileobj(uncompressed, compressed)
+    os.remove(source)
+
+
+def _file_handler():
+    """
+    Returns the rotating JSON file handler selected by LOG_ROTATION
+    """
+    if LOG_ROTATION == "daily":
+        handler = logging.handlers.TimedRotatingFileHandler(LOG_FILE, when="midnight",
+                                                            backupCount=LOG_BACKUP_COUNT)
+    else:
+        handler = logging.handlers.RotatingFileHandler(LOG_FILE, mode='a', maxBytes=LOG_MAX_BYTES,
+                                                       backupCount=LOG_BACKUP_COUNT)
+    handler.namer = lambda name: name + ".gz"
+    handler.rotator = _gzip_rotator
+    handler.setFormatter(JsonFormatter())
+    return handler
+
+
+def stop_logging():
+    """
+    Drains the log queue and stops the writer thread
+    """
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
 
 
 def configure_logging():
+    """
+    Sets up logging once per process; later calls return immediately.
+
+    Callers only put records on an in-memory queue. A background thread writes them to the
+    console and, as JSON lines, to a rotating compressed log file. A forked child process gets
+    its own writer thread, since threads are not inherited across fork.
+    """
+    global _listener, _listener_pid
+    if _listener is not None and _listener_pid == os.getpid():
+        return
+
+    with _configure_lock:
+        if _listener is not None and _listener_pid == os.getpid():
+            return
+
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter(CONSOLE_FORMAT, DATE_FORMAT))
+
+        log_queue = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(log_queue, console, _file_handler(),
+                                                   respect_handler_level=True)
+
+        # Set up the root logger
+        root = logging.getLogger()
+        root.setLevel(LOG_LEVEL)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(_LazyQueueHandler(log_queue))
+
+        _listener.start()
+        _listener_pid = os.getpid()
 
-    # Set up the root logger
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        datefmt="%Y-%m-%d %H:%M:%S",
-        handlers=[
-            logging.StreamHandler(),
-            logging.FileHandler('uv_trading.log', mode='a')
-        ]
-    )
\ No newline at end of file
+    atexit.register(stop_logging)
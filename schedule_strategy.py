@@ -1,19 +1,29 @@
-from strategy.simple_strategy import place_qqq_option_spread_orders
-from data_process.post_market import fetch_and_save_qqq_price
-from helper.order import close_all_option_positions
-from utility import get_est_to_local_time_string, get_est_date_time
-from data_process.pnl import check_pnl
+from bootstrap import bootstrap, mark_ready
+bootstrap()
+
+from strategy.simple_strategy import place_option_spread_orders, load_option_chains
+from data_process.post_market import fetch_and_save_prices
+from helper.order import close_all_option_positions, restore_journaled_orders, get_pending_order_symbols
+from helper.clients import warm_up_clients
+from helper.accounts import DEFAULT_ACCOUNT, get_account
+from helper.broker_call import get_broker_call_metrics
+from helper.market_clock import market_today, is_trading_day
+from helper.scheduler import JobScheduler, session_time_to_epoch
+from helper.session_journal import get_session_journal, close_session_journal
+from helper.tracing import dump_trace_report
+from utility import get_est_date_time
+from data_process.pnl import check_and_close_losing_positions, get_pnl_tracker
+from data_process.trade_stream import start_trade_update_stream, stop_trade_update_stream
 from datetime import time as time_check
-import schedule
+import os
 import time
-
-from log_config import configure_logging
 import logging
-configure_logging()
 
 market_start_hour, market_start_minute = 9, 30
 market_end_hour, market_end_minute = 16, 0
 
+option_chain_hour, option_chain_minute = 9, 20
+warm_up_hour, warm_up_minute = 9, 29
 entry_hour, entry_minute = 9, 31
 exit_hour, exit_minute = 15, 45
 
@@ -24,6 +34,119 @@ post_market_calc_hour, post_market_calc_minute = 16, 25
 
 program_end_hour, program_end_minute = 16, 30
 
+# 'poll' checks the stop loss every 15 seconds, 'stream' evaluates it on every option quote
+stop_loss_mode = os.getenv("STOP_LOSS_MODE", "poll")
+
+# A process restarted after the entry time still enters within this many minutes of it; later the
+# gap signal is stale. Spreads the session journal shows as sent are never entered twice
+entry_catch_up_minutes = int(os.getenv("ENTRY_CATCH_UP_MINUTES", "5"))
+
+# Session jobs that a restarted process runs late: (name, time, run until, journaled job function)
+_catch_up_jobs = []
+
+
+def add_session_job(scheduler, name, hour_, minute_, fn, catch_up_until=None):
+    """
+    Adds a daily job that records its completion in the session journal
+
+    Parameters:
+    - scheduler: JobScheduler
+    - name: Job name
+    - hour_, minute_: Trigger time in America/New_York
+    - fn: Callable to run
+    - catch_up_until: Optional (hour, minute); a process started after the job's time runs it at once
+      if the journal shows it did not complete today and it is not yet this time (see resume_session)
+    """
+    def run_and_journal():
+        fn()
+        get_session_journal().append("job_done", job=name)
+
+    scheduler.add_daily_job(name, hour_, minute_, run_and_journal)
+    if catch_up_until is not None:
+        _catch_up_jobs.append((name, (hour_, minute_), catch_up_until, run_and_journal))
+
+
+def resume_closing_legs(state):
+    """
+    Keeps legs whose stop-loss closing orders were sent before a restart out of the stop loss while
+    those orders are still open, so the restarted process does not close them a second time
+
+    Parameters:
+    - state: Session state from the journal
+
+    Returns:
+    - list: Legs marked as closing in the PnL tracker
+    """
+    closing_legs = set(state["closing_legs"])
+    if not closing_legs:
+        return []
+
+    tracker = get_pnl_tracker()
+    tracker.load_session()
+    tracker.refresh_positions(force=True)
+    open_legs = closing_legs & set(tracker.positions)
+    if not open_legs:
+        return []
+
+    try:
+        pending = get_pending_order_symbols(open_legs)
+    except Exception as e:
+        # Without knowing whether their closing orders are still working, do not risk closing them twice
+        logging.error("Could not check the closing orders of %s, keeping them out of the stop loss: %s",
+                      sorted(open_legs), e)
+        pending = open_legs
+
+    tracker.mark_closing(pending)
+    if pending:
+        logging.warning("Closing orders of %s are still open, not closing them again", sorted(pending))
+    return sorted(pending)
+
+
+def resume_session(scheduler):
+    """
+    Picks up today's session after a restart from the session journal: orders journaled but missing
+    from the order store are written to it, legs with stop-loss closing orders still open are kept
+    out of the stop loss, and session jobs whose time passed without completing are run at once, in
+    their daily order
+
+    Parameters:
+    - scheduler: JobScheduler with the session jobs added
+
+    Returns:
+    - dict: Recovered journal records, restored orders, legs still closing, caught-up jobs and the time taken,
+      or None when the market is closed today
+    """
+    started_at = time.perf_counter()
+    today = market_today()
+    if not is_trading_day(today):
+        return None
+
+    journal = get_session_journal(today)
+    restored = restore_journaled_orders(journal.state, today)
+    closing_legs = resume_closing_legs(journal.state)
+
+    now = time.time()
+    caught_up = []
+    for name, at, until, fn in _catch_up_jobs:
+        if name in journal.state["jobs"]:
+            continue
+        if session_time_to_epoch(today, *at) <= now <= session_time_to_epoch(today, *until):
+            scheduler.add_one_off_job(f"{name}_catch_up", fn)
+            caught_up.append(name)
+
+    resumed = {
+        "journal": journal.recovery,
+        "restored_orders": restored,
+        "spreads": len(journal.state["spreads"]),
+        "stop_losses": len(journal.state["stop_losses"]),
+        "closing_legs": closing_legs,
+        "caught_up_jobs": caught_up,
+        "ms": (time.perf_counter() - started_at) * 1000
+    }
+    if journal.recovery["records"] or caught_up:
+        logging.info("Resumed session %s: %s", today, resumed)
+    return resumed
+
 
 def check_pnl_conditionally():
 
@@ -33,55 +156,92 @@ def check_pnl_conditionally():
     current_est_date_str, current_date_est, current_est_time = get_est_date_time()
     if pnl_check_start_time <= current_est_time <= pnl_check_end_time:
         try:
-            logging.info(f"Executing PNL check")
-            check_pnl()
+            logging.info("Executing PNL check")
+            check_and_close_losing_positions()
         except Exception as e:
-            logging.error(f"Error during PNL check at {current_est_time}: {str(e)}")
+            logging.error("Error during PNL check at %s: %s", current_est_time, e)
             raise
 
 
 def run_scheduled_jobs():
     logging.info("Initializing scheduled jobs")
 
-    entry_time = get_est_to_local_time_string(entry_hour, entry_minute)
-    schedule.every().day.at(entry_time).do(place_qqq_option_spread_orders)
+    # The stop loss tracks the default account's positions and closes the same legs in every account,
+    # so without the default account the traded accounts would have no stop loss
+    if get_account(DEFAULT_ACCOUNT) is None:
+        raise ValueError(f"ALP_ACCOUNTS must include '{DEFAULT_ACCOUNT}', the account the stop loss tracks")
 
-    schedule.every(15).seconds.do(check_pnl_conditionally)
+    # One process per session: started on a closed day or after the program end it would sleep into
+    # the next session and run alongside that day's process
+    current_est_date_str, current_date_est, current_est_time = get_est_date_time()
+    if not is_trading_day(market_today()):
+        logging.info("Market closed on %s. Exiting.", current_est_date_str)
+        return
+    if current_est_time >= time_check(program_end_hour, program_end_minute):
+        logging.info("Started after program end time (%02d:%02d). Exiting.", program_end_hour, program_end_minute)
+        return
 
-    exit_time = get_est_to_local_time_string(exit_hour, exit_minute)
-    schedule.every().day.at(exit_time).do(close_all_option_positions)
+    scheduler = JobScheduler(trading_days_only=True)
 
-    post_market_calc_time = get_est_to_local_time_string(post_market_calc_hour, post_market_calc_minute)
-    schedule.every().day.at(post_market_calc_time).do(fetch_and_save_qqq_price)
+    program_end = (program_end_hour, program_end_minute)
+    entry_catch_up_until = divmod(entry_hour * 60 + entry_minute + entry_catch_up_minutes, 60)
 
-    program_end_time = time_check(program_end_hour, program_end_minute)
+    add_session_job(scheduler, "load_option_chains", option_chain_hour, option_chain_minute, load_option_chains,
+                    catch_up_until=(exit_hour, exit_minute))
 
-    last_log_time = 0
-    while True:
-        try:
-            schedule.run_pending()
-            current_est_time = get_est_date_time()[2]
+    add_session_job(scheduler, "warm_up_clients", warm_up_hour, warm_up_minute, warm_up_clients,
+                    catch_up_until=program_end)
 
-            # Log status every 5 minutes to avoid excessive logging
-            current_time = time.time()
-            if current_time - last_log_time >= 300:  # 300 seconds = 5 minutes
-                logging.debug(f"Scheduler running. Current EST time: {current_est_time}")
-                last_log_time = current_time
+    # Fills of the day's orders feed the premiums the stop loss is measured against
+    add_session_job(scheduler, "start_trade_update_stream", warm_up_hour, warm_up_minute, start_trade_update_stream,
+                    catch_up_until=program_end)
 
-            if current_est_time >= program_end_time:
-                logging.info(f"Reached program end time ({program_end_time}). Exiting.")
-                exit()
+    add_session_job(scheduler, "entry", entry_hour, entry_minute, place_option_spread_orders,
+                    catch_up_until=entry_catch_up_until)
 
-            time.sleep(1)
+    if stop_loss_mode == "stream":
+        from data_process.quote_stream import start_stop_loss_stream, stop_stop_loss_stream
 
-        except Exception as e:
-            logging.error(f"Error in scheduler loop: {str(e)}")
-            raise
+        add_session_job(scheduler, "start_stop_loss_stream", pnl_check_start_hour, pnl_check_start_minute,
+                        start_stop_loss_stream, catch_up_until=(pnl_check_end_hour, pnl_check_end_minute))
+        add_session_job(scheduler, "stop_stop_loss_stream", pnl_check_end_hour, pnl_check_end_minute,
+                        stop_stop_loss_stream)
+    else:
+        scheduler.add_interval_job("pnl_check", 15, check_pnl_conditionally,
+                                   start=(pnl_check_start_hour, pnl_check_start_minute),
+                                   end=(pnl_check_end_hour, pnl_check_end_minute))
+
+    add_session_job(scheduler, "exit", exit_hour, exit_minute, close_all_option_positions,
+                    catch_up_until=program_end)
+
+    add_session_job(scheduler, "post_market_calc", post_market_calc_hour, post_market_calc_minute,
+                    fetch_and_save_prices, catch_up_until=program_end)
 
+    def end_program():
+        logging.info("Reached program end time (%02d:%02d). Exiting.", program_end_hour, program_end_minute)
+        logging.info("Job lateness: %s", scheduler.get_lateness())
+        logging.info("Broker call metrics: %s", get_broker_call_metrics())
+        logging.info("Trade update stream metrics: %s", stop_trade_update_stream())
+        logging.info("Session journal metrics: %s", close_session_journal())
+        dump_trace_report()
+        scheduler.stop()
+
+    scheduler.add_daily_job("program_end", program_end_hour, program_end_minute, end_program)
+
+    # After a crash, continue today's session where the journal left it
+    resume_session(scheduler)
+
+    mark_ready("scheduler")
+
+    try:
+        scheduler.run()
+    except Exception as e:
+        logging.error("Error in scheduler loop: %s", e)
+        raise
 
 if __name__ == "__main__":
     try:
         run_scheduled_jobs()
     except Exception as e:
-        logging.critical(f"Fatal error in main program: {str(e)}")
+        logging.critical("Fatal error in main program: %s", e)
         raise
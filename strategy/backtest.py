@@ -0,0 +1,294 @@
+import os
+import sys
+import time
+import datetime
+import numpy as np
+from dir_path import base_dirname
+from helper.market_clock import MARKET_TIMEZONE, get_session_calendar, trading_days_between
+from helper.option_model import black_scholes_price, minutes_to_years, MINUTES_PER_SESSION, SESSIONS_PER_YEAR
+from strategy.spread_rules import (DEFAULT_SPREAD_PARAMS, put_spread_signal, call_spread_signal, put_spread_strikes,
+                                   call_spread_strikes, stop_loss_level)
+from bootstrap import bootstrap
+import logging
+
+bootstrap()
+
+BACKTEST_DATA_DIR = os.path.join(base_dirname, "data", "backtest")
+
+# Minute bar indexes from 9:30: the 9:30 bar closes at 9:31 (entry), the 15:44 bar closes at 15:45 (exit)
+ENTRY_BAR = 0
+EXIT_MINUTES_BEFORE_CLOSE = 15
+
+# Realized volatility window and the volatility used before enough history exists
+VOLATILITY_WINDOW = 20
+DEFAULT_VOLATILITY = 0.20
+
+
+def history_path(symbol):
+    """
+    Returns the path of a symbol's cached backtest price history
+    """
+    return os.path.join(BACKTEST_DATA_DIR, f"{symbol}_history.npz")
+
+
+def save_price_history(history, path):
+    """
+    Saves price history arrays to a compressed .npz file
+
+    Parameters:
+    - history: dict with 'dates', 'daily_close' and 'intraday' arrays
+    - path: Destination file
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez_compressed(path, dates=history["dates"], daily_close=history["daily_close"],
+                        intraday=history["intraday"])
+
+
+def load_price_history(path):
+    """
+    Loads price history arrays saved by save_price_history
+
+    Parameters:
+    - path: .npz file
+
+    Returns:
+    - dict: 'dates' (datetime64[D], n), 'daily_close' (n) and 'intraday' (n x 390 minute closes)
+    """
+    with np.load(path) as data:
+        return {"dates": data["dates"], "daily_close": data["daily_close"], "intraday": data["intraday"]}
+
+
+def fetch_price_history(symbol, start, end, path=None):
+    """
+    Downloads daily and minute bars for the trading days in [start, end] into backtest arrays.
+    Minute closes are laid out on a 390-minute grid per day and forward-filled over missing minutes.
+
+    Parameters:
+    - symbol: Underlying symbol
+    - start: datetime.date of the first day
+    - end: datetime.date of the last day
+    - path: Optional .npz file to save to (default data/backtest/{symbol}_history.npz)
+
+    Returns:
+    - dict: Price history arrays, see load_price_history
+    """
+    from alpaca.data.requests import StockBarsRequest
+    from alpaca.data.timeframe import TimeFrame
+    from helper.clients import get_stock_data_client
+
+    dates = trading_days_between(start, end)
+    index = {date_: i for i, date_ in enumerate(dates.astype(datetime.date).tolist())}
+    daily_close = np.full(len(dates), np.nan)
+    intraday = np.full((len(dates), MINUTES_PER_SESSION), np.nan)
+
+    data_client = get_stock_data_client()
+    range_start = datetime.datetime.combine(start, datetime.time(0, 0))
+    range_end = datetime.datetime.combine(end, datetime.time(23, 59))
+
+    daily_bars = data_client.get_stock_bars(StockBarsRequest(
+        symbol_or_symbols=symbol, timeframe=TimeFrame.Day, start=range_start, end=range_end))
+    for bar in daily_bars.data.get(symbol, []):
+        row = index.get(bar.timestamp.astimezone(MARKET_TIMEZONE).date())
+        if row is not None:
+            daily_close[row] = bar.close
+
+    # Minute bars are requested a year at a time to keep responses bounded
+    for year in range(start.year, end.year + 1):
+        minute_bars = data_client.get_stock_bars(StockBarsRequest(
+            symbol_or_symbols=symbol, timeframe=TimeFrame.Minute,
+            start=max(range_start, datetime.datetime(year, 1, 1)),
+            end=min(range_end, datetime.datetime(year, 12, 31, 23, 59))))
+
+        for bar in minute_bars.data.get(symbol, []):
+            local = bar.timestamp.astimezone(MARKET_TIMEZONE)
+            row = index.get(local.date())
+            minute = (local.hour - 9) * 60 + local.minute - 30
+            if row is not None and 0 <= minute < MINUTES_PER_SESSION:
+                intraday[row, minute] = bar.close
+
+        logging.info("Fetched %s minute bars for %s", symbol, year)
+
+    # Forward-fill missing minutes within each day
+    filled = np.where(np.isnan(intraday), 0, np.arange(MINUTES_PER_SESSION))
+    np.maximum.accumulate(filled, axis=1, out=filled)
+    intraday = intraday[np.arange(len(dates))[:, None], filled]
+
+    history = {"dates": dates, "daily_close": daily_close, "intraday": intraday}
+    save_price_history(history, path or history_path(symbol))
+    return history
+
+
+def realized_volatility(daily_close, window=VOLATILITY_WINDOW):
+    """
+    Annualized close-to-close volatility known at each day's open (uses returns up to the previous close)
+
+    Parameters:
+    - daily_close: Array of daily closes
+    - window: Number of returns in the rolling window
+
+    Returns:
+    - numpy.ndarray: Volatility per day, DEFAULT_VOLATILITY until the window is filled
+    """
+    returns = np.diff(np.log(daily_close))
+    volatility = np.full(len(daily_close), DEFAULT_VOLATILITY)
+    if len(returns) < window:
+        return volatility
+
+    sums = np.cumsum(np.insert(returns, 0, 0.0))
+    squares = np.cumsum(np.insert(returns * returns, 0, 0.0))
+    mean = (sums[window:] - sums[:-window]) / window
+    variance = (squares[window:] - squares[:-window]) / window - mean * mean
+    # Day i only knows closes up to i-1, so it gets the window ending at the return into close i-1
+    volatility[window + 1:] = np.sqrt(np.maximum(variance, 0.0) * SESSIONS_PER_YEAR)[:len(daily_close) - window - 1]
+    return np.where(np.isfinite(volatility), volatility, DEFAULT_VOLATILITY)
+
+
+def session_minutes(dates):
+    """
+    Vectorized session length in minutes (210 on early-close days, 390 otherwise)
+    """
+    years = np.unique(dates.astype("datetime64[Y]").astype(int) + 1970)
+    early = np.array(sorted(d for year in years for d in get_session_calendar(int(year)).early_closes),
+                     dtype="datetime64[D]")
+    return np.where(np.isin(dates, early), 210, MINUTES_PER_SESSION)
+
+
+def _simulate_spread(bars, minutes_left, exit_offset, volatility, buy_strike, sell_strike, is_call, params, quantity):
+    """
+    Prices one credit spread per row along its bars and applies the stop loss and the timed exit
+
+    Parameters:
+    - bars: (days, bars) underlying prices from entry on
+    - minutes_left: (days, bars) session minutes left at each bar
+    - exit_offset: (days,) bar offset of the timed exit
+    - volatility: (days,) volatility
+    - buy_strike, sell_strike: (days,) strikes
+    - is_call: True for the call spread
+
+    Returns:
+    - tuple: (exit P&L, stop-loss hit flag, entry credit) per row
+    """
+    t = minutes_to_years(np.maximum(minutes_left, 0))
+    vol = volatility[:, None]
+    long_leg = black_scholes_price(bars, buy_strike[:, None], t, vol, is_call)
+    short_leg = black_scholes_price(bars, sell_strike[:, None], t, vol, is_call)
+
+    # Value of the short spread; P&L is the credit received minus the cost to buy it back
+    value = (short_leg - long_leg) * 100 * quantity
+    credit = value[:, 0]
+    pnl = credit[:, None] - value
+
+    stop = stop_loss_level(long_leg[:, 0] * 100 * quantity, short_leg[:, 0] * 100 * quantity, params)
+
+    offsets = np.arange(bars.shape[1])
+    in_session = (offsets[None, :] > 0) & (offsets[None, :] <= exit_offset[:, None])
+    hit = (pnl <= stop[:, None]) & in_session
+
+    stopped = hit.any(axis=1)
+    exit_at = np.where(stopped, hit.argmax(axis=1), exit_offset)
+    return pnl[np.arange(len(pnl)), exit_at], stopped, credit
+
+
+def run_backtest(history, params=DEFAULT_SPREAD_PARAMS, volatility=None, quantity=1):
+    """
+    Evaluates the put and call spread rules over every day of the history at once.
+
+    Entry signals and strikes use the same spread_rules functions as the live strategy. Spreads are
+    priced with Black-Scholes on every minute bar from 9:31; a spread is closed at the first bar
+    where its P&L reaches the stop-loss level, otherwise 15 minutes before the close.
+
+    Parameters:
+    - history: Price history arrays, see load_price_history
+    - params: Spread parameters
+    - volatility: Optional constant annualized volatility (default: rolling realized volatility)
+    - quantity: Contracts per leg
+
+    Returns:
+    - dict: Per-day arrays ('dates', 'put_pnl', 'call_pnl', 'pnl', 'put_signal', 'call_signal',
+      'stopped') and a 'summary'
+    """
+    dates = history["dates"][1:]
+    yesterday_price = history["daily_close"][:-1]
+    day_bars = history["intraday"][1:, ENTRY_BAR:]
+    current_price = day_bars[:, 0]
+
+    if volatility is None:
+        day_volatility = realized_volatility(history["daily_close"])[1:]
+    else:
+        day_volatility = np.full(len(dates), float(volatility))
+
+    minutes = session_minutes(dates)
+    bar_close_minute = np.arange(ENTRY_BAR, MINUTES_PER_SESSION) + 1
+    minutes_left = minutes[:, None] - bar_close_minute[None, :]
+    exit_offset = minutes - EXIT_MINUTES_BEFORE_CLOSE - 1 - ENTRY_BAR
+
+    valid = np.isfinite(yesterday_price) & np.isfinite(current_price)
+    put_signal = valid & put_spread_signal(yesterday_price, current_price, params)
+    call_signal = valid & call_spread_signal(yesterday_price, current_price, params)
+
+    put_pnl = np.zeros(len(dates))
+    call_pnl = np.zeros(len(dates))
+    stopped = np.zeros(len(dates), dtype=bool)
+
+    for is_call, signal, strikes, pnl_out in (
+            (False, put_signal, put_spread_strikes(yesterday_price, params), put_pnl),
+            (True, call_signal, call_spread_strikes(yesterday_price, params), call_pnl)):
+        rows = np.nonzero(signal)[0]
+        if len(rows) == 0:
+            continue
+        pnl, hit, _ = _simulate_spread(day_bars[rows], minutes_left[rows], exit_offset[rows], day_volatility[rows],
+                                       strikes[0][rows], strikes[1][rows], is_call, params, quantity)
+        pnl_out[rows] = pnl
+        stopped[rows] |= hit
+
+    daily_pnl = put_pnl + call_pnl
+    return {
+        "dates": dates,
+        "put_signal": put_signal,
+        "call_signal": call_signal,
+        "put_pnl": put_pnl,
+        "call_pnl": call_pnl,
+        "pnl": daily_pnl,
+        "stopped": stopped,
+        "summary": summarize_pnl(daily_pnl, put_signal | call_signal, stopped)
+    }
+
+
+def summarize_pnl(daily_pnl, traded, stopped):
+    """
+    Summary statistics of a daily P&L series
+
+    Parameters:
+    - daily_pnl: P&L per day (zero on days without a trade)
+    - traded: Boolean mask of days with a trade
+    - stopped: Boolean mask of days closed by the stop loss
+
+    Returns:
+    - dict: total P&L, trade count, hit rate, stop count, max drawdown and annualized Sharpe ratio
+    """
+    equity = np.cumsum(daily_pnl)
+    drawdown = np.maximum.accumulate(np.maximum(equity, 0)) - equity
+    trades = int(traded.sum())
+    std = daily_pnl.std()
+
+    return {
+        "total_pnl": float(equity[-1]) if len(equity) else 0.0,
+        "trades": trades,
+        "hit_rate": float((daily_pnl[traded] > 0).sum() / trades) if trades else 0.0,
+        "stops": int(stopped.sum()),
+        "max_drawdown": float(drawdown.max()) if len(drawdown) else 0.0,
+        "sharpe": float(daily_pnl.mean() / std * np.sqrt(SESSIONS_PER_YEAR)) if std > 0 else 0.0
+    }
+
+
+if __name__ == "__main__":
+    symbol = sys.argv[1] if len(sys.argv) > 1 else "QQQ"
+    price_history = load_price_history(history_path(symbol))
+
+    started_at = time.perf_counter()
+    result = run_backtest(price_history)
+    elapsed = time.perf_counter() - started_at
+
+    print(f"Backtested {len(result['dates'])} days of {symbol} in {elapsed:.3f}s")
+    for key, value in result["summary"].items():
+        print(f"{key}: {value}")
@@ -1,29 +1,181 @@
 import os
-from datetime import datetime, timedelta
-from alpaca.data.historical import StockHistoricalDataClient
-from alpaca.data.requests import StockLatestBarRequest
-from alpaca.trading.client import TradingClient
-from helper.order import place_order, save_order_ids
-
-from dir_path import base_dirname
-from log_config import configure_logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from helper.broker_call import call_broker
+from helper.accounts import DEFAULT_ACCOUNT, TRADING_ACCOUNTS
+from helper.clients import get_account_clients, get_stock_data_client
+from helper.market_clock import market_today, previous_trading_day, is_expiry_day
+from helper.option_chain import get_option_chain_index
+from helper.iv_surface import get_iv_surface, SURFACE_STRIKE_WINDOW
+from helper.session_journal import get_session_journal, spread_key
+from helper.option_symbol import format_option_symbol
+from helper.order import place_spread_order, save_order_ids
+from helper.price_store import get_price_store
+from strategy.spread_rules import put_spread_signal, call_spread_signal, put_spread_strikes, call_spread_strikes
+from data_process.pnl import get_option_quote_prices
+
+from bootstrap import bootstrap
 import logging
 
-from dotenv import load_dotenv
+bootstrap()
 
-load_dotenv()
+# Underlyings traded by the gap-band spread strategy, e.g. STRATEGY_UNDERLYINGS=QQQ,SPY,IWM
+STRATEGY_UNDERLYINGS = [symbol.strip().upper() for symbol in os.getenv("STRATEGY_UNDERLYINGS", "QQQ").split(",")
+                        if symbol.strip()]
 
-configure_logging()
+# Maximum spreads being placed at once; each spread sends up to two legs concurrently
+ENTRY_WORKERS = 8
 
-API_KEY = os.getenv("ALP_KEY")
-API_SECRET = os.getenv("ALP_SECRET")
+# Spreads whose credit per contract, estimated off the IV surface, is below this many dollars are not
+# sent, e.g. MIN_ENTRY_CREDIT=15. Unset sends every spread
+MIN_ENTRY_CREDIT = float(os.getenv("MIN_ENTRY_CREDIT")) if os.getenv("MIN_ENTRY_CREDIT") else None
 
 
-def place_qqq_option_spread_orders():
+def get_latest_prices(symbols):
+    """
+    Fetches the latest bar close of every symbol in one batched request
+
+    Parameters:
+    - symbols: List of stock symbols
+
+    Returns:
+    - dict: Symbol to latest close; symbols without a bar are left out
+    """
+    from alpaca.data.requests import StockLatestBarRequest
+
+    data_client = get_stock_data_client()
+    request_params = StockLatestBarRequest(symbol_or_symbols=list(symbols))
+    latest_bars = call_broker("get_stock_latest_bar", data_client.get_stock_latest_bar, request_params,
+                              api="market_data")
+    return {symbol: bar.close for symbol, bar in latest_bars.items()}
+
+
+def load_option_chains(underlyings=None):
+    """
+    Loads the option chains expiring today for the universe into the option chain index,
+    so the entry can pick listed strikes without calling the API. Runs before the open.
+
+    Parameters:
+    - underlyings: List of underlying symbols (default STRATEGY_UNDERLYINGS)
+
+    Returns:
+    - dict: Number of contracts loaded per underlying
+    """
+    today = market_today()
+    underlyings = [symbol for symbol in (underlyings or STRATEGY_UNDERLYINGS) if is_expiry_day(today, symbol)]
+    if not underlyings:
+        return {}
+
+    try:
+        return get_option_chain_index().load(underlyings, today)
+    except Exception as e:
+        logging.error("Error loading option chains for %s: %s", today, e)
+        return {}
+
+
+def _spread_contracts(underlying, expiration_date, right, buy_strike, sell_strike):
+    """
+    Picks the listed contracts of a spread from the option chain index, falling back to the
+    computed strikes when the chain was not loaded
+
+    Returns:
+    - tuple: (buy strike, sell strike, buy OCC symbol, sell OCC symbol)
+    """
+    index = get_option_chain_index()
+    if not index.has_chain(underlying, expiration_date):
+        logging.warning("No %s option chain loaded for %s, strikes are not checked", underlying, expiration_date)
+        return (buy_strike, sell_strike, format_option_symbol(underlying, expiration_date, right, buy_strike),
+                format_option_symbol(underlying, expiration_date, right, sell_strike))
+
+    legs = index.spread_legs(underlying, expiration_date, right, buy_strike, sell_strike)
+    if legs is None:
+        raise ValueError(f"No listed {underlying} {right} strikes for a {buy_strike}/{sell_strike} spread "
+                         f"expiring {expiration_date}")
+
+    if (legs["buy"][0], legs["sell"][0]) != (buy_strike, sell_strike):
+        logging.info("Snapped %s %s spread %s/%s to listed strikes %s/%s", underlying, right, buy_strike, sell_strike,
+                     legs["buy"][0], legs["sell"][0])
+    return legs["buy"][0], legs["sell"][0], legs["buy"][1], legs["sell"][1]
+
+
+def refresh_iv_surface(spots, expiration_date):
+    """
+    Quotes the listed strikes around each underlying's price and updates the IV surface with them,
+    one batched quote request for the whole universe
+
+    Parameters:
+    - spots: Underlying symbol to price mapping
+    - expiration_date: datetime.date or YYYY-MM-DD string
+
+    Returns:
+    - int: Number of strikes whose implied volatility was solved
+    """
+    try:
+        index = get_option_chain_index()
+        symbols = [symbol for underlying, spot in spots.items()
+                   for symbol in index.contracts_near(underlying, expiration_date, spot, SURFACE_STRIKE_WINDOW)]
+        if not symbols:
+            return 0
+        return get_iv_surface().update(get_option_quote_prices(symbols), spots)
+    except Exception as e:
+        logging.warning("Could not refresh the IV surface for %s: %s", expiration_date, e)
+        return 0
+
+
+def _estimate_credit(underlying, buy_symbol, sell_symbol, quantity):
+    """
+    Estimates a spread's credit off the IV surface before its orders are sent, rejecting spreads
+    below MIN_ENTRY_CREDIT
+
+    Returns:
+    - float: Estimated credit in dollars, or None when the surface has no volatilities for the expiry
+    """
+    marks = get_iv_surface().mark_prices([buy_symbol, sell_symbol])
+    if len(marks) < 2:
+        logging.info("No IV surface for %s spread %s/%s, credit not estimated", underlying, buy_symbol, sell_symbol)
+        return None
+
+    credit = (marks[sell_symbol] - marks[buy_symbol]) * 100 * quantity  # * 100 for option contracts
+    logging.info("Estimated credit of %s spread %s/%s: $%.2f", underlying, buy_symbol, sell_symbol, credit)
+    if MIN_ENTRY_CREDIT is not None and credit < MIN_ENTRY_CREDIT * quantity:
+        raise ValueError(f"Estimated credit ${credit:.2f} of {underlying} spread {buy_symbol}/{sell_symbol} "
+                         f"is below the minimum of ${MIN_ENTRY_CREDIT * quantity:.2f}")
+    return credit
+
+
+def _place_spread(account, trading_client, underlying, kind, strikes, expiration_date):
+    """
+    Places one spread in one account, returning its result or the error so one failure does not stop the others.
+    The attempt is journaled before any order is sent, so a restarted session does not enter the spread again.
+
+    Returns:
+    - tuple: (account name, underlying, kind, result)
+    """
+    execute = execute_put_spread if kind == "put_spread" else execute_call_spread
+    journal = get_session_journal()
+    key = spread_key(account["name"], underlying, kind)
+    try:
+        journal.append("spread_intent", key=key, account=account["name"], underlying=underlying, kind=kind)
+        result = execute(trading_client, underlying, strikes[0], strikes[1], expiration_date,
+                         quantity=account["quantity"], account=account["name"])
+        logging.info("%s %s order executed in account %s: %s", underlying, kind, account["name"], result)
+        journal.append("spread_placed", durable=False, key=key, spread_id=result["spread_id"], legs=result["legs"])
+    except Exception as e:
+        logging.error("Error placing %s %s in account %s: %s", underlying, kind, account['name'], e)
+        result = {"error": str(e)}
+        try:
+            journal.append("spread_failed", durable=False, key=key, error=str(e))
+        except OSError:
+            pass
+    return account["name"], underlying, kind, result
+
+
+def place_option_spread_orders(underlyings=None, accounts=None):
     """
-    Implements the QQQ option spread strategies:
+    Runs the gap-band spread strategies on every underlying of the universe:
 
-    1. Put Spread Strategy: 
+    1. Put Spread Strategy:
        If yest_price < current_price < 1.01*yest_price:
        - Buy put with strike at 0.98*yest_price
        - Sell put with strike at 0.99*yest_price
@@ -33,250 +185,297 @@ def place_qqq_option_spread_orders():
        - Buy call with strike at 1.02*yest_price
        - Sell call with strike at 1.01*yest_price
 
-    Both with today's expiry
+    Both with today's expiry. Thresholds and strikes come from strategy.spread_rules,
+    which the backtester uses as well.
+
+    The latest prices of all underlyings come from one batched request, the entry conditions
+    are evaluated together on arrays, and the resulting spread orders are sent concurrently
+    to every account, each with its own quantity. A spread that fails is reported in the result
+    without affecting the other spreads or accounts.
+
+    Parameters:
+    - underlyings: List of underlying symbols (default STRATEGY_UNDERLYINGS)
+    - accounts: List of account dicts (default TRADING_ACCOUNTS)
 
     Returns:
-    - dict: Information about the order execution or None if no order placed
+    - dict: Account name to a dict of underlying to its 'put_spread' and/or 'call_spread' results,
+      or None if no order placed
     """
     try:
-        # Get yesterday's date and file path
-        yesterday = datetime.now() - timedelta(days=1)
-        yesterday_str = yesterday.strftime("%d%m%Y")
-        yesterday_file = os.path.join(base_dirname, "data", "qqq_price", f"{yesterday_str}.txt")
-
-        # Check if yesterday's file exists
-        if not os.path.exists(yesterday_file):
-            logging.error(f"Yesterday's QQQ price file not found: {yesterday_file}")
+        # Get today's session and the previous trading day
+        today = market_today()
+        underlyings = [symbol for symbol in (underlyings or STRATEGY_UNDERLYINGS) if is_expiry_day(today, symbol)]
+        if not underlyings:
+            logging.info("No options expire on %s for the strategy universe. No orders placed.", today)
             return None
 
-        # Read yesterday's price
-        with open(yesterday_file, 'r') as file:
-            yesterday_price = float(file.read().strip())
+        yesterday = previous_trading_day(today)
+        store = get_price_store()
+        yesterday_prices = {}
+        for symbol in underlyings:
+            close = store.get_close(symbol, yesterday)
+            # Check that yesterday's close was recorded
+            if close is None:
+                logging.error("No %s close stored for %s", symbol, yesterday)
+            else:
+                yesterday_prices[symbol] = close
+
+        if not yesterday_prices:
+            return None
 
-        logging.info(f"Yesterday's QQQ price: ${yesterday_price:.2f}")
+        # Get current prices for the whole universe at once
+        current_prices = get_latest_prices(list(yesterday_prices))
+        symbols = [symbol for symbol in yesterday_prices if symbol in current_prices]
+        for symbol in yesterday_prices.keys() - current_prices.keys():
+            logging.error("No latest bar for %s", symbol)
+        if not symbols:
+            return None
+
+        yesterday_array = np.array([yesterday_prices[symbol] for symbol in symbols])
+        current_array = np.array([current_prices[symbol] for symbol in symbols])
+
+        put_signal = put_spread_signal(yesterday_array, current_array)
+        call_signal = call_spread_signal(yesterday_array, current_array)
+        put_strikes = put_spread_strikes(yesterday_array)
+        call_strikes = call_spread_strikes(yesterday_array)
 
-        # Get current QQQ price
-        data_client = StockHistoricalDataClient(API_KEY, API_SECRET)
-        request_params = StockLatestBarRequest(symbol_or_symbols="QQQ")
-        latest_bar = data_client.get_stock_latest_bar(request_params)
-        current_price = latest_bar["QQQ"].close
+        spreads = []
+        for i, symbol in enumerate(symbols):
+            logging.info("%s yesterday $%.2f, current $%.2f, put spread %s, call spread %s", symbol,
+                         yesterday_array[i], current_array[i], bool(put_signal[i]), bool(call_signal[i]))
+            if put_signal[i]:
+                spreads.append((symbol, "put_spread", (float(put_strikes[0][i]), float(put_strikes[1][i]))))
+            if call_signal[i]:
+                spreads.append((symbol, "call_spread", (float(call_strikes[0][i]), float(call_strikes[1][i]))))
+
+        if not spreads:
+            logging.info("No strategy conditions met. No orders placed.")
+            return None
 
-        logging.info(f"Current QQQ price: ${current_price:.2f}")
+        # Quote the strikes around each underlying once, every account's credit estimate reads the same surface
+        refresh_iv_surface({symbol: float(current_prices[symbol]) for symbol, _, _ in spreads}, today)
 
-        # Initialize trading client
-        trading_client = TradingClient(API_KEY, API_SECRET, paper=True)
+        # Use the shared trading client of each account
+        account_clients = get_account_clients(accounts or TRADING_ACCOUNTS)
 
-        # Get today's date for expiration
-        today = datetime.now()
+        # Today's session is the expiration
         expiration_date = today.strftime("%Y-%m-%d")
 
-        result = {}
-
-        # Check Put Spread Strategy condition
-        if yesterday_price < current_price < (1.01 * yesterday_price):
-            logging.info("Put Spread Strategy condition met! Placing options spread order")
-
-            # Calculate strike prices for put spread
-            buy_put_strike = round(0.98 * yesterday_price)
-            sell_put_strike = round(0.99 * yesterday_price)
-
-            # Create and place the put spread order
-            put_result = execute_qqq_put_spread(
-                trading_client,
-                buy_put_strike,
-                sell_put_strike,
-                expiration_date,
-                quantity=1
-            )
-
-            logging.info(f"Put Spread order executed: {put_result}")
-            result["put_spread"] = put_result
-        else:
-            logging.info("Put Spread Strategy condition not met.")
-
-        # Check Call Spread Strategy condition
-        if (0.99 * yesterday_price) < current_price < yesterday_price:
-            logging.info("Call Spread Strategy condition met! Placing options spread order")
-
-            # Calculate strike prices for call spread
-            buy_call_strike = round(1.02 * yesterday_price)
-            sell_call_strike = round(1.01 * yesterday_price)
-
-            # Create and place the call spread order
-            call_result = execute_qqq_call_spread(
-                trading_client,
-                buy_call_strike,
-                sell_call_strike,
-                expiration_date,
-                quantity=1
-            )
-
-            logging.info(f"Call Spread order executed: {call_result}")
-            result["call_spread"] = call_result
-        else:
-            logging.info("Call Spread Strategy condition not met.")
-
-        # Return results
-        if result:
+        # Spreads a previous run of this session already sent (or may have sent) are not entered twice
+        journaled = get_session_journal().state["spreads"]
+        entries = []
+        for account, client in account_clients:
+            for symbol, kind, strikes in spreads:
+                entry = journaled.get(spread_key(account["name"], symbol, kind))
+                if entry is not None and entry.get("status") != "failed":
+                    logging.warning("%s %s already %s in account %s this session, not entering it again", symbol,
+                                    kind, entry.get("status"), account["name"])
+                    continue
+                entries.append((account, client, symbol, kind, strikes))
+
+        # Every account gets its own workers so the fan-out takes about as long as one account
+        result = {account["name"]: {} for account, _ in account_clients}
+        if not entries:
             return result
-        else:
-            logging.info("No strategy conditions met. No orders placed.")
-            return None
+        with ThreadPoolExecutor(max_workers=min(ENTRY_WORKERS, len(spreads)) * len(account_clients)) as executor:
+            futures = [executor.submit(_place_spread, account, client, symbol, kind, strikes, expiration_date)
+                       for account, client, symbol, kind, strikes in entries]
+            for future in futures:
+                name, symbol, kind, spread_result = future.result()
+                result[name].setdefault(symbol, {})[kind] = spread_result
+
+        return result
 
     except Exception as e:
-        logging.error(f"Error in QQQ option spread strategies: {str(e)}")
+        logging.error("Error in option spread strategies: %s", e)
         return None
 
 
-def execute_qqq_put_spread(trading_client, buy_put_strike, sell_put_strike, expiration_date, quantity=1):
+def place_qqq_option_spread_orders():
+    """
+    Runs the spread strategies on QQQ alone, see place_option_spread_orders
+
+    Returns:
+    - dict: Account name to information about its order execution, or None if no order placed
+    """
+    result = place_option_spread_orders(["QQQ"])
+    return {name: spreads["QQQ"] for name, spreads in result.items() if "QQQ" in spreads} if result else None
+
+
+def execute_put_spread(trading_client, underlying, buy_put_strike, sell_put_strike, expiration_date, quantity=1,
+                       execution_mode=None, account=DEFAULT_ACCOUNT):
     """
     Executes a put spread by:
     1. Buying a put at the lower strike price
     2. Selling a put at the higher strike price
     Both with the same expiration date
 
-    Uses place_order function and saves order IDs to a text file
+    Strikes are snapped to the nearest listed strikes at or beyond them (see helper.option_chain), and
+    the credit is estimated off the IV surface first (see MIN_ENTRY_CREDIT). Both legs are sent
+    together via place_spread_order and order IDs are saved to the order store
 
     Parameters:
     - trading_client: Alpaca TradingClient instance
+    - underlying: Underlying symbol
     - buy_put_strike: Strike price for the put to buy (lower strike)
     - sell_put_strike: Strike price for the put to sell (higher strike)
     - expiration_date: Expiration date in format YYYY-MM-DD
     - quantity: Number of contracts to trade (default 1)
+    - execution_mode: Spread execution mode passed to place_spread_order (default SPREAD_EXECUTION_MODE)
+    - account: Name of the account trading_client belongs to, recorded with the orders
 
     Returns:
     - dict: Information about the order execution
     """
-    # Format expiration date for option symbol (YYMMDD format)
-    exp_formatted = datetime.strptime(expiration_date, "%Y-%m-%d").strftime("%y%m%d")
-
-    # Format strike prices for option symbols (multiply by 1000 and format as 8 digits)
-    buy_strike_formatted = f"{int(buy_put_strike * 1000):08d}"
-    sell_strike_formatted = f"{int(sell_put_strike * 1000):08d}"
-
-    # Create OCC option symbols
-    buy_put_symbol = f"QQQ{exp_formatted}P{buy_strike_formatted}"
-    sell_put_symbol = f"QQQ{exp_formatted}P{sell_strike_formatted}"
+    # Snap the strikes to listed contracts and get their OCC option symbols
+    buy_put_strike, sell_put_strike, buy_put_symbol, sell_put_symbol = _spread_contracts(
+        underlying, expiration_date, "P", buy_put_strike, sell_put_strike)
 
     # Log the option symbols we're using
-    logging.info(f"Buying put: {buy_put_symbol}, Selling put: {sell_put_symbol}")
+    logging.info("Buying put: %s, Selling put: %s", buy_put_symbol, sell_put_symbol)
 
-    # Execute the orders using place_order function
-    try:
-        # Place order to buy put
-        buy_order_result = place_order(
-            trading_client=trading_client,
-            symbol=buy_put_symbol,
-            qty=quantity,
-            side='buy',
-            order_type='market',
-            time_in_force='day'
-        )
+    estimated_credit = _estimate_credit(underlying, buy_put_symbol, sell_put_symbol, quantity)
 
-        # Place order to sell put
-        sell_order_result = place_order(
+    # Execute both legs together using place_spread_order
+    try:
+        spread_result = place_spread_order(
             trading_client=trading_client,
-            symbol=sell_put_symbol,
+            legs=[
+                {"symbol": buy_put_symbol, "side": 'buy'},
+                {"symbol": sell_put_symbol, "side": 'sell'}
+            ],
             qty=quantity,
-            side='sell',
-            order_type='market',
-            time_in_force='day'
+            mode=execution_mode
         )
+        buy_order_result, sell_order_result = spread_result["orders"]
 
         # Create list of orders to save
         orders = [buy_order_result, sell_order_result]
 
-        # Save order IDs to file
-        file_path = save_order_ids(orders, "qqq_put_spread")
+        # Save order IDs to the order store
+        # The spread ID lets the P&L tracker pair the two legs back into this spread
+        spread_id = uuid.uuid4().hex
+        file_path = save_order_ids(orders, f"{underlying.lower()}_put_spread", account, spread_id)
 
         return {
             "buy_put": buy_order_result,
             "sell_put": sell_order_result,
-            "strategy": "QQQ Put Spread",
+            "strategy": f"{underlying} Put Spread",
+            "spread_id": spread_id,
+            "legs": [buy_put_symbol, sell_put_symbol],
+            "underlying": underlying,
+            "account": account,
             "buy_strike": buy_put_strike,
             "sell_strike": sell_put_strike,
+            "estimated_credit": estimated_credit,
             "expiration": expiration_date,
             "quantity": quantity,
-            "order_file": file_path
+            "order_file": file_path,
+            "execution": spread_result["execution"]
         }
 
     except Exception as e:
-        logging.error(f"Error executing put spread orders: {str(e)}")
+        logging.error("Error executing %s put spread orders: %s", underlying, e)
         raise
 
 
-def execute_qqq_call_spread(trading_client, buy_call_strike, sell_call_strike, expiration_date, quantity=1):
+def execute_qqq_put_spread(trading_client, buy_put_strike, sell_put_strike, expiration_date, quantity=1,
+                           execution_mode=None, account=DEFAULT_ACCOUNT):
+    """
+    Executes a QQQ put spread, see execute_put_spread
+
+    Returns:
+    - dict: Information about the order execution
+    """
+    return execute_put_spread(trading_client, "QQQ", buy_put_strike, sell_put_strike, expiration_date, quantity,
+                              execution_mode, account)
+
+
+def execute_call_spread(trading_client, underlying, buy_call_strike, sell_call_strike, expiration_date, quantity=1,
+                        execution_mode=None, account=DEFAULT_ACCOUNT):
     """
     Executes a call spread by:
     1. Buying a call at the higher strike price
     2. Selling a call at the lower strike price
     Both with the same expiration date
 
-    Uses place_order function and saves order IDs to a text file
+    Strikes are snapped to the nearest listed strikes at or beyond them (see helper.option_chain), and
+    the credit is estimated off the IV surface first (see MIN_ENTRY_CREDIT). Both legs are sent
+    together via place_spread_order and order IDs are saved to the order store
 
     Parameters:
     - trading_client: Alpaca TradingClient instance
+    - underlying: Underlying symbol
     - buy_call_strike: Strike price for the call to buy (higher strike)
     - sell_call_strike: Strike price for the call to sell (lower strike)
     - expiration_date: Expiration date in format YYYY-MM-DD
     - quantity: Number of contracts to trade (default 1)
+    - execution_mode: Spread execution mode passed to place_spread_order (default SPREAD_EXECUTION_MODE)
+    - account: Name of the account trading_client belongs to, recorded with the orders
 
     Returns:
     - dict: Information about the order execution
     """
-    # Format expiration date for option symbol (YYMMDD format)
-    exp_formatted = datetime.strptime(expiration_date, "%Y-%m-%d").strftime("%y%m%d")
-
-    # Format strike prices for option symbols (multiply by 1000 and format as 8 digits)
-    buy_strike_formatted = f"{int(buy_call_strike * 1000):08d}"
-    sell_strike_formatted = f"{int(sell_call_strike * 1000):08d}"
-
-    # Create OCC option symbols
-    buy_call_symbol = f"QQQ{exp_formatted}C{buy_strike_formatted}"
-    sell_call_symbol = f"QQQ{exp_formatted}C{sell_strike_formatted}"
+    # Snap the strikes to listed contracts and get their OCC option symbols
+    buy_call_strike, sell_call_strike, buy_call_symbol, sell_call_symbol = _spread_contracts(
+        underlying, expiration_date, "C", buy_call_strike, sell_call_strike)
 
     # Log the option symbols we're using
-    logging.info(f"Buying call: {buy_call_symbol}, Selling call: {sell_call_symbol}")
+    logging.info("Buying call: %s, Selling call: %s", buy_call_symbol, sell_call_symbol)
 
-    # Execute the orders using place_order function
-    try:
-        # Place order to buy call
-        buy_order_result = place_order(
-            trading_client=trading_client,
-            symbol=buy_call_symbol,
-            qty=quantity,
-            side='buy',
-            order_type='market',
-            time_in_force='day'
-        )
+    estimated_credit = _estimate_credit(underlying, buy_call_symbol, sell_call_symbol, quantity)
 
-        # Place order to sell call
-        sell_order_result = place_order(
+    # Execute both legs together using place_spread_order
+    try:
+        spread_result = place_spread_order(
             trading_client=trading_client,
-            symbol=sell_call_symbol,
+            legs=[
+                {"symbol": buy_call_symbol, "side": 'buy'},
+                {"symbol": sell_call_symbol, "side": 'sell'}
+            ],
             qty=quantity,
-            side='sell',
-            order_type='market',
-            time_in_force='day'
+            mode=execution_mode
         )
+        buy_order_result, sell_order_result = spread_result["orders"]
 
         # Create list of orders to save
         orders = [buy_order_result, sell_order_result]
 
-        # Save order IDs to file
-        file_path = save_order_ids(orders, "qqq_call_spread")
+        # Save order IDs to the order store
+        # The spread ID lets the P&L tracker pair the two legs back into this spread
+        spread_id = uuid.uuid4().hex
+        file_path = save_order_ids(orders, f"{underlying.lower()}_call_spread", account, spread_id)
 
         return {
             "buy_call": buy_order_result,
             "sell_call": sell_order_result,
-            "strategy": "QQQ Call Spread",
+            "strategy": f"{underlying} Call Spread",
+            "spread_id": spread_id,
+            "legs": [buy_call_symbol, sell_call_symbol],
+            "underlying": underlying,
+            "account": account,
             "buy_strike": buy_call_strike,
             "sell_strike": sell_call_strike,
+            "estimated_credit": estimated_credit,
             "expiration": expiration_date,
             "quantity": quantity,
-            "order_file": file_path
+            "order_file": file_path,
+            "execution": spread_result["execution"]
         }
 
     except Exception as e:
-        logging.error(f"Error executing call spread orders: {str(e)}")
+        logging.error("Error executing %s call spread orders: %s", underlying, e)
         raise
+
+
+def execute_qqq_call_spread(trading_client, buy_call_strike, sell_call_strike, expiration_date, quantity=1,
+                            execution_mode=None, account=DEFAULT_ACCOUNT):
+    """
+    Executes a QQQ call spread, see execute_call_spread
+
+    Returns:
+    - dict: Information about the order execution
+    """
+    return execute_call_spread(trading_client, "QQQ", buy_call_strike, sell_call_strike, expiration_date, quantity,
+                                execution_mode, account)
+
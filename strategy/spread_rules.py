@@ -0,0 +1,111 @@
+import numpy as np
+
+# Gap-band entry rules, strike multipliers and stop-loss multiple of the gap-band spread strategy.
+# The live strategy, the backtester and the parameter sweep all read these through the functions below.
+DEFAULT_SPREAD_PARAMS = {
+    "put_entry_upper": 1.01,   # put spread when yest_price < current_price < 1.01*yest_price
+    "call_entry_lower": 0.99,  # call spread when 0.99*yest_price < current_price < yest_price
+    "put_buy_strike": 0.98,
+    "put_sell_strike": 0.99,
+    "call_buy_strike": 1.02,
+    "call_sell_strike": 1.01,
+    "stop_loss_multiple": 2.0,
+    "short_delta_exit": None   # close a spread once its short leg's |delta| reaches this, None to disable
+}
+
+
+def _round_strike(value):
+    """
+    Rounds strikes to whole dollars; arrays stay arrays, scalars become ints like round()
+    """
+    if isinstance(value, np.ndarray):
+        return np.round(value)
+    return round(value)
+
+
+def put_spread_signal(yesterday_price, current_price, params=DEFAULT_SPREAD_PARAMS):
+    """
+    Put spread entry condition: yest_price < current_price < put_entry_upper * yest_price
+
+    Parameters:
+    - yesterday_price: Previous close (scalar or numpy array)
+    - current_price: Price at entry time (scalar or numpy array)
+    - params: Spread parameters
+
+    Returns:
+    - bool or numpy.ndarray: True where the condition is met
+    """
+    return (yesterday_price < current_price) & (current_price < params["put_entry_upper"] * yesterday_price)
+
+
+def call_spread_signal(yesterday_price, current_price, params=DEFAULT_SPREAD_PARAMS):
+    """
+    Call spread entry condition: call_entry_lower * yest_price < current_price < yest_price
+
+    Parameters:
+    - yesterday_price: Previous close (scalar or numpy array)
+    - current_price: Price at entry time (scalar or numpy array)
+    - params: Spread parameters
+
+    Returns:
+    - bool or numpy.ndarray: True where the condition is met
+    """
+    return (params["call_entry_lower"] * yesterday_price < current_price) & (current_price < yesterday_price)
+
+
+def put_spread_strikes(yesterday_price, params=DEFAULT_SPREAD_PARAMS):
+    """
+    Strikes of the put spread
+
+    Returns:
+    - tuple: (buy_put_strike, sell_put_strike)
+    """
+    return (_round_strike(params["put_buy_strike"] * yesterday_price),
+            _round_strike(params["put_sell_strike"] * yesterday_price))
+
+
+def call_spread_strikes(yesterday_price, params=DEFAULT_SPREAD_PARAMS):
+    """
+    Strikes of the call spread
+
+    Returns:
+    - tuple: (buy_call_strike, sell_call_strike)
+    """
+    return (_round_strike(params["call_buy_strike"] * yesterday_price),
+            _round_strike(params["call_sell_strike"] * yesterday_price))
+
+
+def stop_loss_level(premium_paid, premium_received, params=DEFAULT_SPREAD_PARAMS):
+    """
+    P&L level at which the stop loss fires: a loss of stop_loss_multiple times the net premium.
+
+    The net premium is taken as an absolute amount so the level is a loss for debit and credit
+    spreads alike (a credit spread has premium_received > premium_paid).
+
+    Parameters:
+    - premium_paid: Premium paid for long legs (scalar or numpy array)
+    - premium_received: Premium received for short legs (scalar or numpy array)
+    - params: Spread parameters
+
+    Returns:
+    - float or numpy.ndarray: Stop-loss P&L level (zero or negative)
+    """
+    return -params["stop_loss_multiple"] * abs(premium_paid - premium_received)
+
+
+def risk_exit_signal(short_delta, params=DEFAULT_SPREAD_PARAMS):
+    """
+    Risk-based exit condition: the short leg's absolute delta reached short_delta_exit, i.e. the
+    underlying moved close enough to the short strike that gamma drives the losses from here
+
+    Parameters:
+    - short_delta: Largest absolute per-share delta of a spread's short legs (scalar or numpy array)
+    - params: Spread parameters
+
+    Returns:
+    - bool or numpy.ndarray: True where the spread should be closed; always False when the rule is disabled
+    """
+    threshold = params.get("short_delta_exit")
+    if threshold is None:
+        return np.zeros_like(short_delta, dtype=bool) if isinstance(short_delta, np.ndarray) else False
+    return short_delta >= threshold
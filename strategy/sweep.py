@@ -0,0 +1,192 @@
+import os
+import sys
+import time
+import random
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+from strategy.backtest import run_backtest, load_price_history, history_path
+from strategy.spread_rules import DEFAULT_SPREAD_PARAMS
+from bootstrap import bootstrap
+import logging
+
+bootstrap()
+
+# Parameter combinations per task; large enough to amortize inter-process overhead
+SWEEP_CHUNK_SIZE = 16
+
+# Default search space around the live parameters
+DEFAULT_SWEEP_GRID = {
+    "put_entry_upper": [1.005, 1.0075, 1.01, 1.015, 1.02],
+    "call_entry_lower": [0.98, 0.985, 0.99, 0.9925, 0.995],
+    "put_buy_strike": [0.97, 0.975, 0.98],
+    "put_sell_strike": [0.985, 0.99, 0.995],
+    "call_buy_strike": [1.02, 1.025, 1.03],
+    "call_sell_strike": [1.005, 1.01, 1.015],
+    "stop_loss_multiple": [1.0, 1.5, 2.0, 3.0]
+}
+
+# Price history arrays of the worker process, attached to the parent's shared memory
+_worker_history = {}
+_worker_blocks = []
+
+
+def grid_combinations(grid):
+    """
+    Expands a grid of parameter values into full parameter sets
+
+    Parameters:
+    - grid: dict of parameter name to list of values; missing parameters keep their defaults
+
+    Returns:
+    - list: Parameter dicts, one per combination
+    """
+    names = list(grid)
+    return [{**DEFAULT_SPREAD_PARAMS, **dict(zip(names, values))}
+            for values in itertools.product(*(grid[name] for name in names))]
+
+
+def random_combinations(ranges, count, seed=None):
+    """
+    Draws parameter sets uniformly from ranges
+
+    Parameters:
+    - ranges: dict of parameter name to (low, high)
+    - count: Number of parameter sets
+    - seed: Optional random seed for repeatable sweeps
+
+    Returns:
+    - list: Parameter dicts
+    """
+    rng = random.Random(seed)
+    return [{**DEFAULT_SPREAD_PARAMS, **{name: rng.uniform(low, high) for name, (low, high) in ranges.items()}}
+            for _ in range(count)]
+
+
+def _share_history(history):
+    """
+    Copies the history arrays into shared memory blocks
+
+    Returns:
+    - tuple: (blocks, specs) where specs maps array name to (block name, shape, dtype) for the workers
+    """
+    blocks = []
+    specs = {}
+    for key, array in history.items():
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        specs[key] = (block.name, array.shape, array.dtype.str)
+    return blocks, specs
+
+
+def _attach_history(specs):
+    """
+    Worker initializer: maps the parent's shared memory blocks as read-only arrays
+    """
+    # A forked worker inherits the parent's log queue handler but not its writer thread; start its own
+    bootstrap()
+    for key, (name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=name)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        _worker_blocks.append(block)
+        _worker_history[key] = array
+
+
+def _run_chunk(param_chunk, volatility):
+    """
+    Worker task: backtests a chunk of parameter sets against the shared history
+
+    Returns:
+    - list: (params, summary) per parameter set
+    """
+    return [(params, run_backtest(_worker_history, params, volatility)["summary"]) for params in param_chunk]
+
+
+def rank_results(results):
+    """
+    Ranks sweep results by total P&L (high first), max drawdown (low first) and hit rate (high first).
+    Each result gets its rank on every metric and is ordered by the mean of the three ranks.
+
+    Parameters:
+    - results: List of dicts with 'params' and the backtest summary fields
+
+    Returns:
+    - list: Results sorted best first, each with 'pnl_rank', 'drawdown_rank', 'hit_rate_rank' and 'score'
+    """
+    if not results:
+        return []
+
+    pnl = np.array([r["total_pnl"] for r in results])
+    drawdown = np.array([r["max_drawdown"] for r in results])
+    hit_rate = np.array([r["hit_rate"] for r in results])
+
+    ranks = {}
+    for key, order in (("pnl_rank", np.argsort(-pnl, kind="stable")),
+                       ("drawdown_rank", np.argsort(drawdown, kind="stable")),
+                       ("hit_rate_rank", np.argsort(-hit_rate, kind="stable"))):
+        ranks[key] = np.empty(len(results), dtype=int)
+        ranks[key][order] = np.arange(1, len(results) + 1)
+
+    score = (ranks["pnl_rank"] + ranks["drawdown_rank"] + ranks["hit_rate_rank"]) / 3
+    ranked = []
+    for i in np.lexsort((-pnl, score)):
+        ranked.append({**results[i], "pnl_rank": int(ranks["pnl_rank"][i]),
+                       "drawdown_rank": int(ranks["drawdown_rank"][i]),
+                       "hit_rate_rank": int(ranks["hit_rate_rank"][i]), "score": float(score[i])})
+    return ranked
+
+
+def run_sweep(history, param_sets, workers=None, volatility=None, chunk_size=SWEEP_CHUNK_SIZE):
+    """
+    Backtests every parameter set across a process pool.
+
+    The price history is copied once into shared memory and mapped by each worker, so tasks
+    only carry their parameter dicts and results.
+
+    Parameters:
+    - history: Price history arrays, see strategy.backtest.load_price_history
+    - param_sets: List of parameter dicts (see grid_combinations and random_combinations)
+    - workers: Number of processes (default: all cores)
+    - volatility: Optional constant volatility passed to run_backtest
+    - chunk_size: Parameter sets per task
+
+    Returns:
+    - dict: 'results' ranked best first (see rank_results), 'combinations', 'workers' and 'elapsed_seconds'
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = [param_sets[i:i + chunk_size] for i in range(0, len(param_sets), chunk_size)]
+    started_at = time.perf_counter()
+
+    blocks, specs = _share_history(history)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach_history, initargs=(specs,)) as executor:
+            outputs = executor.map(_run_chunk, chunks, itertools.repeat(volatility))
+            results = [{"params": params, **summary} for chunk in outputs for params, summary in chunk]
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    elapsed = time.perf_counter() - started_at
+    logging.info("Swept %d parameter sets on %s workers in %.2fs", len(param_sets), workers, elapsed)
+
+    return {
+        "results": rank_results(results),
+        "combinations": len(param_sets),
+        "workers": workers,
+        "elapsed_seconds": elapsed
+    }
+
+
+if __name__ == "__main__":
+    symbol = sys.argv[1] if len(sys.argv) > 1 else "QQQ"
+    sweep = run_sweep(load_price_history(history_path(symbol)), grid_combinations(DEFAULT_SWEEP_GRID))
+
+    print(f"{sweep['combinations']} combinations on {sweep['workers']} workers in {sweep['elapsed_seconds']:.2f}s")
+    for result in sweep["results"][:10]:
+        print(f"score {result['score']:.1f} pnl {result['total_pnl']:.2f} drawdown {result['max_drawdown']:.2f} "
+              f"hit rate {result['hit_rate']:.2%} {result['params']}")
@@ -0,0 +1,47 @@
+import os
+import shutil
+import tempfile
+import pytest
+from benchmarks.fake_alpaca import FakeAlpacaServer
+from benchmarks.run_benchmarks import FAKE_UNDERLYING_PRICE
+
+# The shared clients read their URLs at import, so the fake server is started before any test module
+# imports them; its data lives in a scratch directory instead of data/
+_scratch = tempfile.mkdtemp(prefix="uv_trading_tests_")
+_server = FakeAlpacaServer(latency_ms=1.0, jitter_ms=0.0, underlying_price=FAKE_UNDERLYING_PRICE, seed=0)
+_url = _server.start()
+
+os.environ["ALP_TRADING_URL"] = _url
+os.environ["ALP_DATA_URL"] = _url
+os.environ["ALP_KEY"] = "test"
+os.environ["ALP_SECRET"] = "test"
+os.environ["ALP_REQUESTS_PER_MINUTE"] = "1000000"
+os.environ["LOG_FILE"] = os.path.join(_scratch, "uv_trading.log")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def scratch_data():
+    """
+    Points the order store, price store and session journal at the scratch directory
+    """
+    import helper.order_store as order_store
+    import helper.price_store as price_store
+    import helper.session_journal as session_journal
+
+    order_store.ORDER_DB_PATH = os.path.join(_scratch, "orders.db")
+    price_store._store = price_store.PriceStore(os.path.join(_scratch, "prices"))
+    session_journal.JOURNAL_DIR = os.path.join(_scratch, "journal")
+    yield _scratch
+
+    session_journal.close_session_journal()
+    _server.stop()
+    shutil.rmtree(_scratch, ignore_errors=True)
+
+
+@pytest.fixture
+def fake_server():
+    """
+    The fake Alpaca server, with no open positions
+    """
+    _server.set_positions([])
+    return _server
@@ -0,0 +1,64 @@
+import time
+import threading
+import data_process.pnl as pnl
+import data_process.quote_stream as quote_stream
+from benchmarks.run_benchmarks import spread_positions, _wait_for
+from helper.market_clock import market_today, is_trading_day, previous_trading_day
+
+
+def _trade_day():
+    today = market_today()
+    return today if is_trading_day(today) else previous_trading_day(today)
+
+
+def test_breach_seen_by_quote_and_watchdog_closes_once(fake_server, monkeypatch):
+    # Each spread is checked against its own level, so the breach needs no premiums in the order store
+    monkeypatch.setattr(pnl, "STOP_LOSS_SCOPE", "spread")
+
+    # Keep the close in flight while both threads keep seeing the breach
+    closes = []
+    triggered_on = set()
+    apply_stop_loss = quote_stream.apply_stop_loss
+    stop_loss_triggered = quote_stream.stop_loss_triggered
+
+    def slow_apply_stop_loss(pnl_info):
+        closes.append(pnl_info)
+        time.sleep(1.5)
+        return apply_stop_loss(pnl_info)
+
+    def recording_stop_loss_triggered(pnl_info):
+        triggered = stop_loss_triggered(pnl_info)
+        if triggered:
+            triggered_on.add(threading.current_thread().name)
+        return triggered
+
+    monkeypatch.setattr(quote_stream, "apply_stop_loss", slow_apply_stop_loss)
+    monkeypatch.setattr(quote_stream, "stop_loss_triggered", recording_stop_loss_triggered)
+
+    (long_symbol, _, _), (short_symbol, _, _) = spread_positions(2, _trade_day())
+    # 0.35 credit, so the stop-loss level is a $70 loss
+    fake_server.set_positions([(long_symbol, 1, 0.25), (short_symbol, -1, 0.60)])
+    pnl.get_pnl_tracker().invalidate_positions()
+
+    stream = quote_stream.StopLossQuoteStream(url_override=fake_server.quote_stream_url, debounce_seconds=0.1)
+    stream.start()
+    try:
+        _wait_for(lambda: {long_symbol, short_symbol} <= fake_server.quote_subscriptions, 10,
+                  "Stop-loss stream did not subscribe to the spread's quotes")
+
+        # The short leg at 1.50 is a $90 loss. The first quote of each pair is evaluated as it arrives,
+        # the second falls in the debounce window and is evaluated by the watchdog
+        fake_server.publish_quote(long_symbol, 0.20, 0.30)
+        for _ in range(3):
+            fake_server.publish_quote(short_symbol, 1.45, 1.55)
+            time.sleep(0.02)
+            fake_server.publish_quote(short_symbol, 1.45, 1.55)
+            time.sleep(quote_stream.WATCHDOG_INTERVAL_SECONDS + 0.15)
+
+        _wait_for(lambda: not fake_server.positions, 10, "Stop-loss stream did not close the breached spread")
+        time.sleep(0.5)
+    finally:
+        stream.stop()
+
+    assert {"stop-loss-stream", "stop-loss-watchdog"} <= triggered_on
+    assert len(closes) == 1
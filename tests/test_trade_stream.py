@@ -0,0 +1,51 @@
+import time
+from data_process.trade_stream import TradeUpdateStream
+from helper.fill_ledger import get_fill_ledger
+from benchmarks.run_benchmarks import _wait_for
+
+
+def _order_update(order, filled_qty, filled_avg_price, status):
+    return {**order, "filled_qty": str(filled_qty), "filled_avg_price": str(filled_avg_price), "status": status}
+
+
+def test_fills_reach_the_ledger_and_late_partial_fills_are_ignored(fake_server):
+    ledger = get_fill_ledger()
+    stream = TradeUpdateStream(url_override=fake_server.stream_url)
+    stream.start()
+    try:
+        _wait_for(lambda: fake_server.stream_clients > 0, 10, "Trade update stream did not connect")
+
+        order = fake_server._order_json(None, "QQQ261016P00490000", 3, "buy", None)
+        order_id = order["id"]
+
+        fake_server.publish_fill(_order_update(order, 1, 0.50, "partially_filled"), "partial_fill")
+        _wait_for(lambda: ledger.get(order_id) is not None, 5, "Partial fill did not reach the ledger")
+        partial = dict(ledger.get(order_id))
+        assert partial["filled_qty"] == 1.0
+        assert partial["filled_avg_price"] == 0.50
+        assert partial["status"] == "partially_filled"
+        assert partial["symbol"] == "QQQ261016P00490000" and partial["side"] == "buy"
+
+        time.sleep(0.01)
+        fake_server.publish_fill(_order_update(order, 3, 0.52, "filled"))
+        _wait_for(lambda: ledger.get(order_id)["status"] == "filled", 5, "Fill did not reach the ledger")
+
+        # A partial fill delivered after the fill reports less quantity and must not roll the fill back;
+        # a later update of another order shows when it has been handled
+        fake_server.publish_fill(_order_update(order, 2, 0.51, "partially_filled"), "partial_fill")
+        marker = fake_server._order_json(None, "QQQ261016P00491000", 1, "sell", 0.40)
+        fake_server.publish_fill(marker)
+        _wait_for(lambda: ledger.get(marker["id"]) is not None, 5, "Marker fill did not reach the ledger")
+    finally:
+        stream.stop()
+
+    fill = ledger.get(order_id)
+    assert fill["filled_qty"] == 3.0
+    assert fill["filled_avg_price"] == 0.52
+    assert fill["status"] == "filled"
+    assert fill["first_fill_at"] == partial["first_fill_at"]
+    assert fill["last_fill_at"] > partial["last_fill_at"]
+
+    metrics = stream.get_metrics()
+    assert metrics["updates"] == 4
+    assert metrics["fills"] == 3
@@ -1,15 +1,10 @@
-import pytz
 import datetime
-from datetime import datetime as dt
+from helper.market_clock import market_now, last_weekday_of_month_mask
 
 
 def get_est_date_time(days=0):
 
-    ist_timezone = pytz.timezone('America/New_York')
-
-    now_utc = datetime.datetime.now(pytz.utc)
-
-    now_ist = now_utc.astimezone(ist_timezone)
+    now_ist = market_now()
 
     updated_ist = now_ist + datetime.timedelta(days=days)
 
@@ -24,9 +19,7 @@ def get_est_date_time(days=0):
 
 def calculate_expiry_date(date_ist):
 
-    next_same_weekday = date_ist + datetime.timedelta(days=7)
-
-    if next_same_weekday.month != date_ist.month:
+    if check_month_end(date_ist):
         return date_ist.strftime('%y%b').upper()
     elif date_ist.month == 12:
         return date_ist.strftime('%yD%d')
@@ -36,27 +29,13 @@ def calculate_expiry_date(date_ist):
 
 def check_month_end(date_ist):
 
-    next_same_weekday = date_ist + datetime.timedelta(days=7)
-
-    if next_same_weekday.month != date_ist.month:
-        return True
-    else:
-        return False
+    return bool(last_weekday_of_month_mask([date_ist])[0])
 
 
 def get_time_string(hour_, minute_):
     return f"{hour_:02}:{minute_:02}"
 
 
-def get_est_to_local_time_string(hour_, minute_):
-    time_str = get_time_string(hour_, minute_)
-
-    date_ = dt.strptime(time_str, '%H:%M')
-    local_time = date_ + datetime.timedelta(hours=8, minutes=0)
-
-    return local_time.strftime('%H:%M')
-
-
 def add_minutes(hour, minute, minutes_to_add):
     if minute+minutes_to_add >= 60:
         return hour+1, minute+minutes_to_add-60